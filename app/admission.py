@@ -0,0 +1,243 @@
+"""Admission control: per route class concurrency limits with bounded queues."""
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from app import metrics
+from app.config import settings
+from app.responses import FastJSONResponse
+
+# (method, route template) -> route class, matched in order before routing.
+# Only routes that may call CoinGecko are 'upstream'. Unlisted routes (health,
+# readiness, metrics, docs) are never queued or shed, so probes keep answering
+# under overload.
+ROUTE_CLASSES = {
+    ("POST", "/auth/login"): "auth",
+    ("GET", "/coins"): "cached",
+    ("GET", "/categories"): "cached",
+    ("GET", "/coins/{coin_id}/categories"): "cached",
+    ("GET", "/snapshots/markets"): "cached",
+    ("GET", "/alerts"): "cached",
+    ("GET", "/alerts/events"): "cached",
+    ("DELETE", "/alerts/{rule_id}"): "cached",
+    ("GET", "/coins/market-data"): "upstream",
+    ("GET", "/coins/{coin_id}"): "upstream",
+    ("GET", "/categories/{category_id}/coins"): "upstream",
+    ("POST", "/dashboard"): "upstream",
+    ("POST", "/alerts"): "upstream",
+}
+
+_ROUTE_PATTERNS = [
+    (method, re.compile(re.sub(r"\{[^}]+\}", "[^/]+", template) + "/?"), name)
+    for (method, template), name in ROUTE_CLASSES.items()
+]
+
+# Weight of the latest request in the mean service time estimate
+_SERVICE_TIME_WEIGHT = 0.1
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """
+    Concurrency limit with a bounded FIFO wait queue.
+
+    Up to `limit` requests run at once; up to `queue_size` more wait for a
+    slot, for at most `queue_timeout` seconds. Anything beyond that is
+    rejected at once, so work in flight is bounded and admitted requests
+    see at most one queue timeout of extra latency.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        """
+        Initialize the gate.
+
+        Args:
+            limit: Requests handled concurrently
+            queue_size: Requests allowed to wait for a slot
+            queue_timeout: Longest a request waits before it is shed
+        """
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Mean seconds a request holds a slot, for Retry-After estimates
+        self.service_time = 1.0
+
+    @property
+    def queued(self) -> int:
+        """Requests currently waiting for a slot."""
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Estimate whole seconds until the current queue has drained."""
+        drain = (self.queued + 1) * self.service_time / max(self.limit, 1)
+        return max(1, math.ceil(drain))
+
+    async def acquire(self) -> float:
+        """
+        Take a slot, waiting in the queue if all are busy.
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        if self.queued >= self.queue_size:
+            raise Overloaded("queue_full", self.retry_after())
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise Overloaded("queue_timeout", self.retry_after())
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return time.perf_counter() - started
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Leave the queue, passing on a slot that was handed over meanwhile."""
+        if waiter.done():
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        """
+        Free a slot, handing it straight to the longest waiting request.
+
+        Args:
+            held_for: Seconds the slot was held, to update the service time
+        """
+        if held_for is not None:
+            self.service_time += _SERVICE_TIME_WEIGHT * (held_for - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def _gates() -> Dict[str, AdmissionGate]:
+    timeout = settings.admission_queue_timeout_seconds
+    return {
+        "auth": AdmissionGate(
+            settings.admission_auth_concurrency, settings.admission_auth_queue, timeout
+        ),
+        "cached": AdmissionGate(
+            settings.admission_cached_concurrency,
+            settings.admission_cached_queue,
+            timeout,
+        ),
+        "upstream": AdmissionGate(
+            settings.admission_upstream_concurrency,
+            settings.admission_upstream_queue,
+            timeout,
+        ),
+    }
+
+
+# Global gates per route class (limits apply per worker process)
+gates = _gates()
+
+
+def _read_gates() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for route_class, gate in gates.items():
+        values[(route_class, "active")] = gate.active
+        values[(route_class, "queued")] = gate.queued
+    return values
+
+
+metrics.registry.register(
+    metrics.Gauge(
+        "admission_requests",
+        "Requests holding or waiting for a slot, by route class and state.",
+        ("route_class", "state"),
+        function=_read_gates,
+    )
+)
+
+
+def route_class(scope) -> Optional[str]:
+    """
+    Get the route class of a request before it is routed.
+
+    Args:
+        scope: ASGI connection scope
+
+    Returns:
+        'auth', 'cached', 'upstream', or None for unlimited routes
+    """
+    path = scope["path"]
+    # GET routes also answer HEAD
+    method = "GET" if scope["method"] == "HEAD" else scope["method"]
+    for route_method, pattern, name in _ROUTE_PATTERNS:
+        if route_method == method and pattern.fullmatch(path):
+            return name
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting requests through their route class's gate.
+
+    Shed requests get 503 with a Retry-After estimated from the queue
+    length and recent service times; time spent queued is recorded in
+    admission_queue_seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = (
+            route_class(scope)
+            if scope["type"] == "http" and settings.admission_enabled
+            else None
+        )
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        gate = gates[name]
+        try:
+            waited = await gate.acquire()
+        except Overloaded as exc:
+            metrics.admission_rejected_total.inc(name, exc.reason)
+            response = FastJSONResponse(
+                {"detail": "Server overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        metrics.admission_queue_seconds.observe(waited, name)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - started)
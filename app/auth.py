@@ -7,6 +7,7 @@ import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
+from app.timing import span
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
@@ -54,9 +55,10 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
     )
     try:
         token = credentials.credentials
-        payload = jwt.decode(
-            token, settings.secret_key, algorithms=[settings.algorithm]
-        )
+        with span("jwt"):
+            payload = jwt.decode(
+                token, settings.secret_key, algorithms=[settings.algorithm]
+            )
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
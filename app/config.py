@@ -1,5 +1,6 @@
 """Configuration management for the application."""
 
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -11,6 +12,109 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     coingecko_api_url: str = "https://api.coingecko.com/api/v3"
     default_per_page: int = 10
+    # Derive secondary currencies from /exchange_rates instead of fetching
+    # /coins/markets once per currency
+    use_exchange_rates: bool = False
+    exchange_rates_ttl_seconds: int = 3600
+    # Upstream calls per minute shared by request handling and background work
+    upstream_rate_limit_per_minute: int = 30
+    # Latency budget for upstream calls per request (X-Latency-Budget-Ms
+    # header, capped at the maximum); cached data is served when it runs out
+    default_latency_budget_ms: int = 10000
+    max_latency_budget_ms: int = 30000
+    # Longest a last-known-good result is served for while CoinGecko fails
+    stale_if_error_max_age_seconds: int = 3600
+    # Per-user limits (GCRA, keyed on the token subject): every request costs
+    # one unit and each CoinGecko call it triggers adds the upstream cost
+    rate_limit_enabled: bool = True
+    user_rate_limit_per_minute: int = 60
+    user_rate_limit_burst: int = 30
+    user_rate_limit_upstream_cost: int = 10
+    # Category index: list refresh and per-category membership crawl
+    category_index_refresh_seconds: int = 3600
+    category_membership_ttl_seconds: int = 21600
+    # Coin list refresh, and how long IDs CoinGecko has no data for are
+    # rejected without asking again
+    coin_list_refresh_seconds: int = 3600
+    unknown_coin_ttl_seconds: int = 300
+    # Per-coin market data records: base TTL, adapted per coin to price
+    # volatility, request rate and remaining rate budget within the bounds
+    market_data_ttl_seconds: int = 60
+    market_data_ttl_min_seconds: int = 10
+    market_data_ttl_max_seconds: int = 300
+    # Price move (as a fraction) a cached record may drift by before expiring
+    market_data_price_tolerance: float = 0.002
+    # Rendered response pages kept for long-lived data (category snapshots,
+    # coin and category lists), keyed by data version, query and fieldset
+    page_cache_entries: int = 256
+    # Admission control per route class (limits apply per worker): requests
+    # beyond the concurrency limit wait in a bounded queue, and are shed with
+    # 503 when it is full or they have waited for the timeout
+    admission_enabled: bool = True
+    admission_auth_concurrency: int = 32
+    admission_auth_queue: int = 64
+    admission_cached_concurrency: int = 128
+    admission_cached_queue: int = 256
+    admission_upstream_concurrency: int = 16
+    admission_upstream_queue: int = 32
+    admission_queue_timeout_seconds: float = 5.0
+    # Startup warm-up gating /ready: the coin list, categories, these coins
+    # and these categories' market data (comma-separated IDs) are loaded
+    # before a worker reports ready, or until the timeout at the latest
+    warmup_enabled: bool = True
+    warmup_coin_ids: str = "bitcoin,ethereum,tether,binancecoin,solana"
+    warmup_categories: str = ""
+    warmup_timeout_seconds: float = 60.0
+    # Full-market crawl of /coins/markets pages on spare rate budget. While
+    # younger than the max age, the ranked snapshot serves unfiltered market
+    # data requests without upstream calls, and coin IDs and indexed
+    # categories while younger than the market data TTL max; 0 max pages
+    # crawls every page
+    market_crawl_enabled: bool = True
+    market_crawl_interval_seconds: int = 600
+    market_crawl_max_age_seconds: int = 1800
+    market_crawl_concurrency: int = 4
+    market_crawl_max_pages: int = 0
+    # Most sub-queries accepted by one POST /dashboard request
+    dashboard_max_queries: int = 10
+    # Price alerts: armed rules per user, fired alerts kept per user for
+    # polling, and webhook delivery (queued alerts, attempts per alert,
+    # timeout per attempt, concurrent posts); rules live in memory, shared by
+    # the workers of the production launcher
+    alert_max_rules_per_user: int = 100
+    alert_events_per_user: int = 1000
+    alert_webhooks_enabled: bool = True
+    alert_webhook_queue_size: int = 10000
+    alert_webhook_attempts: int = 3
+    alert_webhook_timeout_seconds: float = 5.0
+    alert_webhook_concurrency: int = 4
+    # Comma-separated hosts webhooks may post to; empty allows any host that
+    # resolves to public addresses only
+    alert_webhook_allowed_hosts: str = ""
+    # Prefetching of next pages and popular filters, on its own budget and
+    # only while the shared budget keeps the reserve free for requests
+    prefetch_enabled: bool = True
+    prefetch_rate_limit_per_minute: int = 6
+    prefetch_budget_reserve: float = 0.6
+    prefetch_lead_seconds: float = 5.0
+    prefetch_interval_seconds: float = 5.0
+    prefetch_popular_filters: int = 10
+    # Share of the rate budget kept free for requests when crawling
+    background_budget_reserve: float = 0.5
+    # Requests sending this key in the X-Profile header are profiled;
+    # profiling is disabled when unset
+    profiler_key: Optional[str] = None
+    profiler_interval_ms: float = 1.0
+    # Production launcher (python -m app.server); 0 workers means one per
+    # usable CPU, 'auto' picks uvloop/httptools when installed
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0
+    server_loop: str = "auto"
+    server_http: str = "auto"
+    server_preload: bool = True
+    server_graceful_timeout_seconds: int = 30
+    server_keep_alive_seconds: int = 5
 
     model_config = {
         "env_file": ".env",
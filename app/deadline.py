@@ -0,0 +1,96 @@
+"""Per-request latency budgets passed down to upstream calls."""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Header
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# time.monotonic() by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's latency budget ran out before upstream answered."""
+
+
+def remaining() -> Optional[float]:
+    """
+    Get the time left in the current request's latency budget.
+
+    Returns:
+        Seconds left (may be negative), or None outside a budgeted request
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def set_budget(seconds: float) -> None:
+    """
+    Start a latency budget for the current request.
+
+    Args:
+        seconds: Time allowed from now
+    """
+    _deadline.set(time.monotonic() + seconds)
+
+
+async def within_budget(awaitable: Awaitable[T], what: str) -> T:
+    """
+    Await something, giving up when the request's latency budget runs out.
+
+    Args:
+        awaitable: Upstream work to wait for
+        what: Description for the error message
+
+    Returns:
+        The awaitable's result
+
+    Raises:
+        DeadlineExceeded: If the budget is exhausted first
+    """
+    budget = remaining()
+    if budget is None:
+        return await awaitable
+    if budget <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(f"No latency budget left for {what}")
+    try:
+        return await asyncio.wait_for(awaitable, budget)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(
+            f"{what} did not answer within the latency budget"
+        ) from None
+
+
+async def latency_budget(
+    x_latency_budget_ms: Optional[int] = Header(
+        None,
+        ge=1,
+        description="Milliseconds the caller will wait; upstream calls that "
+        "would overrun it fall back to cached data",
+    ),
+) -> float:
+    """
+    Start the request's latency budget from the header or the server default.
+
+    Args:
+        x_latency_budget_ms: Requested budget, capped at the server maximum
+
+    Returns:
+        Budget in seconds
+    """
+    budget_ms = min(
+        x_latency_budget_ms or settings.default_latency_budget_ms,
+        settings.max_latency_budget_ms,
+    )
+    set_budget(budget_ms / 1000)
+    return budget_ms / 1000
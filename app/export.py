@@ -0,0 +1,187 @@
+"""Columnar exports of market snapshots as Arrow IPC, Parquet or CSV."""
+
+import csv
+import hashlib
+import io
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from app import metrics
+from app.snapshot import MarketSnapshot, is_integer_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency: Arrow and Parquet need pyarrow
+    pa = None
+    pq = None
+
+# Export format -> media type
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+# File name extensions for Content-Disposition
+EXTENSIONS = {"arrow": "arrows", "parquet": "parquet", "csv": "csv"}
+
+# Other media types accepted for each format
+_ALIASES = {
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-parquet": "parquet",
+    "text/*": "csv",
+    "*/*": "csv",
+}
+
+
+def available(fmt: str) -> bool:
+    """Whether a format can be produced in this installation."""
+    return fmt == "csv" or pa is not None
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick an export format from an Accept header.
+
+    Args:
+        accept: Accept header value
+
+    Returns:
+        Best available format by quality, 'csv' without a header, or None
+        if nothing acceptable can be produced
+    """
+    if not accept:
+        return "csv"
+    ranked = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        fmt = _ALIASES.get(media_type.lower())
+        if fmt is None:
+            fmt = next(
+                (f for f, t in MEDIA_TYPES.items() if t == media_type.lower()),
+                None,
+            )
+        if fmt is not None and quality > 0 and available(fmt):
+            ranked.append((-quality, position, fmt))
+    return min(ranked)[2] if ranked else None
+
+
+def to_arrow(snapshot: MarketSnapshot) -> "pa.Table":
+    """
+    Convert a snapshot to an Arrow table.
+
+    Float columns wrap the snapshot's arrays without copying the values;
+    NaN becomes null. Market caps are cast to int64.
+
+    Args:
+        snapshot: Market snapshot
+
+    Returns:
+        pyarrow Table with text columns first, then numeric columns
+    """
+    columns = {
+        name: pa.array(values, type=pa.string())
+        for name, values in snapshot.text.items()
+    }
+    for name, values in snapshot.numeric.items():
+        array = pa.array(values, from_pandas=True)
+        if is_integer_column(name):
+            array = array.cast(pa.int64(), safe=False)
+        columns[name] = array
+    return pa.table(columns)
+
+
+def _to_csv(snapshot: MarketSnapshot) -> bytes:
+    """Render a snapshot as CSV with a header row; missing values are empty."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    names = list(snapshot.text) + list(snapshot.numeric)
+    writer.writerow(names)
+    writer.writerows(row.values() for row in snapshot.view(columns=names))
+    return buffer.getvalue().encode()
+
+
+def render(snapshot: MarketSnapshot, fmt: str) -> bytes:
+    """
+    Serialize a snapshot in an export format.
+
+    Args:
+        snapshot: Market snapshot
+        fmt: 'arrow' (IPC stream), 'parquet' or 'csv'
+
+    Returns:
+        Serialized snapshot
+
+    Raises:
+        ValueError: If the format is unknown or unavailable
+    """
+    if fmt == "csv":
+        return _to_csv(snapshot)
+    if fmt not in MEDIA_TYPES or not available(fmt):
+        raise ValueError(f"Export format not available: {fmt}")
+    table = to_arrow(snapshot)
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+class ExportCache:
+    """
+    Rendered exports of the latest snapshot version, one per format.
+
+    Each export is identified by a hash of its content rather than the
+    snapshot version: versions are only unique within a process, so
+    pre-forked workers would hand out the same ETag for different data.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        # Format -> (body, ETag)
+        self._bodies: Dict[str, Tuple[bytes, str]] = {}
+
+    def clear(self) -> None:
+        """Drop all rendered exports."""
+        self.__init__()
+
+    async def get(self, snapshot: MarketSnapshot, fmt: str) -> Tuple[bytes, str]:
+        """
+        Get a snapshot's export, rendering it off the event loop on a miss.
+
+        Args:
+            snapshot: Market snapshot
+            fmt: Export format
+
+        Returns:
+            (serialized snapshot, quoted ETag of its content)
+        """
+        if snapshot.version != self.version:
+            self.version = snapshot.version
+            self._bodies = {}
+        cached = self._bodies.get(fmt)
+        if cached is not None:
+            metrics.cache_lookups_total.inc("exports", "hit")
+            return cached
+        metrics.cache_lookups_total.inc("exports", "miss")
+        body = await run_in_threadpool(render, snapshot, fmt)
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        cached = (body, f'"{digest}-{fmt}"')
+        if snapshot.version == self.version:
+            self._bodies[fmt] = cached
+        return cached
+
+
+# Global export cache instance
+export_cache = ExportCache()
@@ -0,0 +1,61 @@
+"""Incremental parsing of large JSON arrays from streamed response bodies."""
+
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Yield the elements of a top-level JSON array as its bytes arrive.
+
+    Only the unparsed tail of the body is buffered, so neither the full
+    body nor a list of all elements is ever held in memory. Each element
+    is decoded with the C scanner of the standard json module.
+
+    Args:
+        chunks: UTF-8 encoded body chunks, e.g. httpx's aiter_bytes()
+
+    Yields:
+        Decoded array elements in order
+
+    Raises:
+        json.JSONDecodeError: If the body is not a complete JSON array
+    """
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    async for chunk in chunks:
+        buffer += text.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+                started = True
+                pos += 1
+            elif char == "]":
+                return
+            elif char == ",":
+                pos += 1
+            else:
+                try:
+                    item, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Element continues in the next chunk
+                    break
+                if end == len(buffer) and not isinstance(item, (dict, list, str)):
+                    # A number or literal may be cut off at the chunk boundary
+                    break
+                yield item
+                pos = end
+        buffer = buffer[pos:]
+    raise json.JSONDecodeError("Unterminated JSON array", buffer, len(buffer))
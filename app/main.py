@@ -1,22 +1,65 @@
 """Main FastAPI application."""
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, coins, categories
+from fastapi.responses import PlainTextResponse
+from app.routers import alerts, auth, coins, categories, dashboard, snapshots
 from app.config import settings
-from app import __version__
+from app.services.alerts import alert_engine
+from app.services.category_index import category_index
+from app.services.coin_index import coin_index
+from app.services.coingecko import coingecko_service
+from app.services.market_crawler import market_crawler
+from app.services.prefetch import prefetcher
+from app.services.warmup import warmup
+from app import __version__, metrics
+from app.responses import FastJSONResponse
+from app.admission import AdmissionMiddleware
+from app.rate_limit import RateLimitMiddleware
+from app.timing import ServerTimingMiddleware
 import httpx
 from datetime import datetime, timezone
 from typing import Dict, Any
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background tasks for the lifetime of the application."""
+    tasks = [
+        asyncio.create_task(metrics.monitor_event_loop_lag()),
+        asyncio.create_task(category_index.run()),
+        asyncio.create_task(coin_index.run()),
+    ]
+    if settings.warmup_enabled:
+        tasks.append(asyncio.create_task(warmup.run()))
+    if settings.market_crawl_enabled:
+        tasks.append(asyncio.create_task(market_crawler.run()))
+    if settings.prefetch_enabled:
+        tasks.append(asyncio.create_task(prefetcher.run()))
+    if settings.alert_webhooks_enabled:
+        tasks.append(asyncio.create_task(alert_engine.deliver()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 app = FastAPI(
     title="Cryptocurrency Market Updates API",
     description="REST API for fetching cryptocurrency market updates from CoinGecko",
     version=__version__,
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+# Concurrency limits and load shedding per route class
+app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,10 +69,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-user rate limit accounting and headers
+app.add_middleware(RateLimitMiddleware)
+
+# Per-route latency and status metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Server-Timing header and on-demand profiling
+app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(coins.router)
 app.include_router(categories.router)
+app.include_router(snapshots.router)
+app.include_router(dashboard.router)
+app.include_router(alerts.router)
 
 
 @app.get("/")
@@ -40,7 +95,9 @@ async def root():
         "version": __version__,
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
         "version_info": "/version",
+        "metrics": "/metrics",
     }
 
 
@@ -59,6 +116,28 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: whether this worker should receive traffic.
+
+    Not ready (503) until the startup warm-up has loaded the caches or its
+    timeout has passed. Use /health for liveness.
+
+    Returns:
+        Readiness status and warm-up progress
+    """
+    ready = warmup.ready
+    return FastJSONResponse(
+        {
+            "status": "ready" if ready else "warming_up",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "warmup": warmup.status(),
+        },
+        status_code=200 if ready else 503,
+    )
+
+
 @app.get("/health/detailed")
 async def detailed_health_check():
     """
@@ -115,9 +194,43 @@ async def detailed_health_check():
         }
         health_status["status"] = "degraded"
 
+    if settings.use_exchange_rates:
+        age = coingecko_service.exchange_rates_age()
+        if age is None:
+            health_status["checks"]["exchange_rates"] = {
+                "status": "unknown",
+                "message": "Exchange rates not fetched yet",
+            }
+        elif age > 2 * settings.exchange_rates_ttl_seconds:
+            health_status["checks"]["exchange_rates"] = {
+                "status": "stale",
+                "message": "Exchange rates could not be refreshed",
+                "age_seconds": round(age, 1),
+            }
+            health_status["status"] = "degraded"
+        else:
+            health_status["checks"]["exchange_rates"] = {
+                "status": "healthy",
+                "message": "Exchange rates are fresh",
+                "age_seconds": round(age, 1),
+            }
+
     return health_status
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus metrics endpoint.
+
+    Returns:
+        Metrics for this worker process in Prometheus text format
+    """
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/version")
 async def version_info():
     """
@@ -182,6 +295,7 @@ async def version_info():
         "configuration": {
             "default_per_page": settings.default_per_page,
             "coingecko_api_url": settings.coingecko_api_url,
+            "use_exchange_rates": settings.use_exchange_rates,
         },
     }
 
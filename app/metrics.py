@@ -0,0 +1,445 @@
+"""In-process Prometheus metrics with text exposition."""
+
+import asyncio
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.routing import Match
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    """Render a label set in exposition format."""
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, spelling special floats the Prometheus way."""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for a labelled metric family."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """
+        Initialize the metric family.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names, in the order values are passed
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        """Render sample lines."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the family with HELP and TYPE headers."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Increment the counter for a label set."""
+        self.values[labelvalues] = self.values.get(labelvalues, 0.0) + amount
+
+    def get(self, *labelvalues: str) -> float:
+        """Get the current value for a label set."""
+        return self.values.get(labelvalues, 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} "
+            f"{_format_value(value)}"
+            for labels, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, optionally computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+    ):
+        """
+        Initialize the gauge.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names
+            function: Optional callback returning values keyed by label set,
+                evaluated on every scrape instead of stored values
+        """
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        """Set the gauge for a label set."""
+        self.values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Increase the gauge for a label set."""
+        self.values[labelvalues] = self.values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Decrease the gauge for a label set."""
+        self.values[labelvalues] = self.values.get(labelvalues, 0.0) - amount
+
+    def get(self, *labelvalues: str) -> float:
+        """Get the current value for a label set."""
+        values = self.function() if self.function else self.values
+        return values.get(labelvalues, 0.0)
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.function() if self.function else self.values
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} "
+            f"{_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Bucketed distribution of observations."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation for a label set."""
+        state = self.values.get(labelvalues)
+        if state is None:
+            state = self.values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        """Get the number of observations for a label set."""
+        state = self.values.get(labelvalues)
+        return state[2] if state else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _format_labels(names, labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metric families rendered together."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric family, returning it for assignment."""
+        if metric.name in self.metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every family in Prometheus text format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+# Global registry and application metrics
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route"),
+    )
+)
+upstream_requests_total = registry.register(
+    Counter(
+        "coingecko_requests_total",
+        "CoinGecko API calls by endpoint and status code.",
+        ("endpoint", "status"),
+    )
+)
+upstream_errors_total = registry.register(
+    Counter(
+        "coingecko_errors_total",
+        "CoinGecko API call failures by endpoint and error type.",
+        ("endpoint", "error"),
+    )
+)
+upstream_request_duration_seconds = registry.register(
+    Histogram(
+        "coingecko_request_duration_seconds",
+        "CoinGecko API call latency by endpoint.",
+        ("endpoint",),
+    )
+)
+upstream_inflight_requests = registry.register(
+    Gauge(
+        "coingecko_inflight_requests",
+        "CoinGecko API calls currently in flight.",
+    )
+)
+cache_lookups_total = registry.register(
+    Counter(
+        "cache_lookups_total",
+        "In-process cache lookups by cache and result.",
+        ("cache", "result"),
+    )
+)
+cache_ttl_seconds = registry.register(
+    Histogram(
+        "cache_ttl_seconds",
+        "TTLs chosen for newly cached entries by cache.",
+        ("cache",),
+        buckets=(5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600),
+    )
+)
+rejected_coin_ids_total = registry.register(
+    Counter(
+        "rejected_coin_ids_total",
+        "Requested coin IDs rejected before any upstream call, by reason.",
+        ("reason",),
+    )
+)
+stale_responses_total = registry.register(
+    Counter(
+        "stale_responses_total",
+        "Responses served from expired cache entries because CoinGecko "
+        "failed or the latency budget ran out, by cache.",
+        ("cache",),
+    )
+)
+admission_queue_seconds = registry.register(
+    Histogram(
+        "admission_queue_seconds",
+        "Time admitted requests waited for a slot, by route class.",
+        ("route_class",),
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+    )
+)
+admission_rejected_total = registry.register(
+    Counter(
+        "admission_rejected_total",
+        "Requests shed with 503 by route class and reason "
+        "(queue_full, queue_timeout).",
+        ("route_class", "reason"),
+    )
+)
+alerts_fired_total = registry.register(
+    Counter(
+        "alerts_fired_total",
+        "Price alert rules fired, by condition.",
+        ("condition",),
+    )
+)
+alert_webhooks_total = registry.register(
+    Counter(
+        "alert_webhooks_total",
+        "Alert webhook deliveries by result (delivered, failed, dropped, "
+        "rejected).",
+        ("result",),
+    )
+)
+alert_evaluation_seconds = registry.register(
+    Histogram(
+        "alert_evaluation_seconds",
+        "Time spent evaluating alert rules against one market refresh.",
+        buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+    )
+)
+prefetch_total = registry.register(
+    Counter(
+        "prefetch_total",
+        "Prefetches by outcome (fetched, used, wasted, failed).",
+        ("result",),
+    )
+)
+event_loop_lag_seconds = registry.register(
+    Histogram(
+        "event_loop_lag_seconds",
+        "Delay of event loop wake-ups beyond their scheduled time.",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+)
+
+
+def connection_pool_gauge(get_client: Callable[[], object]) -> Gauge:
+    """
+    Create a gauge reporting connection-pool usage of an httpx client.
+
+    Args:
+        get_client: Returns the httpx.AsyncClient to inspect on each scrape
+
+    Returns:
+        Gauge with one sample per connection state
+    """
+
+    def read_pool() -> Dict[Tuple[str, ...], float]:
+        # httpx does not expose pool statistics publicly; read httpcore's pool
+        pool = getattr(getattr(get_client(), "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            ("active",): len(connections) - idle,
+            ("idle",): idle,
+        }
+
+    return Gauge(
+        "coingecko_pool_connections",
+        "Upstream HTTP connections by state.",
+        ("state",),
+        function=read_pool,
+    )
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Sample event-loop lag until cancelled.
+
+    Args:
+        interval: Seconds between samples
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - scheduled))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and status counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_template(scope)
+            method = _method(scope)
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started, method, route
+            )
+            http_requests_total.inc(method, route, str(status_code))
+
+
+# Methods given their own label value; anything else is counted as OTHER
+_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+)
+
+
+def _method(scope) -> str:
+    """Get the request method, keeping label cardinality bounded."""
+    method = scope["method"]
+    return method if method in _METHODS else "OTHER"
+
+
+def _route_template(scope) -> str:
+    """Get the matched route template, keeping label cardinality bounded."""
+    route = scope.get("route")
+    if route is None:
+        # Older Starlette versions do not record the matched route
+        for candidate in getattr(scope.get("app"), "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
@@ -1,7 +1,10 @@
 """Pydantic models for request/response validation."""
 
-from typing import List
-from pydantic import BaseModel
+from enum import Enum
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+from pydantic import BaseModel, ConfigDict, Field
+
+T = TypeVar("T")
 
 
 class Token(BaseModel):
@@ -18,12 +21,206 @@ class LoginRequest(BaseModel):
     password: str
 
 
-class PaginatedResponse(BaseModel):
+class PaginatedResponse(BaseModel, Generic[T]):
     """Paginated response model."""
 
     page: int
     per_page: int
     total: int
     total_pages: int
-    data: List[dict]
+    data: List[T]
+    # True when CoinGecko failed and last known good data is served instead
+    stale: bool = False
+
+
+class CoinListItem(BaseModel):
+    """Coin entry from the coin listing."""
+
+    id: str
+    symbol: str
+    name: str
+
+
+class Category(BaseModel):
+    """Coin category."""
+
+    category_id: str
+    name: str
+
+
+class CoinCategoriesResponse(PaginatedResponse[Category]):
+    """Categories of a coin, with how much of the index has been crawled."""
+
+    crawled_categories: int
+    total_categories: int
+
+
+class CoinMarketData(BaseModel):
+    """Coin market data in INR and CAD."""
+
+    id: str
+    symbol: Optional[str] = None
+    name: Optional[str] = None
+    current_price_inr: Optional[float] = None
+    current_price_cad: Optional[float] = None
+    market_cap_inr: Optional[int] = None
+    market_cap_cad: Optional[int] = None
+    price_change_percentage_24h: Optional[float] = None
+
+
+class MarketSortField(str, Enum):
+    """Market data columns that support server-side sorting."""
+
+    current_price_inr = "current_price_inr"
+    current_price_cad = "current_price_cad"
+    market_cap_inr = "market_cap_inr"
+    market_cap_cad = "market_cap_cad"
+    price_change_percentage_24h = "price_change_percentage_24h"
+
+
+class ExportFormat(str, Enum):
+    """Formats of the market snapshot export."""
+
+    arrow = "arrow"
+    parquet = "parquet"
+    csv = "csv"
+
+
+class SortOrder(str, Enum):
+    """Sort direction."""
+
+    asc = "asc"
+    desc = "desc"
+
+
+class MarketQuery(BaseModel):
+    """Server-side filter, sort and top-N options for market data."""
+
+    # Hashable, so queries can key response caches
+    model_config = ConfigDict(frozen=True)
+
+    sort_by: Optional[MarketSortField] = None
+    order: SortOrder = SortOrder.desc
+    min_market_cap: Optional[float] = None
+    max_price: Optional[float] = None
+    top_n: Optional[int] = None
+
+
+class DashboardOperation(str, Enum):
+    """Coin and category operations available to dashboard sub-queries."""
+
+    coins = "coins"  # GET /coins
+    categories = "categories"  # GET /categories
+    market_data = "market_data"  # GET /coins/market-data
+    category_coins = "category_coins"  # GET /categories/{category}/coins
+    coin_categories = "coin_categories"  # GET /coins/{coin_id}/categories
+
+
+class DashboardQuery(BaseModel):
+    """
+    One named sub-query of a dashboard request.
+
+    Parameters have the same names and formats as the query parameters of
+    the operation's route; those it does not take are ignored.
+    """
+
+    # Hashable, so identical sub-queries are run once
+    model_config = ConfigDict(frozen=True)
+
+    op: DashboardOperation
+    coin_id: Optional[str] = None
+    category: Optional[str] = None
+    q: Optional[str] = None
+    page_num: int = Field(1, ge=1)
+    per_page: Optional[int] = Field(None, ge=1, le=250)
+    sort_by: Optional[MarketSortField] = None
+    order: SortOrder = SortOrder.desc
+    min_market_cap: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    top_n: Optional[int] = Field(None, ge=1)
+    fields: Optional[str] = None
+
+
+class DashboardRequest(BaseModel):
+    """Named sub-queries run together by POST /dashboard."""
+
+    queries: Dict[str, DashboardQuery] = Field(..., min_length=1)
+
+
+class DashboardResult(BaseModel):
+    """Outcome of one sub-query: the route's response body or its error."""
+
+    status: int
+    body: Optional[Any] = None
+    detail: Optional[Any] = None
+
+
+class DashboardResponse(BaseModel):
+    """Sub-query results by name, in request order."""
+
+    results: Dict[str, DashboardResult]
+
+
+class AlertCondition(str, Enum):
+    """When an alert rule fires."""
+
+    above = "above"  # Price rises to or above the value
+    below = "below"  # Price falls to or below the value
+    percent_change = "percent_change"  # Price moves by the signed percent value
+
+
+class AlertCurrency(str, Enum):
+    """Currencies alert rules can watch."""
+
+    inr = "inr"
+    cad = "cad"
+
+
+class AlertRuleRequest(BaseModel):
+    """A price alert rule to create."""
+
+    coin_id: str = Field(..., min_length=1)
+    condition: AlertCondition
+    # Threshold price for above/below; signed percent move from the current
+    # price for percent_change
+    value: float
+    currency: AlertCurrency = AlertCurrency.inr
+    webhook_url: Optional[str] = Field(None, pattern=r"^https?://")
+
+
+class AlertRule(BaseModel):
+    """An alert rule with the price it fires at."""
+
+    id: int
+    coin_id: str
+    condition: AlertCondition
+    value: float
+    currency: AlertCurrency
+    threshold: float
+    reference_price: float
+    webhook_url: Optional[str] = None
+    created_at: str
+    # False when the price already satisfied the rule and it fired at once
+    active: bool = True
+
+
+class AlertEvent(BaseModel):
+    """A fired alert rule."""
+
+    id: int
+    rule_id: int
+    coin_id: str
+    condition: AlertCondition
+    currency: AlertCurrency
+    threshold: float
+    price: float
+    previous_price: float
+    fired_at: str
+
+
+class AlertEventsResponse(BaseModel):
+    """Fired alerts after a cursor, oldest first."""
 
+    events: List[AlertEvent]
+    # Pass as `after` to poll for newer alerts
+    next_after: int
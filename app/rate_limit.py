@@ -0,0 +1,223 @@
+"""Per-user rate limiting with the generic cell rate algorithm (GCRA)."""
+
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Depends, HTTPException, status
+
+from app.auth import get_current_user
+from app.config import settings
+
+# Users tracked before idle entries are pruned
+_PRUNE_THRESHOLD = 10000
+
+
+class RateLimitState(NamedTuple):
+    """Outcome of a rate limit check."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the user's allowance is fully replenished
+    reset_after: float
+    # Seconds until the request would be allowed (0 when allowed)
+    retry_after: float
+
+
+class GCRALimiter:
+    """
+    Generic cell rate algorithm limiter.
+
+    Each key stores a single theoretical arrival time (TAT): the moment its
+    allowance would be fully replenished. A request of cost c is allowed if
+    pushing the TAT forward by c emission intervals keeps it within the
+    burst window. This is equivalent to a token bucket but needs one float
+    per key and no background refill.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate_per_minute: Sustained cost units per minute
+            burst: Cost units that may be spent at once
+        """
+        self.interval = 60.0 / rate_per_minute
+        self.burst = burst
+        self._tat: Dict[str, float] = {}
+
+    def clear(self) -> None:
+        """Forget all keys."""
+        self._tat.clear()
+
+    def _state(self, allowed: bool, tat: float, now: float) -> RateLimitState:
+        window = self.burst * self.interval
+        used = max(0.0, tat - now)
+        return RateLimitState(
+            allowed=allowed,
+            limit=self.burst,
+            remaining=max(0, math.floor((window - used) / self.interval)),
+            reset_after=used,
+            retry_after=0.0,
+        )
+
+    def check(self, key: str, cost: float = 1.0) -> RateLimitState:
+        """
+        Admit a request if the key can afford it.
+
+        Args:
+            key: Rate limit key, e.g. the user name
+            cost: Cost units of the request
+
+        Returns:
+            RateLimitState; the cost is only spent when allowed
+        """
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + cost * self.interval
+        excess = new_tat - now - self.burst * self.interval
+        if excess > 0:
+            return self._state(False, tat, now)._replace(retry_after=excess)
+        if len(self._tat) >= _PRUNE_THRESHOLD:
+            self._prune(now)
+        self._tat[key] = new_tat
+        return self._state(True, new_tat, now)
+
+    def charge(self, key: str, cost: float) -> RateLimitState:
+        """
+        Spend cost units unconditionally, e.g. for work already done.
+
+        Args:
+            key: Rate limit key
+            cost: Cost units to spend
+
+        Returns:
+            RateLimitState after charging
+        """
+        now = time.monotonic()
+        new_tat = max(self._tat.get(key, now), now) + cost * self.interval
+        self._tat[key] = new_tat
+        return self._state(True, new_tat, now)
+
+    def peek(self, key: str) -> RateLimitState:
+        """Get a key's state without spending anything."""
+        now = time.monotonic()
+        return self._state(True, max(self._tat.get(key, now), now), now)
+
+    def _prune(self, now: float) -> None:
+        """Drop keys whose allowance is fully replenished."""
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+
+
+class _RequestUsage:
+    """Rate limit key and upstream calls of the current request."""
+
+    __slots__ = ("key", "upstream_calls")
+
+    def __init__(self):
+        self.key: Optional[str] = None
+        self.upstream_calls = 0
+
+
+_usage: ContextVar[Optional[_RequestUsage]] = ContextVar("usage", default=None)
+
+# Global limiter shared by all routes
+limiter = GCRALimiter(settings.user_rate_limit_per_minute, settings.user_rate_limit_burst)
+
+
+def record_upstream_call() -> None:
+    """Count an upstream call against the current request's user."""
+    usage = _usage.get()
+    if usage is not None:
+        usage.upstream_calls += 1
+
+
+def check_rate_limit(current_user: dict, cost: float = 1.0) -> None:
+    """
+    Admit the request against the user's allowance.
+
+    Args:
+        current_user: Current authenticated user
+        cost: Cost units charged up front
+
+    Raises:
+        HTTPException: 429 when the user's allowance is exhausted
+    """
+    usage = _usage.get()
+    if usage is None or not settings.rate_limit_enabled:
+        return
+    usage.key = current_user["sub"]
+    state = limiter.check(usage.key, cost)
+    if not state.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(state.retry_after))},
+        )
+
+
+async def enforce_rate_limit(current_user: dict = Depends(get_current_user)) -> None:
+    """
+    Admit the request against the user's allowance.
+
+    Every request costs one unit up front; upstream calls it makes are
+    charged afterwards by RateLimitMiddleware.
+
+    Args:
+        current_user: Current authenticated user
+
+    Raises:
+        HTTPException: 429 when the user's allowance is exhausted
+    """
+    check_rate_limit(current_user)
+
+
+def _headers(state: RateLimitState) -> list:
+    """Render RateLimit-* response headers (IETF draft)."""
+    return [
+        (b"ratelimit-limit", str(state.limit).encode()),
+        (b"ratelimit-remaining", str(state.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(state.reset_after)).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware charging upstream usage and adding rate limit headers.
+
+    Requests served from cache cost one unit; each CoinGecko call made while
+    handling a request adds the configured upstream cost to its user.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = _RequestUsage()
+        token = _usage.set(usage)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and usage.key is not None:
+                if usage.upstream_calls:
+                    state = limiter.charge(
+                        usage.key,
+                        usage.upstream_calls * settings.user_rate_limit_upstream_cost,
+                    )
+                else:
+                    state = limiter.peek(usage.key)
+                headers = list(message.get("headers", []))
+                headers.extend(_headers(state))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _usage.reset(token)
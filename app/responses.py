@@ -0,0 +1,110 @@
+"""Fast JSON response class and rendered page cache."""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from app import metrics
+from app.config import settings
+from app.models import PaginatedResponse
+from app.timing import span
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, BaseModel):
+        # Models built with model_construct are trusted; dump their fields
+        # without re-validating
+        return dict(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Routes return their payload (dicts or unvalidated models) wrapped in this
+    class, so FastAPI skips response_model validation while the declared
+    response_model still documents the schema. Rendering is recorded as the
+    'serialize' span.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return orjson.dumps(
+                content,
+                default=_default,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            )
+
+
+class PageCache:
+    """
+    LRU cache of rendered paginated responses.
+
+    Keys must identify the data version (e.g. a snapshot version or a list's
+    load time) as well as the query, page and sparse fieldset, so entries
+    are never served for data they were not rendered from; superseded
+    versions simply age out.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Rendered pages kept before the least recently used
+                are dropped
+        """
+        self.max_entries = max_entries
+        # key -> (rendered body, total pages)
+        self._pages: "OrderedDict[Hashable, Tuple[bytes, int]]" = OrderedDict()
+
+    def clear(self) -> None:
+        """Drop all rendered pages."""
+        self._pages.clear()
+
+    def respond(
+        self,
+        key: Optional[Hashable],
+        build: Callable[[], PaginatedResponse],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[Response, int]:
+        """
+        Serve a page from the cache, building and rendering it on a miss.
+
+        Args:
+            key: Cache key, or None to bypass the cache
+            build: Builds the page on a miss
+            headers: Extra response headers
+
+        Returns:
+            (response, total pages of the result)
+        """
+        cached = self._pages.get(key) if key is not None else None
+        if cached is not None:
+            metrics.cache_lookups_total.inc("pages", "hit")
+            self._pages.move_to_end(key)
+            body, total_pages = cached
+            return (
+                Response(body, media_type="application/json", headers=headers),
+                total_pages,
+            )
+
+        page = build()
+        response = FastJSONResponse(page, headers=headers)
+        if key is not None:
+            metrics.cache_lookups_total.inc("pages", "miss")
+            self._pages[key] = (response.body, page.total_pages)
+            if len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return response, page.total_pages
+
+
+# Global page cache instance
+page_cache = PageCache(settings.page_cache_entries)
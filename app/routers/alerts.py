@@ -0,0 +1,205 @@
+"""Alerts router: price alert rules and fired alerts of the current user."""
+
+import math
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from app.models import (
+    AlertCondition,
+    AlertEventsResponse,
+    AlertRule,
+    AlertRuleRequest,
+    PaginatedResponse,
+)
+from app.services.alerts import (
+    Rule,
+    WebhookURLError,
+    alert_engine,
+    check_webhook_url,
+)
+from app.services.coin_index import UnknownCoinsError
+from app.services.market_data import market_data_service
+from app.auth import get_current_user
+from app.rate_limit import enforce_rate_limit
+from app.config import settings
+from app.deadline import DeadlineExceeded
+from app.utils import paginate_data
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["alerts"],
+    dependencies=[Depends(enforce_rate_limit)],
+)
+
+
+def _rule(rule: Rule, active: bool = True) -> dict:
+    """Render a rule in response shape."""
+    fields = rule._asdict()
+    del fields["user"], fields["rising"]
+    fields["active"] = active
+    return fields
+
+
+@router.post("", response_model=AlertRule, status_code=status.HTTP_201_CREATED)
+async def create_alert(
+    request: AlertRuleRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Create a price alert rule.
+
+    `above` and `below` rules fire when the coin's price crosses `value`;
+    `percent_change` rules fire when it has moved by `value` percent (up if
+    positive, down if negative) from its current price. Rules fire once and
+    are checked on every market data refresh. A rule the price already
+    satisfies fires at once and is returned with `active` false.
+
+    Args:
+        request: Coin, condition, value, currency and optional webhook URL
+        current_user: Current authenticated user
+
+    Returns:
+        Created rule with the price it fires at
+    """
+    if request.condition == AlertCondition.percent_change:
+        valid = request.value != 0 and request.value > -100
+    else:
+        valid = request.value > 0
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'value' must be a positive price, or a non-zero percent "
+            "above -100 for percent_change",
+        )
+    user = current_user["sub"]
+    if alert_engine.count(user) >= settings.alert_max_rules_per_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.alert_max_rules_per_user} "
+            "active alert rules are allowed",
+        )
+    if request.webhook_url is not None:
+        try:
+            await check_webhook_url(request.webhook_url)
+        except WebhookURLError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+
+    try:
+        market_data = await market_data_service.get_market_data(
+            coin_ids=[request.coin_id], vs_currencies=["inr", "cad"]
+        )
+    except UnknownCoinsError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="CoinGecko did not answer within the latency budget "
+            "and no cached data is available",
+        )
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Coin not found",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching coin data: {str(e)}",
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching coin data: {str(e)}",
+        )
+    column = market_data.numeric[f"current_price_{request.currency.value}"]
+    price = float(column[0]) if len(column) else math.nan
+    if math.isnan(price):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {request.currency.value.upper()} price for "
+            f"{request.coin_id}",
+        )
+
+    rule, fired = alert_engine.add(
+        user,
+        request.coin_id,
+        request.condition.value,
+        request.value,
+        request.currency.value,
+        price,
+        market_data.fetched_at,
+        webhook_url=request.webhook_url,
+    )
+    return _rule(rule, active=fired is None)
+
+
+@router.get("", response_model=PaginatedResponse[AlertRule])
+async def list_alerts(
+    page_num: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(None, ge=1, le=250, description="Items per page"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    List the current user's active alert rules, oldest first.
+
+    Args:
+        page_num: Page number (default: 1)
+        per_page: Items per page (default: 10)
+        current_user: Current authenticated user
+
+    Returns:
+        Paginated list of rules
+    """
+    if per_page is None:
+        per_page = settings.default_per_page
+    rules = [_rule(rule) for rule in alert_engine.rules(current_user["sub"])]
+    return paginate_data(rules, page_num, per_page)
+
+
+@router.get("/events", response_model=AlertEventsResponse)
+async def list_alert_events(
+    after: int = Query(0, ge=0, description="Only alerts with a greater ID"),
+    limit: int = Query(100, ge=1, le=1000, description="Most alerts to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Poll the current user's fired alerts.
+
+    The latest alerts are kept per user; pass the returned `next_after` as
+    `after` to get only newer ones on the next poll.
+
+    Args:
+        after: Cursor from the previous poll (default: 0, every kept alert)
+        limit: Most alerts to return (default: 100)
+        current_user: Current authenticated user
+
+    Returns:
+        Alerts oldest first and the cursor for the next poll
+    """
+    events = alert_engine.events(current_user["sub"], after=after, limit=limit)
+    return {
+        "events": [event._asdict() for event in events],
+        "next_after": events[-1].id if events else after,
+    }
+
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_alert(
+    rule_id: int,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Delete one of the current user's active alert rules.
+
+    Args:
+        rule_id: Rule ID
+        current_user: Current authenticated user
+    """
+    if not alert_engine.remove(current_user["sub"], rule_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert rule not found",
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
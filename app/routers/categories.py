@@ -3,29 +3,60 @@
 from fastapi import APIRouter, Query, Depends, HTTPException, status
 from typing import Optional
 import httpx
-from app.models import PaginatedResponse
-from app.services.coingecko import coingecko_service
+from app.models import (
+    Category,
+    CoinMarketData,
+    MarketQuery,
+    PaginatedResponse,
+)
+from app.services.category_index import UnknownCategoryError, category_index
+from app.services.market_data import market_data_service
+from app.services.prefetch import prefetcher
 from app.auth import get_current_user
+from app.rate_limit import enforce_rate_limit
 from app.config import settings
-from app.utils import paginate_data, format_market_data
+from app.deadline import DeadlineExceeded, latency_budget
+from app.responses import page_cache
+from app.utils import (
+    FieldSet,
+    paginate_data,
+    freshness_headers,
+    get_fields,
+    get_market_query,
+    market_page,
+    market_page_key,
+)
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(
+    prefix="/categories",
+    tags=["categories"],
+    dependencies=[Depends(enforce_rate_limit)],
+)
 
 
-@router.get("", response_model=PaginatedResponse)
+@router.get("", response_model=PaginatedResponse[Category])
 async def list_categories(
     page_num: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(
         None, ge=1, le=250, description="Items per page"
     ),
+    q: Optional[str] = Query(
+        None, description="Search category names (prefix matches first)"
+    ),
+    fields: Optional[FieldSet] = Depends(get_fields(Category)),
     current_user: dict = Depends(get_current_user),
 ):
     """
     List all coin categories with pagination.
 
+    Categories are served from the in-memory category index, which is
+    refreshed from CoinGecko when stale.
+
     Args:
         page_num: Page number (default: 1)
         per_page: Items per page (default: 10)
+        q: Optional case-insensitive name search
+        fields: Sparse fieldset to return (default: all fields)
         current_user: Current authenticated user
 
     Returns:
@@ -35,17 +66,26 @@ async def list_categories(
         per_page = settings.default_per_page
 
     try:
-        categories = await coingecko_service.get_categories()
-        # Format categories to match expected structure
-        formatted_categories = []
-        for cat in categories:
-            formatted_categories.append(
-                {
-                    "category_id": cat.get("category_id", ""),
-                    "name": cat.get("name", ""),
-                }
+        categories = await category_index.get_categories()
+        stale = category_index.is_stale
+
+        def build():
+            found = category_index.search(q) if q else categories
+            return paginate_data(
+                fields.view(found) if fields else found,
+                page_num,
+                per_page,
+                stale=stale,
             )
-        return paginate_data(formatted_categories, page_num, per_page)
+
+        response, _ = page_cache.respond(
+            None if stale else (
+                "categories", category_index.loaded_at, q, page_num, per_page, fields
+            ),
+            build,
+            headers=freshness_headers(stale, category_index.age),
+        )
+        return response
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -53,13 +93,18 @@ async def list_categories(
         )
 
 
-@router.get("/{category_id}/coins", response_model=PaginatedResponse)
+@router.get(
+    "/{category_id}/coins", response_model=PaginatedResponse[CoinMarketData]
+)
 async def get_category_coins(
     category_id: str,
     page_num: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(
         None, ge=1, le=250, description="Items per page"
     ),
+    market_query: MarketQuery = Depends(get_market_query),
+    fields: Optional[FieldSet] = Depends(get_fields(CoinMarketData)),
+    budget: float = Depends(latency_budget),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -69,6 +114,9 @@ async def get_category_coins(
         category_id: Category ID
         page_num: Page number (default: 1)
         per_page: Items per page (default: 10)
+        market_query: Server-side filter, sort and top-N options
+        fields: Sparse fieldset to return (default: all fields)
+        budget: Latency budget in seconds for upstream calls
         current_user: Current authenticated user
 
     Returns:
@@ -78,14 +126,36 @@ async def get_category_coins(
         per_page = settings.default_per_page
 
     try:
-        market_data = await coingecko_service.get_coin_market_data(
+        market_data = await market_data_service.get_market_data(
             coin_ids=None,
             category=category_id,
             vs_currencies=["inr", "cad"],
         )
 
-        formatted_data = [format_market_data(coin) for coin in market_data]
-        return paginate_data(formatted_data, page_num, per_page)
+        response, total_pages = page_cache.respond(
+            market_page_key(
+                market_data, None, market_query, page_num, per_page, fields
+            ),
+            lambda: market_page(
+                market_data, market_query, fields, page_num, per_page
+            ),
+            headers=freshness_headers(market_data.stale, market_data.age),
+        )
+        prefetcher.record(
+            "/categories/{category_id}/coins", None, category_id, page_num, total_pages
+        )
+        return response
+    except UnknownCategoryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="CoinGecko did not answer within the latency budget "
+            "and no cached data is available",
+        )
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -3,21 +3,48 @@
 from fastapi import APIRouter, Query, Depends, HTTPException, status
 from typing import Optional
 import httpx
-from app.models import PaginatedResponse
-from app.services.coingecko import coingecko_service
+from app.models import (
+    Category,
+    CoinCategoriesResponse,
+    CoinListItem,
+    CoinMarketData,
+    MarketQuery,
+    PaginatedResponse,
+)
+from app.services.category_index import UnknownCategoryError, category_index
+from app.services.coin_index import UnknownCoinsError, coin_index
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.services.prefetch import prefetcher
 from app.auth import get_current_user
+from app.rate_limit import enforce_rate_limit
 from app.config import settings
-from app.utils import paginate_data, format_market_data
+from app.deadline import DeadlineExceeded, latency_budget
+from app.responses import FastJSONResponse, page_cache
+from app.utils import (
+    FieldSet,
+    paginate_data,
+    freshness_headers,
+    get_fields,
+    get_market_query,
+    market_page,
+    market_page_key,
+)
 
-router = APIRouter(prefix="/coins", tags=["coins"])
+router = APIRouter(
+    prefix="/coins",
+    tags=["coins"],
+    dependencies=[Depends(enforce_rate_limit)],
+)
 
 
-@router.get("", response_model=PaginatedResponse)
+@router.get("", response_model=PaginatedResponse[CoinListItem])
 async def list_coins(
     page_num: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(
         None, ge=1, le=250, description="Items per page"
     ),
+    fields: Optional[FieldSet] = Depends(get_fields(CoinListItem)),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -26,6 +53,7 @@ async def list_coins(
     Args:
         page_num: Page number (default: 1)
         per_page: Items per page (default: 10)
+        fields: Sparse fieldset to return (default: all fields)
         current_user: Current authenticated user
 
     Returns:
@@ -35,8 +63,20 @@ async def list_coins(
         per_page = settings.default_per_page
 
     try:
-        coins = await coingecko_service.get_all_coins()
-        return paginate_data(coins, page_num, per_page)
+        coins = await coin_index.get_coins()
+        stale = coin_index.is_stale
+        response, _ = page_cache.respond(
+            None if stale
+            else ("coins", coin_index.loaded_at, page_num, per_page, fields),
+            lambda: paginate_data(
+                fields.view(coins) if fields else coins,
+                page_num,
+                per_page,
+                stale=stale,
+            ),
+            headers=freshness_headers(stale, coin_index.age),
+        )
+        return response
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -44,7 +84,9 @@ async def list_coins(
         )
 
 
-@router.get("/market-data", response_model=PaginatedResponse)
+@router.get(
+    "/market-data", response_model=PaginatedResponse[CoinMarketData]
+)
 async def get_coin_market_data(
     coin_id: Optional[str] = Query(
         None, description="Coin ID(s) from /coins endpoint (comma-separated: bitcoin,ethereum)"
@@ -56,6 +98,9 @@ async def get_coin_market_data(
     per_page: int = Query(
         None, ge=1, le=250, description="Items per page"
     ),
+    market_query: MarketQuery = Depends(get_market_query),
+    fields: Optional[FieldSet] = Depends(get_fields(CoinMarketData)),
+    budget: float = Depends(latency_budget),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -66,12 +111,17 @@ async def get_coin_market_data(
     - coin_id: One or more coin IDs from the /coins listing endpoint
     - category: A category ID from the /categories endpoint
     - Both: Use coin_id AND category together for combined filtering
+    - Neither: the whole market ranked by market cap, once the full-market
+      crawl has completed
 
     Args:
         coin_id: Optional coin ID(s) from /coins endpoint (comma-separated for multiple)
         category: Optional category ID from /categories endpoint
         page_num: Page number (default: 1)
         per_page: Items per page (default: 10)
+        market_query: Server-side filter, sort and top-N options
+        fields: Sparse fieldset to return (default: all fields)
+        budget: Latency budget in seconds for upstream calls
         current_user: Current authenticated user
 
     Returns:
@@ -81,12 +131,13 @@ async def get_coin_market_data(
         - Get coins by ID: /coins/market-data?coin_id=bitcoin,ethereum
         - Get coins by category: /coins/market-data?category=defi
         - Get coins by both: /coins/market-data?coin_id=bitcoin&category=defi
+        - Get the top gainers: /coins/market-data?sort_by=price_change_percentage_24h&top_n=10
     """
     if per_page is None:
         per_page = settings.default_per_page
 
-    # Validate that at least one filter is provided
-    if not coin_id and not category:
+    # Without filters, only the crawled full market can be served
+    if not coin_id and not category and market_crawler.snapshot is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least one of 'coin_id' or 'category' must be provided",
@@ -103,14 +154,36 @@ async def get_coin_market_data(
             )
 
     try:
-        market_data = await coingecko_service.get_coin_market_data(
+        market_data = await market_data_service.get_market_data(
             coin_ids=coin_ids,
             category=category,
             vs_currencies=["inr", "cad"],
         )
 
-        formatted_data = [format_market_data(coin) for coin in market_data]
-        return paginate_data(formatted_data, page_num, per_page)
+        response, total_pages = page_cache.respond(
+            market_page_key(
+                market_data, coin_ids, market_query, page_num, per_page, fields
+            ),
+            lambda: market_page(
+                market_data, market_query, fields, page_num, per_page
+            ),
+            headers=freshness_headers(market_data.stale, market_data.age),
+        )
+        prefetcher.record(
+            "/coins/market-data", coin_ids, category, page_num, total_pages
+        )
+        return response
+    except (UnknownCoinsError, UnknownCategoryError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="CoinGecko did not answer within the latency budget "
+            "and no cached data is available",
+        )
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -128,7 +201,9 @@ async def get_coin_market_data(
         )
 
 
-@router.get("/{coin_id}", response_model=PaginatedResponse)
+@router.get(
+    "/{coin_id}", response_model=PaginatedResponse[CoinMarketData]
+)
 async def get_coin_by_id(
     coin_id: str,
     page_num: int = Query(1, ge=1, description="Page number"),
@@ -136,6 +211,9 @@ async def get_coin_by_id(
         None, ge=1, le=250, description="Items per page"
     ),
     category: Optional[str] = Query(None, description="Filter by category"),
+    market_query: MarketQuery = Depends(get_market_query),
+    fields: Optional[FieldSet] = Depends(get_fields(CoinMarketData)),
+    budget: float = Depends(latency_budget),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -149,6 +227,9 @@ async def get_coin_by_id(
         page_num: Page number (default: 1)
         per_page: Items per page (default: 10)
         category: Optional category ID to filter coins
+        market_query: Server-side filter, sort and top-N options
+        fields: Sparse fieldset to return (default: all fields)
+        budget: Latency budget in seconds for upstream calls
         current_user: Current authenticated user
 
     Returns:
@@ -161,14 +242,36 @@ async def get_coin_by_id(
     coin_ids = [cid.strip() for cid in coin_id.split(",") if cid.strip()]
 
     try:
-        market_data = await coingecko_service.get_coin_market_data(
+        market_data = await market_data_service.get_market_data(
             coin_ids=coin_ids if coin_ids else None,
             category=category,
             vs_currencies=["inr", "cad"],
         )
 
-        formatted_data = [format_market_data(coin) for coin in market_data]
-        return paginate_data(formatted_data, page_num, per_page)
+        response, total_pages = page_cache.respond(
+            market_page_key(
+                market_data, coin_ids, market_query, page_num, per_page, fields
+            ),
+            lambda: market_page(
+                market_data, market_query, fields, page_num, per_page
+            ),
+            headers=freshness_headers(market_data.stale, market_data.age),
+        )
+        prefetcher.record(
+            "/coins/{coin_id}", coin_ids, category, page_num, total_pages
+        )
+        return response
+    except UnknownCoinsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="CoinGecko did not answer within the latency budget "
+            "and no cached data is available",
+        )
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -185,3 +288,54 @@ async def get_coin_by_id(
             detail=f"Error fetching coin data: {str(e)}",
         )
 
+
+@router.get("/{coin_id}/categories", response_model=CoinCategoriesResponse)
+async def get_coin_categories(
+    coin_id: str,
+    page_num: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(
+        None, ge=1, le=250, description="Items per page"
+    ),
+    fields: Optional[FieldSet] = Depends(get_fields(Category)),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get the categories a coin belongs to.
+
+    Served from the category index's reverse index, which is filled in as
+    category membership is crawled in the background; crawled_categories
+    and total_categories show how complete it is.
+
+    Args:
+        coin_id: Coin ID
+        page_num: Page number (default: 1)
+        per_page: Items per page (default: 10)
+        fields: Sparse fieldset to return (default: all fields)
+        current_user: Current authenticated user
+
+    Returns:
+        Paginated list of categories with index coverage
+    """
+    if per_page is None:
+        per_page = settings.default_per_page
+
+    try:
+        await category_index.get_categories()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching categories: {str(e)}",
+        )
+
+    categories = category_index.categories_of(coin_id)
+    page = paginate_data(
+        fields.view(categories) if fields else categories, page_num, per_page
+    )
+    crawled, total = category_index.coverage
+    return FastJSONResponse(
+        {
+            **dict(page),
+            "crawled_categories": crawled,
+            "total_categories": total,
+        }
+    )
@@ -0,0 +1,180 @@
+"""Dashboard router: several coin and category queries in one request."""
+
+import asyncio
+from typing import Dict, Hashable, List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from app.models import (
+    Category,
+    CoinListItem,
+    CoinMarketData,
+    DashboardOperation,
+    DashboardQuery,
+    DashboardRequest,
+    DashboardResponse,
+    MarketQuery,
+)
+from app.auth import get_current_user
+from app.rate_limit import check_rate_limit
+from app.config import settings
+from app.deadline import latency_budget
+from app.routers import categories, coins
+from app.utils import get_fields, get_market_query
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+_coin_fields = get_fields(CoinListItem)
+_category_fields = get_fields(Category)
+_market_fields = get_fields(CoinMarketData)
+
+
+def _market_key(query: DashboardQuery) -> Optional[Hashable]:
+    """
+    Get the market data a sub-query reads, if any.
+
+    Sub-queries reading the same data run one after another, so only the
+    first can miss the cache and fetch from CoinGecko.
+    """
+    if query.op == DashboardOperation.market_data:
+        coin_ids = {cid.strip() for cid in (query.coin_id or "").split(",")}
+        coin_ids.discard("")
+        return (tuple(sorted(coin_ids)) or None, query.category)
+    if query.op == DashboardOperation.category_coins:
+        return (None, query.category)
+    return None
+
+
+def _market_query(query: DashboardQuery) -> MarketQuery:
+    """Get a sub-query's market data filter and sort options."""
+    return get_market_query(
+        sort_by=query.sort_by,
+        order=query.order,
+        min_market_cap=query.min_market_cap,
+        max_price=query.max_price,
+        top_n=query.top_n,
+    )
+
+
+async def _call(query: DashboardQuery, current_user: dict, budget: float) -> Response:
+    """Run a sub-query through its route handler."""
+    op = query.op
+    if op == DashboardOperation.coins:
+        return await coins.list_coins(
+            page_num=query.page_num,
+            per_page=query.per_page,
+            fields=_coin_fields(fields=query.fields),
+            current_user=current_user,
+        )
+    if op == DashboardOperation.categories:
+        return await categories.list_categories(
+            page_num=query.page_num,
+            per_page=query.per_page,
+            q=query.q,
+            fields=_category_fields(fields=query.fields),
+            current_user=current_user,
+        )
+    if op == DashboardOperation.market_data:
+        return await coins.get_coin_market_data(
+            coin_id=query.coin_id,
+            category=query.category,
+            page_num=query.page_num,
+            per_page=query.per_page,
+            market_query=_market_query(query),
+            fields=_market_fields(fields=query.fields),
+            budget=budget,
+            current_user=current_user,
+        )
+    if op == DashboardOperation.category_coins:
+        if not query.category:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="'category' is required",
+            )
+        return await categories.get_category_coins(
+            category_id=query.category,
+            page_num=query.page_num,
+            per_page=query.per_page,
+            market_query=_market_query(query),
+            fields=_market_fields(fields=query.fields),
+            budget=budget,
+            current_user=current_user,
+        )
+    if not query.coin_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'coin_id' is required",
+        )
+    return await coins.get_coin_categories(
+        coin_id=query.coin_id,
+        page_num=query.page_num,
+        per_page=query.per_page,
+        fields=_category_fields(fields=query.fields),
+        current_user=current_user,
+    )
+
+
+async def _result(query: DashboardQuery, current_user: dict, budget: float) -> bytes:
+    """Run a sub-query and render its result entry as JSON."""
+    try:
+        response = await _call(query, current_user, budget)
+    except HTTPException as e:
+        return orjson.dumps({"status": e.status_code, "detail": e.detail})
+    except Exception as e:
+        return orjson.dumps(
+            {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": str(e)}
+        )
+    # Embed the rendered (possibly page-cached) body without re-encoding it
+    return b'{"status":%d,"body":%b}' % (response.status_code, response.body)
+
+
+@router.post("", response_model=DashboardResponse)
+async def dashboard(
+    request: DashboardRequest,
+    budget: float = Depends(latency_budget),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Run named coin and category sub-queries in one request.
+
+    The token is checked once and each distinct sub-query costs one rate
+    limit unit. Sub-queries run concurrently through the same handlers,
+    caches and latency budget as their routes; identical sub-queries run
+    once, and those reading the same market data share one upstream fetch.
+    A failing sub-query reports its status and detail without failing the
+    others.
+
+    Args:
+        request: Sub-queries by name
+        budget: Latency budget in seconds shared by all sub-queries
+        current_user: Current authenticated user
+
+    Returns:
+        Each sub-query's status and response body (or error detail) by name
+    """
+    if len(request.queries) > settings.dashboard_max_queries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.dashboard_max_queries} queries are allowed",
+        )
+    distinct = list(dict.fromkeys(request.queries.values()))
+    check_rate_limit(current_user, cost=len(distinct))
+
+    groups: Dict[Hashable, List[DashboardQuery]] = {}
+    for position, query in enumerate(distinct):
+        key = _market_key(query)
+        groups.setdefault(position if key is None else key, []).append(query)
+
+    results: Dict[DashboardQuery, bytes] = {}
+
+    async def run_group(queries: List[DashboardQuery]) -> None:
+        for query in queries:
+            results[query] = await _result(query, current_user, budget)
+
+    await asyncio.gather(*(run_group(queries) for queries in groups.values()))
+
+    entries = b",".join(
+        orjson.dumps(name) + b":" + results[query]
+        for name, query in request.queries.items()
+    )
+    return Response(b'{"results":{%b}}' % entries, media_type="application/json")
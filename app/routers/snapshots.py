@@ -0,0 +1,75 @@
+"""Snapshots router."""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import Optional
+from app.models import ExportFormat
+from app.services.market_data import market_data_service
+from app.auth import get_current_user
+from app.rate_limit import enforce_rate_limit
+from app import export
+
+router = APIRouter(
+    prefix="/snapshots",
+    tags=["snapshots"],
+    dependencies=[Depends(enforce_rate_limit)],
+)
+
+
+@router.get(
+    "/markets",
+    response_class=Response,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in export.MEDIA_TYPES.values()},
+            "description": "The crawled market, or every cached coin",
+        },
+        304: {"description": "Snapshot unchanged since the given ETag"},
+        406: {"description": "No acceptable format is available"},
+    },
+)
+async def export_markets(
+    export_format: Optional[ExportFormat] = Query(
+        None, alias="format", description="Export format; overrides the Accept header"
+    ),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Export the current market snapshot in one columnar download.
+
+    Covers the full-market crawl while it is fresh, and otherwise every
+    cached coin (including expired entries), with price and market cap
+    columns per currency, ordered by market cap. The format is
+    taken from `format=` or the Accept header: Arrow IPC stream, Parquet
+    or CSV. Exports are rendered once per snapshot version and identified
+    by an ETag hashed from their content, so it holds across workers.
+
+    Args:
+        export_format: Optional export format (`format=`)
+        accept: Accept header used when no format is given
+        if_none_match: ETag of a previously downloaded export
+        current_user: Current authenticated user
+
+    Returns:
+        Serialized snapshot
+    """
+    fmt = export_format.value if export_format else export.negotiate(accept)
+    if fmt is None or not export.available(fmt):
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Available formats: "
+            + ", ".join(f for f in export.MEDIA_TYPES if export.available(f)),
+        )
+
+    snapshot = market_data_service.market_snapshot()
+    body, etag = await export.export_cache.get(snapshot, fmt)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = (
+        f'attachment; filename="markets.{export.EXTENSIONS[fmt]}"'
+    )
+    headers["X-Snapshot-Coins"] = str(len(snapshot))
+    return Response(body, media_type=export.MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,516 @@
+"""Production launcher: pre-forked uvicorn workers sharing one socket."""
+
+import asyncio
+import gc
+import importlib.util
+import logging
+import mmap
+import os
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Set
+
+import uvicorn
+
+from app.config import settings
+from app.main import app
+from app.services.alerts import alert_engine
+from app.services.category_index import category_index
+from app.services.coin_index import coin_index
+from app.services.coingecko import coingecko_service
+from app.services.market_crawler import market_crawler
+from app.services.rate_budget import upstream_budget
+from app.services.warmup import warmup
+
+logger = logging.getLogger("app.server")
+
+# Longest a replacement worker may take to start serving, on top of its
+# warm-up timeout, before a rolling restart gives up on it
+_START_TIMEOUT_SECONDS = 30.0
+
+# Written by a worker to its supervisor pipe once serving and warmed up
+_WARM = b"w"
+
+# Time a stopping worker keeps reading connections it accepted just before
+# it stopped accepting, so their requests are served rather than dropped
+_DRAIN_SECONDS = 0.5
+
+
+def cpu_limit() -> int:
+    """
+    Count the CPUs this process may actually use.
+
+    Honours CPU affinity and a cgroup v2 CPU quota (as set by container
+    runtimes), which os.cpu_count() ignores.
+
+    Returns:
+        Number of usable CPUs (at least 1)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def worker_count(configured: int = 0) -> int:
+    """
+    Resolve the number of worker processes.
+
+    Args:
+        configured: Explicit worker count, or 0 for one per usable CPU
+
+    Returns:
+        Number of workers to run
+    """
+    if configured > 0:
+        return configured
+    return cpu_limit()
+
+
+def _pick(configured: str, module: str, fallback: str) -> str:
+    """Use an optional accelerator when installed and not overridden."""
+    if configured != "auto":
+        return configured
+    if importlib.util.find_spec(module) is not None:
+        return module
+    return fallback
+
+
+def event_loop() -> str:
+    """Event loop implementation: uvloop when available."""
+    return _pick(settings.server_loop, "uvloop", "asyncio")
+
+
+def http_protocol() -> str:
+    """HTTP parser implementation: httptools when available."""
+    return _pick(settings.server_http, "httptools", "h11")
+
+
+def preload() -> None:
+    """
+    Fetch shared reference data once in the master before forking.
+
+    Covers the category and coin lists, exchange rates and the market
+    crawl. Workers inherit the loaded data copy-on-write instead of each
+    fetching it at startup. Failures are logged; workers load lazily instead.
+    """
+
+    async def load() -> None:
+        try:
+            await category_index.get_categories()
+            await coin_index.get_coins()
+            if settings.use_exchange_rates:
+                await coingecko_service.get_exchange_rates()
+            if settings.market_crawl_enabled:
+                await market_crawler.crawl()
+        except Exception:
+            logger.warning("Preload failed; workers will load on demand")
+        finally:
+            # Connections belong to this short-lived loop; workers need a
+            # fresh pool on their own loop
+            await coingecko_service.close()
+
+    asyncio.run(load())
+    coingecko_service.reset_client()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """
+    Create the listening socket shared by every worker.
+
+    Args:
+        host: Bind address
+        port: Bind port (0 for an ephemeral port)
+
+    Returns:
+        Bound, listening socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _server_config() -> uvicorn.Config:
+    """Build the uvicorn configuration for one worker."""
+    return uvicorn.Config(
+        app,
+        loop=event_loop(),
+        http=http_protocol(),
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_seconds,
+        timeout_keep_alive=settings.server_keep_alive_seconds,
+    )
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    uvicorn server for one worker.
+
+    Reports to the supervisor on a pipe once it is serving with its warm-up
+    finished, so that a rolling restart stops the worker it
+    replaces only then and readiness can cover every worker. On shutdown it
+    stops accepting first and drains briefly: uvicorn closes connections
+    that have not sent a request yet, which would otherwise drop requests
+    accepted just before the signal.
+    """
+
+    def __init__(self, config: uvicorn.Config, status_fd: Optional[int] = None):
+        """
+        Initialize the server.
+
+        Args:
+            config: uvicorn configuration
+            status_fd: Pipe to report to the supervisor on
+        """
+        super().__init__(config)
+        self.status_fd = status_fd
+        self._report_task: Optional[asyncio.Task] = None
+
+    async def _report_warm(self) -> None:
+        while not warmup.warm:
+            await asyncio.sleep(0.1)
+        try:
+            os.write(self.status_fd, _WARM)
+        except OSError:
+            # Supervisor gone; it no longer needs reports
+            pass
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started and self.status_fd is not None:
+            self._report_task = asyncio.create_task(self._report_warm())
+
+    async def shutdown(self, sockets=None) -> None:
+        if self._report_task is not None:
+            self._report_task.cancel()
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(_DRAIN_SECONDS)
+        await super().shutdown(sockets=sockets)
+
+
+class Supervisor:
+    """
+    Master process managing pre-forked uvicorn workers.
+
+    Signals:
+        SIGHUP: Rolling restart, replacing workers one at a time
+        SIGTTIN / SIGTTOU: Add or remove one worker
+        SIGTERM / SIGINT: Graceful shutdown
+
+    Workers share a private directory: the market crawl runs in one worker
+    at a time and is published there for the others, and alert rules are
+    stored there. Each worker spends an
+    equal share of the upstream rate budget. The
+    target worker count is shared with the workers, and on every resize
+    they are sent SIGUSR1 to recompute their share from it.
+
+    Workers are forked from the preloaded master, so a restart refreshes
+    worker state but does not pick up new code; redeploy for that.
+    """
+
+    def __init__(self, sock: socket.socket, workers: int):
+        """
+        Initialize the supervisor.
+
+        Args:
+            sock: Listening socket inherited by workers
+            workers: Number of workers to keep running
+        """
+        self.sock = sock
+        self.target = workers
+        self.workers: Dict[int, float] = {}
+        self._signal: Optional[int] = None
+        self._stopping = False
+        # Worker PID -> read end of its status pipe
+        self._pipes: Dict[int, int] = {}
+        self._warm: Set[int] = set()
+        # Shared with every worker: 1 once the target number of workers
+        # have finished warming up, which /ready requires
+        self.ready = mmap.mmap(-1, 1)
+        # Shared with every worker: the target number of workers
+        self.size = mmap.mmap(-1, 4)
+        self.size[:] = struct.pack("I", workers)
+        # State shared between workers through files, removed on shutdown
+        self.shared_dir = tempfile.mkdtemp(prefix="vetty-")
+
+    def spawn(self, wait_warm: bool = False) -> Optional[int]:
+        """
+        Fork one worker serving the shared socket.
+
+        Args:
+            wait_warm: Wait until the worker is serving and warmed up
+
+        Returns:
+            Worker process ID, or None if it did not get there in time
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            self.workers[pid] = time.monotonic()
+            self._pipes[pid] = read_fd
+            if wait_warm and not self._wait_warm(pid):
+                logger.warning("Worker %d did not start serving warm", pid)
+                self.stop_worker(pid)
+                return None
+            return pid
+
+        # Worker process
+        for sig in (
+            signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU,
+            signal.SIGTERM, signal.SIGINT,
+        ):
+            signal.signal(sig, signal.SIG_DFL)
+        for fd in [read_fd, *self._pipes.values()]:
+            os.close(fd)
+        # Frozen preloaded objects stay out of collections (and their pages
+        # shared); only objects created from here on are tracked
+        gc.enable()
+        status = 0
+        try:
+            self._configure_worker()
+            WorkerServer(_server_config(), status_fd=write_fd).run(
+                sockets=[self.sock]
+            )
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _configure_worker(self) -> None:
+        """Split process-local shared state between workers."""
+        self._share_budget()
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self._share_budget())
+        warmup.cluster_ready = lambda: self.ready[0] == 1
+        market_crawler.share(self.shared_dir)
+        alert_engine.share(self.shared_dir)
+
+    def _share_budget(self) -> None:
+        """Take this worker's share of the upstream rate budget."""
+        (workers,) = struct.unpack("I", self.size[:])
+        upstream_budget.set_rate(settings.upstream_rate_limit_per_minute / workers)
+
+    def resize(self, target: int) -> None:
+        """
+        Change the target number of workers and reshare the rate budget.
+
+        Running workers are told to recompute their share; the caller starts
+        or stops workers to reach the target.
+
+        Args:
+            target: Number of workers to keep running
+        """
+        self.target = target
+        self.size[:] = struct.pack("I", target)
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+        self._publish()
+
+    def _wait_warm(self, pid: int) -> bool:
+        """Wait for a new worker to report that it is serving warm."""
+        deadline = (
+            time.monotonic() + settings.warmup_timeout_seconds + _START_TIMEOUT_SECONDS
+        )
+        while pid in self._pipes and pid not in self._warm:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.poll(min(remaining, 0.1))
+        return pid in self._warm
+
+    def poll(self, timeout: float) -> None:
+        """
+        Read worker status reports, waiting up to a timeout for one.
+
+        Args:
+            timeout: Longest wait in seconds
+        """
+        if not self._pipes:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select(list(self._pipes.values()), [], [], timeout)
+        pids = {fd: pid for pid, fd in self._pipes.items()}
+        for fd in readable:
+            pid = pids[fd]
+            reports = os.read(fd, 64)
+            if not reports:
+                # Worker exited
+                self._forget(pid)
+                continue
+            if _WARM in reports:
+                self._warm.add(pid)
+        self._publish()
+
+    def _forget(self, pid: int) -> None:
+        """Drop a worker's status once it has stopped."""
+        fd = self._pipes.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+        self._warm.discard(pid)
+        self._publish()
+
+    def _publish(self) -> None:
+        """Share whether enough workers are warm to take traffic."""
+        warm = len(self._warm & self.workers.keys())
+        self.ready[0] = 1 if warm >= self.target else 0
+
+    def stop_worker(self, pid: int) -> None:
+        """
+        Stop one worker gracefully, killing it if it overruns the timeout.
+
+        Args:
+            pid: Worker process ID
+        """
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        self._wait(pid)
+
+    def _wait(self, pid: int) -> None:
+        """Wait for a stopping worker to exit."""
+        deadline = time.monotonic() + settings.server_graceful_timeout_seconds + 5
+        try:
+            while not os.waitpid(pid, os.WNOHANG)[0]:
+                if time.monotonic() >= deadline:
+                    logger.warning("Worker %d did not stop in time; killing it", pid)
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                    break
+                time.sleep(0.05)
+        except ChildProcessError:
+            pass
+        self.workers.pop(pid, None)
+        self._forget(pid)
+
+    def rolling_restart(self) -> None:
+        """
+        Replace every worker, one at a time.
+
+        Each worker is stopped only once its replacement is serving and
+        warmed up, so the socket never has fewer than the target number of
+        warm workers accepting and readiness holds throughout. A worker whose
+        replacement fails to start is kept.
+        """
+        for pid in list(self.workers):
+            if self.spawn(wait_warm=True) is None:
+                logger.warning("Keeping worker %d; rolling restart aborted", pid)
+                return
+            self.stop_worker(pid)
+        logger.info("Rolling restart finished")
+
+    def reap(self) -> None:
+        """Collect exited workers and start replacements."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self.workers.pop(pid, None) is not None and not self._stopping:
+                logger.warning(
+                    "Worker %d exited with status %d; restarting", pid, status
+                )
+            self._forget(pid)
+
+    def _on_signal(self, signum, frame) -> None:
+        self._signal = signum
+
+    def run(self) -> None:
+        """Start the workers and supervise them until shutdown."""
+        for sig in (
+            signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU,
+            signal.SIGTERM, signal.SIGINT,
+        ):
+            signal.signal(sig, self._on_signal)
+        # Workers handle it once configured; until then it must not kill them
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+        while True:
+            self.reap()
+            signum, self._signal = self._signal, None
+            if signum in (signal.SIGTERM, signal.SIGINT):
+                break
+            if signum == signal.SIGHUP:
+                self.rolling_restart()
+            elif signum == signal.SIGTTIN:
+                self.resize(self.target + 1)
+            elif signum == signal.SIGTTOU and self.target > 1:
+                # Reshare only once the worker has stopped, so that the rest
+                # never overspend together
+                self.target -= 1
+                self.stop_worker(max(self.workers))
+                self.resize(self.target)
+
+            while len(self.workers) < self.target:
+                self.spawn()
+            self.poll(0.1)
+
+        self._stopping = True
+        logger.info("Shutting down %d workers", len(self.workers))
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            self._wait(pid)
+        shutil.rmtree(self.shared_dir, ignore_errors=True)
+
+
+def main() -> None:
+    """Run the API with settings-driven workers, loop and HTTP parser."""
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    workers = worker_count(settings.server_workers)
+    sock = bind_socket(settings.server_host, settings.server_port)
+    logger.info(
+        "Serving on %s:%d with %d workers (loop=%s, http=%s)",
+        settings.server_host,
+        sock.getsockname()[1],
+        workers,
+        event_loop(),
+        http_protocol(),
+    )
+
+    if workers == 1 or not hasattr(os, "fork"):
+        if settings.server_preload:
+            preload()
+        uvicorn.Server(_server_config()).run(sockets=[sock])
+        return
+
+    # Keep preloaded objects out of the collector so that collections in
+    # workers never write to (and so copy) their pages: no collections
+    # until they are frozen, then workers re-enable the collector
+    gc.disable()
+    if settings.server_preload:
+        preload()
+    gc.freeze()
+    Supervisor(sock, workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
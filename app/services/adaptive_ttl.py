@@ -0,0 +1,149 @@
+"""Per-key cache TTLs adapted to volatility, demand and rate budget."""
+
+import math
+import time
+from typing import Dict, Hashable, Optional
+from app import metrics
+from app.config import settings
+from app.services.rate_budget import upstream_budget
+
+# Weight of the newest observation in the moving averages
+_ALPHA = 0.3
+_SECONDS_PER_DAY = 86400.0
+
+# Tracked keys kept before the least recently used are dropped
+_MAX_KEYS = 50000
+
+
+class _KeyStats:
+    """Moving averages tracked for one cache key."""
+
+    __slots__ = ("price", "observed_at", "volatility", "interval", "requested_at")
+
+    def __init__(self):
+        self.price: Optional[float] = None
+        self.observed_at: Optional[float] = None
+        # Relative price movement per square-root second (random-walk scale)
+        self.volatility: Optional[float] = None
+        # Seconds between requests
+        self.interval: Optional[float] = None
+        self.requested_at: Optional[float] = None
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    """Update an exponentially weighted moving average."""
+    return value if previous is None else previous + _ALPHA * (value - previous)
+
+
+class AdaptiveTTL:
+    """
+    Chooses how long each cache entry stays fresh.
+
+    Three signals scale the base TTL, and the result is clamped to the
+    configured bounds:
+
+    - Volatility: prices follow roughly a random walk, so the time until a
+      price drifts by the configured tolerance shrinks with the square of
+      its volatility. Volatility comes from the price changes seen across
+      refreshes, seeded from the 24h change before there is any history.
+    - Demand: keys requested more often than once per base TTL get shorter
+      TTLs, since each refresh serves more requests; rarely requested keys
+      get longer ones.
+    - Budget: TTLs stretch as the shared upstream rate budget runs low.
+    """
+
+    def __init__(self, cache: str):
+        """
+        Initialize the policy.
+
+        Args:
+            cache: Cache name used as the metrics label
+        """
+        self.cache = cache
+        self._stats: Dict[Hashable, _KeyStats] = {}
+
+    def clear(self) -> None:
+        """Forget all tracked keys."""
+        self._stats.clear()
+
+    def _touch(self, key: Hashable) -> _KeyStats:
+        """Get a key's stats as the most recently used, dropping the oldest."""
+        stats = self._stats.pop(key, None)
+        if stats is None:
+            stats = _KeyStats()
+        self._stats[key] = stats
+        while len(self._stats) > _MAX_KEYS:
+            del self._stats[next(iter(self._stats))]
+        return stats
+
+    def record_request(self, key: Hashable) -> None:
+        """
+        Record that a key was requested.
+
+        Args:
+            key: Cache key
+        """
+        stats = self._touch(key)
+        now = time.monotonic()
+        if stats.requested_at is not None:
+            stats.interval = _ewma(stats.interval, now - stats.requested_at)
+        stats.requested_at = now
+
+    def observe(
+        self,
+        key: Hashable,
+        price: Optional[float],
+        change_24h_percent: Optional[float] = None,
+    ) -> None:
+        """
+        Record a freshly fetched price for a key.
+
+        Args:
+            key: Cache key
+            price: Current price, or None if unknown
+            change_24h_percent: 24h price change, used until price history
+                is available
+        """
+        if price is None or price != price or price <= 0:
+            return
+        stats = self._touch(key)
+        now = time.monotonic()
+        if stats.price is not None and now > stats.observed_at:
+            move = abs(price - stats.price) / stats.price
+            stats.volatility = _ewma(
+                stats.volatility, move / math.sqrt(now - stats.observed_at)
+            )
+        elif stats.volatility is None and change_24h_percent is not None:
+            if change_24h_percent == change_24h_percent:
+                stats.volatility = abs(change_24h_percent) / 100 / math.sqrt(
+                    _SECONDS_PER_DAY
+                )
+        stats.price = price
+        stats.observed_at = now
+
+    def ttl(self, key: Hashable) -> float:
+        """
+        Choose the TTL for a key's newly cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            TTL in seconds within the configured bounds
+        """
+        base = float(settings.market_data_ttl_seconds)
+        ttl = base
+        stats = self._stats.get(key)
+        if stats is not None:
+            if stats.volatility:
+                ttl = (settings.market_data_price_tolerance / stats.volatility) ** 2
+            if stats.interval:
+                ttl *= min(4.0, max(0.5, math.sqrt(stats.interval / base)))
+        ttl /= max(upstream_budget.remaining_fraction, 0.25)
+
+        ttl = min(
+            float(settings.market_data_ttl_max_seconds),
+            max(float(settings.market_data_ttl_min_seconds), ttl),
+        )
+        metrics.cache_ttl_seconds.observe(ttl, self.cache)
+        return ttl
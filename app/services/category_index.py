@@ -0,0 +1,311 @@
+"""In-memory category index with name search and coin membership."""
+
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from app.config import settings
+from app.services.coingecko import coingecko_service, is_upstream_failure
+from app.services.rate_budget import upstream_budget
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownCategoryError(LookupError):
+    """The requested category does not exist."""
+
+    def __init__(self, category_id: str):
+        super().__init__(f"Unknown category ID: {category_id}")
+        self.category_id = category_id
+
+
+class CategoryIndex:
+    """
+    Category list with name search and a coin-to-categories reverse index.
+
+    The category list is refreshed periodically. Membership of each category
+    is crawled one category at a time under the shared upstream rate budget,
+    so the reverse index fills in incrementally.
+    """
+
+    def __init__(self):
+        self.categories: List[Dict[str, str]] = []
+        self.loaded_at: Optional[float] = None
+        self._ids: FrozenSet[str] = frozenset()
+        # (lowercase name, position in self.categories), sorted for prefix search
+        self._names: List[Tuple[str, int]] = []
+        self._members: Dict[str, FrozenSet[str]] = {}
+        self._crawled_at: Dict[str, float] = {}
+        self._coin_categories: Dict[str, Set[str]] = {}
+        # Categories requested by clients but not crawled yet, crawled first
+        self._wanted: Dict[str, None] = {}
+        self._lock = asyncio.Lock()
+
+    def clear(self) -> None:
+        """Drop all indexed data."""
+        self.__init__()
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the category list needs refreshing."""
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at
+            >= settings.category_index_refresh_seconds
+        )
+
+    @property
+    def age(self) -> float:
+        """Seconds since the category list was loaded."""
+        return time.monotonic() - self.loaded_at
+
+    def load(self, categories: List[Dict[str, str]]) -> None:
+        """
+        Replace the category list.
+
+        Args:
+            categories: Raw categories from /coins/categories/list
+        """
+        self.categories = [
+            {
+                "category_id": category.get("category_id", ""),
+                "name": category.get("name", ""),
+            }
+            for category in categories
+        ]
+        self._names = sorted(
+            (category["name"].lower(), i)
+            for i, category in enumerate(self.categories)
+        )
+        known = self._ids = frozenset(
+            category["category_id"] for category in self.categories
+        )
+        for category_id in list(self._members):
+            if category_id not in known:
+                self._set_members(category_id, frozenset())
+                del self._members[category_id]
+                self._crawled_at.pop(category_id, None)
+        self.loaded_at = time.monotonic()
+
+    async def get_categories(self) -> List[Dict[str, str]]:
+        """
+        Get the category list, refreshing it from CoinGecko when stale.
+
+        If the refresh fails because CoinGecko is unavailable, the previous
+        list keeps being served (is_stale stays True) for up to the maximum
+        stale-if-error age.
+
+        Returns:
+            List of category dictionaries with category_id and name
+        """
+        if self.is_stale:
+            async with self._lock:
+                if self.is_stale:
+                    try:
+                        self.load(await coingecko_service.get_categories())
+                    except Exception as e:
+                        if (
+                            self.loaded_at is None
+                            or not is_upstream_failure(e)
+                            or self.age > settings.stale_if_error_max_age_seconds
+                        ):
+                            raise
+                        logger.warning("Serving stale category list: %r", e)
+        return self.categories
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        """
+        Search categories by name, prefix matches first.
+
+        Args:
+            query: Case-insensitive search text
+
+        Returns:
+            Categories whose name starts with the query, followed by those
+            whose name or ID contains it
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.categories
+
+        start = bisect.bisect_left(self._names, (query,))
+        positions = []
+        for name, i in self._names[start:]:
+            if not name.startswith(query):
+                break
+            positions.append(i)
+        prefixed = set(positions)
+        positions.extend(
+            i
+            for i, category in enumerate(self.categories)
+            if i not in prefixed
+            and (
+                query in category["name"].lower()
+                or query in category["category_id"].lower()
+            )
+        )
+        return [self.categories[i] for i in positions]
+
+    def check(self, category_id: str) -> None:
+        """
+        Reject a category ID missing from the loaded category list.
+
+        Before the list is first loaded every ID passes.
+
+        Args:
+            category_id: Category ID
+
+        Raises:
+            UnknownCategoryError: If the category is not listed
+        """
+        if self.loaded_at is not None and category_id not in self._ids:
+            raise UnknownCategoryError(category_id)
+
+    def members(self, category_id: str) -> Optional[FrozenSet[str]]:
+        """
+        Get the coin IDs of a category.
+
+        Args:
+            category_id: Category ID
+
+        Returns:
+            Set of coin IDs, or None if the category has not been crawled
+        """
+        return self._members.get(category_id)
+
+    def prioritize(self, category_id: str) -> None:
+        """
+        Crawl a category's membership ahead of the regular order.
+
+        Args:
+            category_id: Category ID requested by a client
+        """
+        if category_id not in self._members:
+            self._wanted[category_id] = None
+
+    def categories_of(self, coin_id: str) -> List[Dict[str, str]]:
+        """
+        Get the categories a coin belongs to, among crawled categories.
+
+        Args:
+            coin_id: Coin ID
+
+        Returns:
+            List of category dictionaries in category list order
+        """
+        category_ids = self._coin_categories.get(coin_id, ())
+        return [
+            category
+            for category in self.categories
+            if category["category_id"] in category_ids
+        ]
+
+    @property
+    def coverage(self) -> Tuple[int, int]:
+        """Number of crawled categories and total categories."""
+        return len(self._members), len(self.categories)
+
+    def _set_members(self, category_id: str, coin_ids: FrozenSet[str]) -> None:
+        """Replace a category's membership, updating the reverse index."""
+        previous = self._members.get(category_id, frozenset())
+        for coin_id in previous - coin_ids:
+            categories = self._coin_categories.get(coin_id)
+            if categories is not None:
+                categories.discard(category_id)
+                if not categories:
+                    del self._coin_categories[coin_id]
+        for coin_id in coin_ids - previous:
+            self._coin_categories.setdefault(coin_id, set()).add(category_id)
+        self._members[category_id] = coin_ids
+        self._crawled_at[category_id] = time.monotonic()
+        self._wanted.pop(category_id, None)
+
+    async def crawl_category(
+        self, category_id: str, background: bool = False
+    ) -> FrozenSet[str]:
+        """
+        Fetch and index the full membership of one category.
+
+        Args:
+            category_id: Category ID
+            background: Wait for spare rate budget before each upstream page
+
+        Returns:
+            Set of coin IDs in the category
+        """
+        coin_ids: Set[str] = set()
+        page = 1
+        while True:
+            if background:
+                await upstream_budget.wait_for(
+                    reserve=settings.background_budget_reserve
+                )
+            rows = await coingecko_service.get_markets_page(
+                "usd", category=category_id, page=page, per_page=250
+            )
+            coin_ids.update(row["id"] for row in rows)
+            if len(rows) < 250:
+                break
+            page += 1
+        members = frozenset(coin_ids)
+        self._set_members(category_id, members)
+        return members
+
+    def next_to_crawl(self) -> Optional[str]:
+        """
+        Pick the category whose membership most needs crawling.
+
+        Returns:
+            Client-requested categories first, then never-crawled ones, then
+            the stalest one past its TTL, or None if everything is fresh
+        """
+        known = {category["category_id"] for category in self.categories}
+        for category_id in list(self._wanted):
+            if category_id in known:
+                return category_id
+            del self._wanted[category_id]
+
+        oldest_id, oldest_at = None, None
+        for category in self.categories:
+            category_id = category["category_id"]
+            crawled_at = self._crawled_at.get(category_id)
+            if crawled_at is None:
+                return category_id
+            if oldest_at is None or crawled_at < oldest_at:
+                oldest_id, oldest_at = category_id, crawled_at
+        ttl = settings.category_membership_ttl_seconds
+        if oldest_at is not None and time.monotonic() - oldest_at >= ttl:
+            return oldest_id
+        return None
+
+    async def run(self, idle_seconds: float = 60.0) -> None:
+        """
+        Keep the index fresh until cancelled.
+
+        Args:
+            idle_seconds: Pause when there is nothing to crawl or after errors
+        """
+        while True:
+            category_id = None
+            try:
+                await self.get_categories()
+                category_id = self.next_to_crawl()
+                if category_id is None:
+                    await asyncio.sleep(idle_seconds)
+                    continue
+                await self.crawl_category(category_id, background=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Category index refresh failed")
+                if category_id is not None:
+                    # Retry this category after its TTL instead of blocking
+                    # the crawl on it
+                    self._crawled_at[category_id] = time.monotonic()
+                    self._wanted.pop(category_id, None)
+                await asyncio.sleep(idle_seconds)
+
+
+# Global index instance
+category_index = CategoryIndex()
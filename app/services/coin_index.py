@@ -0,0 +1,177 @@
+"""Cached coin list with ID membership checks and negative caching."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from app import metrics
+from app.config import settings
+from app.services.coin_store import CoinStore
+from app.services.coingecko import coingecko_service, is_upstream_failure
+from app.services.rate_budget import upstream_budget
+
+logger = logging.getLogger(__name__)
+
+# Negatively cached IDs kept before the oldest are dropped
+_MAX_UNKNOWN = 10000
+
+
+class UnknownCoinsError(LookupError):
+    """None of the requested coin IDs exist."""
+
+    def __init__(self, coin_ids: List[str]):
+        super().__init__(f"Unknown coin ID: {', '.join(coin_ids)}")
+        self.coin_ids = coin_ids
+
+
+class CoinIndex:
+    """
+    Coin list from /coins/list with a set of known coin IDs.
+
+    Requested IDs are checked against the set before any upstream call.
+    IDs that CoinGecko did not return data for are remembered for a short
+    TTL, which also covers the window before the list is first loaded.
+    """
+
+    def __init__(self):
+        self.coins = CoinStore()
+        self.loaded_at: Optional[float] = None
+        self._ids: FrozenSet[str] = frozenset()
+        # Coin ID -> negative cache expiry
+        self._unknown: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    def clear(self) -> None:
+        """Drop the coin list and negative cache."""
+        self.__init__()
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the coin list needs refreshing."""
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at >= settings.coin_list_refresh_seconds
+        )
+
+    @property
+    def age(self) -> float:
+        """Seconds since the coin list was loaded."""
+        return time.monotonic() - self.loaded_at
+
+    def load(self, coins: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace the coin list.
+
+        Args:
+            coins: CoinStore, or raw coins from /coins/list
+        """
+        if not isinstance(coins, CoinStore):
+            coins = CoinStore.from_coins(coins)
+        self.coins = coins
+        self._ids = frozenset(coins.ids)
+        # Listed IDs are no longer unknown
+        for coin_id in [c for c in self._unknown if c in self._ids]:
+            del self._unknown[coin_id]
+        self.loaded_at = time.monotonic()
+
+    async def get_coins(self, background: bool = False) -> CoinStore:
+        """
+        Get the coin list, refreshing it from CoinGecko when stale.
+
+        If the refresh fails because CoinGecko is unavailable, the previous
+        list keeps being served (is_stale stays True) for up to the maximum
+        stale-if-error age.
+
+        Args:
+            background: Wait for spare rate budget before refreshing, and
+                raise refresh errors instead of serving the previous list
+
+        Returns:
+            CoinStore sequence of coin dictionaries with id, symbol, and name
+        """
+        if self.is_stale:
+            if background:
+                # Wait outside the lock so requests seeing a stale list are
+                # not held up until spare budget turns up
+                await upstream_budget.wait_for(
+                    reserve=settings.background_budget_reserve
+                )
+            async with self._lock:
+                if self.is_stale:
+                    try:
+                        self.load(await coingecko_service.get_all_coins())
+                    except Exception as e:
+                        if (
+                            background
+                            or self.loaded_at is None
+                            or not is_upstream_failure(e)
+                            or self.age > settings.stale_if_error_max_age_seconds
+                        ):
+                            raise
+                        logger.warning("Serving stale coin list: %r", e)
+        return self.coins
+
+    def partition(self, coin_ids: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Split coin IDs into possibly known and certainly unknown ones.
+
+        Args:
+            coin_ids: Requested coin IDs
+
+        Returns:
+            (IDs to look up, IDs to reject); everything is looked up until
+            the coin list is loaded, except negatively cached IDs
+        """
+        now = time.monotonic()
+        known, unknown = [], []
+        for coin_id in coin_ids:
+            expires_at = self._unknown.get(coin_id)
+            if expires_at is not None:
+                if now < expires_at:
+                    metrics.rejected_coin_ids_total.inc("negative_cache")
+                    unknown.append(coin_id)
+                    continue
+                del self._unknown[coin_id]
+            if self.loaded_at is not None and coin_id not in self._ids:
+                metrics.rejected_coin_ids_total.inc("not_listed")
+                unknown.append(coin_id)
+            else:
+                known.append(coin_id)
+        return known, unknown
+
+    def mark_unknown(self, coin_ids: List[str]) -> None:
+        """
+        Negatively cache IDs that CoinGecko returned no data for.
+
+        Args:
+            coin_ids: Coin IDs missing from an upstream response
+        """
+        expires_at = time.monotonic() + settings.unknown_coin_ttl_seconds
+        for coin_id in coin_ids:
+            self._unknown.pop(coin_id, None)
+            self._unknown[coin_id] = expires_at
+        while len(self._unknown) > _MAX_UNKNOWN:
+            del self._unknown[next(iter(self._unknown))]
+
+    async def run(self) -> None:
+        """Keep the coin list fresh until cancelled."""
+        while True:
+            try:
+                await self.get_coins(background=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Coin list refresh failed")
+                await asyncio.sleep(60)
+                continue
+            await asyncio.sleep(
+                max(
+                    1.0,
+                    settings.coin_list_refresh_seconds
+                    - (time.monotonic() - self.loaded_at),
+                )
+            )
+
+
+# Global index instance
+coin_index = CoinIndex()
@@ -0,0 +1,83 @@
+"""Compact column store for the CoinGecko coin list."""
+
+import sys
+from collections.abc import Sequence
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+
+def _intern(value: Any) -> Optional[str]:
+    """Intern identifier strings so the store shares them with snapshots."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CoinStore(Sequence):
+    """
+    Coin list held as three string columns.
+
+    Rows are dictionaries built on access (slices build only the requested
+    page), so the store costs three list slots per coin instead of a
+    dictionary per coin. Only id, symbol and name are kept.
+    """
+
+    __slots__ = ("ids", "symbols", "names")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.symbols: List[str] = []
+        self.names: List[str] = []
+
+    def append(self, coin: Dict[str, Any]) -> None:
+        """
+        Add a coin.
+
+        Args:
+            coin: Coin dictionary from /coins/list
+        """
+        self.ids.append(_intern(coin.get("id")))
+        self.symbols.append(_intern(coin.get("symbol")))
+        self.names.append(coin.get("name"))
+
+    @classmethod
+    def from_coins(cls, coins: Iterable[Dict[str, Any]]) -> "CoinStore":
+        """
+        Build a store from coin dictionaries.
+
+        Args:
+            coins: Coins from /coins/list
+
+        Returns:
+            CoinStore object
+        """
+        store = cls()
+        for coin in coins:
+            store.append(coin)
+        return store
+
+    @classmethod
+    async def from_stream(cls, coins: AsyncIterator[Dict[str, Any]]) -> "CoinStore":
+        """
+        Build a store from coins as they are parsed.
+
+        Args:
+            coins: Coins from an incremental /coins/list parse
+
+        Returns:
+            CoinStore object
+        """
+        store = cls()
+        async for coin in coins:
+            store.append(coin)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [
+                {"id": coin_id, "symbol": symbol, "name": name}
+                for coin_id, symbol, name in zip(
+                    self.ids[key], self.symbols[key], self.names[key]
+                )
+            ]
+        return {"id": self.ids[key], "symbol": self.symbols[key], "name": self.names[key]}
@@ -1,8 +1,38 @@
 """CoinGecko API service."""
 
+import asyncio
+import time
 import httpx
 from typing import List, Optional, Dict, Any
+from app import metrics
 from app.config import settings
+from app.deadline import DeadlineExceeded, remaining, within_budget
+from app.json_stream import iter_json_array
+from app.rate_limit import record_upstream_call
+from app.services.coin_store import CoinStore
+from app.services.rate_budget import upstream_budget
+from app.snapshot import MarketSnapshot
+from app.timing import span
+
+# Most coins one /coins/markets page can hold
+MARKETS_PAGE_SIZE = 250
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Check whether an error means CoinGecko is unavailable right now.
+
+    Args:
+        exc: Error raised while fetching from CoinGecko
+
+    Returns:
+        True for timeouts, connection errors, 429 and 5xx responses; False
+        for errors about the request itself (e.g. 404 for an unknown ID)
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status_code = exc.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(exc, (DeadlineExceeded, httpx.TransportError))
 
 
 class CoinGeckoService:
@@ -12,18 +42,28 @@ class CoinGeckoService:
         """Initialize the service with API URL."""
         self.base_url = settings.coingecko_api_url
         self.client = httpx.AsyncClient(timeout=30.0)
+        self._exchange_rates: Optional[Dict[str, float]] = None
+        self._exchange_rates_fetched_at: Optional[float] = None
+        self._exchange_rates_lock = asyncio.Lock()
 
-    async def get_all_coins(self) -> List[Dict[str, Any]]:
+    async def get_all_coins(self) -> CoinStore:
         """
         Fetch all coins from CoinGecko API.
 
+        The multi-megabyte body is parsed incrementally as it streams in,
+        straight into a compact column store, so the raw body, decoded text
+        and full list of dictionaries are never held at once.
+
         Returns:
-            List of coin dictionaries with id, symbol, and name
+            CoinStore sequence of coin dictionaries with id, symbol, and name
         """
-        url = f"{self.base_url}/coins/list"
-        response = await self.client.get(url)
-        response.raise_for_status()
-        return response.json()
+        response = await self._get("/coins/list", stream=True)
+        try:
+            return await CoinStore.from_stream(
+                iter_json_array(response.aiter_bytes())
+            )
+        finally:
+            await response.aclose()
 
     async def get_categories(self) -> List[Dict[str, Any]]:
         """
@@ -32,9 +72,145 @@ class CoinGeckoService:
         Returns:
             List of category dictionaries
         """
-        url = f"{self.base_url}/coins/categories/list"
-        response = await self.client.get(url)
-        response.raise_for_status()
+        response = await self._get("/coins/categories/list")
+        return response.json()
+
+    async def _get(
+        self, endpoint: str, stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        """
+        Issue a GET request to a CoinGecko endpoint, recording metrics.
+
+        Args:
+            endpoint: API path relative to the base URL, e.g. '/coins/list'
+            stream: Return once headers arrive, leaving the body unread; the
+                caller must close the response
+            **kwargs: Extra arguments for httpx.AsyncClient.get
+
+        Returns:
+            HTTP response with a successful status
+
+        Raises:
+            DeadlineExceeded: If the request's latency budget runs out first
+        """
+        budget = remaining()
+        if budget is not None and budget <= 0:
+            metrics.upstream_errors_total.inc(endpoint, "DeadlineExceeded")
+            raise DeadlineExceeded(f"No latency budget left for {endpoint}")
+        upstream_budget.spend()
+        record_upstream_call()
+        metrics.upstream_inflight_requests.inc()
+        started = time.perf_counter()
+        vs_currency = kwargs.get("params", {}).get("vs_currency")
+        desc = f"{endpoint} {vs_currency}" if vs_currency else endpoint
+        try:
+            with span("upstream", desc):
+                url = f"{self.base_url}{endpoint}"
+                if stream:
+                    sent = self.client.send(
+                        self.client.build_request("GET", url, **kwargs),
+                        stream=True,
+                    )
+                else:
+                    sent = self.client.get(url, **kwargs)
+                response = await within_budget(sent, endpoint)
+            if stream and response.is_error:
+                await response.aclose()
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            metrics.upstream_requests_total.inc(endpoint, str(e.response.status_code))
+            metrics.upstream_errors_total.inc(
+                endpoint, f"http_{e.response.status_code}"
+            )
+            raise
+        except Exception as e:
+            metrics.upstream_errors_total.inc(endpoint, type(e).__name__)
+            raise
+        else:
+            metrics.upstream_requests_total.inc(endpoint, str(response.status_code))
+            return response
+        finally:
+            metrics.upstream_request_duration_seconds.observe(
+                time.perf_counter() - started, endpoint
+            )
+            metrics.upstream_inflight_requests.dec()
+
+    def exchange_rates_age(self) -> Optional[float]:
+        """
+        Get the age of the cached exchange rates.
+
+        Returns:
+            Seconds since the rates were fetched, or None if never fetched
+        """
+        if self._exchange_rates_fetched_at is None:
+            return None
+        return time.monotonic() - self._exchange_rates_fetched_at
+
+    async def get_exchange_rates(self) -> Dict[str, float]:
+        """
+        Fetch BTC-relative fiat exchange rates, cached for the configured TTL.
+
+        When a refresh fails the previous rates keep being served; their age
+        is reported by exchange_rates_age().
+
+        Returns:
+            Dictionary of currency code to units per 1 BTC
+        """
+        age = self.exchange_rates_age()
+        if age is not None and age < settings.exchange_rates_ttl_seconds:
+            return self._exchange_rates
+
+        async with self._exchange_rates_lock:
+            age = self.exchange_rates_age()
+            if age is not None and age < settings.exchange_rates_ttl_seconds:
+                return self._exchange_rates
+            try:
+                response = await self._get("/exchange_rates")
+                rates = response.json()["rates"]
+            except (httpx.HTTPError, KeyError, ValueError):
+                if self._exchange_rates is None:
+                    raise
+                return self._exchange_rates
+
+            self._exchange_rates = {
+                code: float(rate["value"])
+                for code, rate in rates.items()
+                if rate.get("type") == "fiat" and rate.get("value")
+            }
+            self._exchange_rates_fetched_at = time.monotonic()
+            return self._exchange_rates
+
+    async def get_markets_page(
+        self,
+        vs_currency: str,
+        category: Optional[str] = None,
+        coin_ids: Optional[List[str]] = None,
+        page: int = 1,
+        per_page: int = 250,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch one raw /coins/markets page, ordered by market cap.
+
+        Args:
+            vs_currency: Currency of prices and market caps
+            category: Optional category ID to filter coins
+            coin_ids: Optional list of coin IDs to fetch
+            page: Page number (1-indexed)
+            per_page: Coins per page (max 250)
+
+        Returns:
+            List of raw coin market data dictionaries
+        """
+        params = {
+            "vs_currency": vs_currency,
+            "category": category,
+            "ids": ",".join(coin_ids) if coin_ids else None,
+            "per_page": per_page,
+            "page": page,
+            "sparkline": False,
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        response = await self._get("/coins/markets", params=params)
         return response.json()
 
     async def get_coin_market_data(
@@ -42,52 +218,92 @@ class CoinGeckoService:
         coin_ids: Optional[List[str]] = None,
         category: Optional[str] = None,
         vs_currencies: List[str] = None,
-    ) -> List[Dict[str, Any]]:
+    ) -> MarketSnapshot:
         """
         Fetch market data for specific coins.
 
         Args:
             coin_ids: List of coin IDs to fetch
             category: Category ID to filter coins
-            vs_currencies: List of currencies (default: ['inr', 'cad'])
+            vs_currencies: List of currencies (default: ['inr', 'cad']); when
+                use_exchange_rates is enabled only the first one is fetched
+                and the others are converted from cached exchange rates
 
         Returns:
-            List of coin market data dictionaries
+            MarketSnapshot with price and market cap columns per currency
         """
         if vs_currencies is None:
             vs_currencies = ["inr", "cad"]
 
-        url = f"{self.base_url}/coins/markets"
-        params = {
-            "vs_currency": vs_currencies[0],
-            "ids": ",".join(coin_ids) if coin_ids else None,
-            "category": category,
-            "sparkline": False,
-        }
+        # Without per_page CoinGecko answers with 100 coins at most, so IDs
+        # are requested a full page at a time
+        chunks = (
+            [
+                coin_ids[i:i + MARKETS_PAGE_SIZE]
+                for i in range(0, len(coin_ids), MARKETS_PAGE_SIZE)
+            ]
+            if coin_ids
+            else [None]
+        )
+        currencies = (
+            vs_currencies[:1] if settings.use_exchange_rates else vs_currencies
+        )
+        markets: Dict[str, List[Dict[str, Any]]] = {c: [] for c in currencies}
+        for chunk in chunks:
+            params = {
+                "ids": ",".join(chunk) if chunk else None,
+                "per_page": MARKETS_PAGE_SIZE if chunk else None,
+                "category": category,
+                "sparkline": False,
+            }
 
-        # Remove None values
-        params = {k: v for k, v in params.items() if v is not None}
+            # Remove None values
+            params = {k: v for k, v in params.items() if v is not None}
+
+            # Prices in the other currencies are fetched separately
+            for currency in currencies:
+                response = await self._get(
+                    "/coins/markets", params={"vs_currency": currency, **params}
+                )
+                markets[currency].extend(response.json())
 
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        market_data = response.json()
+        market_data = markets.pop(vs_currencies[0])
+        if len(chunks) > 1:
+            # Chunks are each ordered by market cap; restore the overall order
+            market_data.sort(key=lambda coin: -(coin.get("market_cap") or 0))
 
-        # Fetch CAD prices separately if needed
-        if len(vs_currencies) > 1 and "cad" in vs_currencies:
-            cad_params = params.copy()
-            cad_params["vs_currency"] = "cad"
-            cad_response = await self.client.get(url, params=cad_params)
-            cad_response.raise_for_status()
-            cad_data = cad_response.json()
+        if settings.use_exchange_rates:
+            return await self._convert_currencies(market_data, vs_currencies)
 
-            # Merge CAD prices into main data
-            cad_dict = {coin["id"]: coin for coin in cad_data}
-            for coin in market_data:
-                if coin["id"] in cad_dict:
-                    coin["current_price_cad"] = cad_dict[coin["id"]]["current_price"]
-                    coin["market_cap_cad"] = cad_dict[coin["id"]]["market_cap"]
+        extra = markets
+        return MarketSnapshot.from_markets(
+            market_data, currency=vs_currencies[0], extra=extra
+        )
 
-        return market_data
+    async def _convert_currencies(
+        self, market_data: List[Dict[str, Any]], vs_currencies: List[str]
+    ) -> MarketSnapshot:
+        """Build a snapshot whose secondary currencies come from exchange rates."""
+        primary = vs_currencies[0]
+        snapshot = MarketSnapshot.from_markets(market_data, currency=primary)
+        if len(vs_currencies) == 1:
+            return snapshot
+
+        rates = await self.get_exchange_rates()
+        unsupported = [c for c in vs_currencies if c not in rates]
+        if unsupported:
+            raise ValueError(
+                f"No exchange rate for currency: {', '.join(unsupported)}"
+            )
+        snapshot.add_currencies(
+            primary,
+            {c: rates[c] / rates[primary] for c in vs_currencies[1:]},
+        )
+        return snapshot
+
+    def reset_client(self) -> None:
+        """Replace the HTTP client, e.g. in a process forked after it was used."""
+        self.client = httpx.AsyncClient(timeout=30.0)
 
     async def close(self):
         """Close the HTTP client."""
@@ -96,4 +312,14 @@ class CoinGeckoService:
 
 # Global service instance
 coingecko_service = CoinGeckoService()
+metrics.registry.register(
+    metrics.connection_pool_gauge(lambda: coingecko_service.client)
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "coingecko_rate_budget_remaining",
+        "Upstream calls still available in the shared rate budget.",
+        function=lambda: {(): upstream_budget.remaining},
+    )
+)
 
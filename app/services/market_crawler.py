@@ -0,0 +1,356 @@
+"""Background crawl of the full market into one ranked snapshot."""
+
+import asyncio
+import fcntl
+import logging
+import os
+import pickle
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import httpx
+from app import metrics
+from app.config import settings
+from app.services.alerts import alert_engine
+from app.services.coingecko import coingecko_service
+from app.services.rate_budget import upstream_budget
+from app.snapshot import MarketSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Coins per /coins/markets page (CoinGecko's maximum)
+PAGE_SIZE = 250
+
+# Currencies of the crawled snapshot, primary first
+CURRENCIES = ("inr", "cad")
+
+# How often workers that do not crawl check for a newer shared snapshot
+# and whether the crawling worker has gone
+_FOLLOW_SECONDS = 5.0
+
+
+class MarketCrawler:
+    """
+    Keeps a market snapshot of every listed coin, ranked by market cap.
+
+    The crawl walks /coins/markets in the primary currency a few pages at a
+    time, concurrently, and each page takes spare rate budget first so
+    requests keep the configured reserve. With exchange rates enabled the
+    other currencies are converted rather than crawled again; otherwise, or
+    if no rates could ever be fetched, they are crawled too. Pages are
+    merged into one columnar snapshot that replaces the previous one only
+    once complete; coins that moved across a page boundary during the crawl
+    are kept at their first position. Market data lookups serve coin IDs,
+    indexed categories and the whole market from it while it is younger
+    than the configured maximum age.
+
+    Under the production launcher only one worker crawls: the one holding a
+    lock in the directory shared by the workers. It publishes each snapshot
+    there for the other workers to load, and another worker takes over if
+    it exits.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[MarketSnapshot] = None
+        # Whether the crawl reached the last page (not cut off by max pages)
+        self.complete = False
+        # Coin ID -> row in the snapshot
+        self._positions: Dict[str, int] = {}
+        # Category ID -> (snapshot version, subset in rank order)
+        self._categories: Dict[str, Tuple[int, MarketSnapshot]] = {}
+        # Directory shared with the other workers, its crawl lock (held by
+        # the crawling worker) and the last snapshot file loaded from it
+        self._shared: Optional[str] = None
+        self._lock: Optional[int] = None
+        self._crawling = False
+        self._published: Optional[int] = None
+
+    def share(self, directory: str) -> None:
+        """
+        Crawl in only one of the workers sharing a directory.
+
+        Args:
+            directory: Directory shared by every worker
+        """
+        self._shared = directory
+        self._lock = os.open(
+            os.path.join(directory, "crawl.lock"), os.O_RDWR | os.O_CREAT
+        )
+
+    def clear(self) -> None:
+        """Drop the snapshot and stop sharing it."""
+        if self._lock is not None:
+            os.close(self._lock)
+        self.__init__()
+
+    def load(self, snapshot: MarketSnapshot, complete: bool = True) -> None:
+        """
+        Replace the snapshot and check alerts against it.
+
+        Args:
+            snapshot: Market in rank order with CURRENCIES columns
+            complete: Whether it holds every coin with market data
+        """
+        self.snapshot = snapshot
+        self.complete = complete
+        self._positions = {
+            coin_id: i for i, coin_id in enumerate(snapshot.text["id"])
+        }
+        self._categories = {}
+        alert_engine.observe(snapshot, self._positions)
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        """time.monotonic() when the snapshot stops being fresh."""
+        if self.snapshot is None:
+            return None
+        return self.snapshot.fetched_at + settings.market_crawl_max_age_seconds
+
+    def fresh(self, currencies: Tuple[str, ...]) -> Optional[MarketSnapshot]:
+        """
+        Get the snapshot if it is fresh and covers the currencies.
+
+        Args:
+            currencies: Requested currencies
+
+        Returns:
+            MarketSnapshot or None
+        """
+        if (
+            self.snapshot is None
+            or currencies != CURRENCIES
+            or time.monotonic() >= self.expires_at
+        ):
+            return None
+        return self.snapshot
+
+    def find(self, coin_ids: List[str]) -> Tuple[List[int], List[str]]:
+        """
+        Look coins up in the snapshot.
+
+        Args:
+            coin_ids: Coin IDs
+
+        Returns:
+            (row indices of the coins found, IDs not in the snapshot)
+        """
+        found, missing = [], []
+        for coin_id in coin_ids:
+            position = self._positions.get(coin_id)
+            if position is None:
+                missing.append(coin_id)
+            else:
+                found.append(position)
+        return found, missing
+
+    def category(self, category_id: str, members: FrozenSet[str]) -> MarketSnapshot:
+        """
+        Get a category's coins from the snapshot in rank order.
+
+        Only meaningful for complete crawls; coins outside the crawled pages
+        would be missing.
+
+        Args:
+            category_id: Category ID
+            members: Indexed coin IDs of the category
+
+        Returns:
+            MarketSnapshot, built once per crawled snapshot
+        """
+        cached = self._categories.get(category_id)
+        if cached is not None and cached[0] == self.snapshot.version:
+            return cached[1]
+        indices, _ = self.find(list(members))
+        subset = self.snapshot.take(sorted(indices))
+        self._categories[category_id] = (self.snapshot.version, subset)
+        return subset
+
+    async def _page(self, currency: str, page: int) -> List[Dict[str, Any]]:
+        """Fetch one page once the background budget allows it."""
+        await upstream_budget.wait_for(reserve=settings.background_budget_reserve)
+        return await coingecko_service.get_markets_page(
+            currency, page=page, per_page=PAGE_SIZE
+        )
+
+    async def _pages(self, currency: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Fetch every page in one currency, a window of pages at a time.
+
+        Returns:
+            (rows in rank order, whether the last page was reached)
+        """
+        max_pages = settings.market_crawl_max_pages or None
+        rows: List[Dict[str, Any]] = []
+        page = 1
+        while max_pages is None or page <= max_pages:
+            window = settings.market_crawl_concurrency
+            if max_pages is not None:
+                window = min(window, max_pages - page + 1)
+            pages = await asyncio.gather(
+                *(self._page(currency, page + i) for i in range(window))
+            )
+            for fetched in pages:
+                rows.extend(fetched)
+            if any(len(fetched) < PAGE_SIZE for fetched in pages):
+                return rows, True
+            page += window
+        return rows, False
+
+    async def _factors(self) -> Optional[Dict[str, float]]:
+        """
+        Get conversion factors from the primary currency to the others.
+
+        Returns:
+            Factors keyed by currency, or None to crawl every currency
+        """
+        if not settings.use_exchange_rates:
+            return None
+        primary, *others = CURRENCIES
+        try:
+            # Previous rates are kept when a refresh fails, so this only
+            # fails before any rates were fetched
+            rates = await coingecko_service.get_exchange_rates()
+            return {currency: rates[currency] / rates[primary] for currency in others}
+        except (httpx.HTTPError, KeyError, ValueError, ZeroDivisionError):
+            logger.warning("No exchange rates; crawling every currency")
+            return None
+
+    async def crawl(self) -> MarketSnapshot:
+        """
+        Crawl the full market and replace the snapshot.
+
+        Returns:
+            New MarketSnapshot
+        """
+        started = time.monotonic()
+        primary, *others = CURRENCIES
+        # Before the pages, so that missing rates cannot waste them
+        factors = await self._factors()
+        markets, complete = await self._pages(primary)
+        seen = set()
+        ranked = []
+        for coin in markets:
+            if coin.get("id") not in seen:
+                seen.add(coin.get("id"))
+                ranked.append(coin)
+
+        if factors is None:
+            extra = {
+                currency: (await self._pages(currency))[0] for currency in others
+            }
+            snapshot = MarketSnapshot.from_markets(
+                ranked, currency=primary, extra=extra
+            )
+        else:
+            snapshot = MarketSnapshot.from_markets(ranked, currency=primary)
+            snapshot.add_currencies(primary, factors)
+        # Aged from the end of the crawl: counted from its first page, a
+        # crawl slower than the market data TTL max would arrive expired
+        snapshot.fetched_at = time.monotonic()
+        self.load(snapshot, complete)
+        logger.info(
+            "Crawled %d coins in %.1fs", len(snapshot), time.monotonic() - started
+        )
+        return snapshot
+
+    def _lead(self) -> bool:
+        """Whether this worker crawls, taking the crawl lock if it is free."""
+        if self._lock is None or self._crawling:
+            return True
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self._crawling = True
+        return True
+
+    def _path(self) -> str:
+        return os.path.join(self._shared, "crawl.pickle")
+
+    def _publish(self) -> None:
+        """Write the snapshot for the other workers, replacing the last one."""
+        path = self._path()
+        partial = f"{path}.{os.getpid()}"
+        with open(partial, "wb") as f:
+            pickle.dump(
+                (
+                    self.snapshot.text,
+                    self.snapshot.numeric,
+                    self.snapshot.fetched_at,
+                    self.complete,
+                ),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(partial, path)
+        self._published = os.stat(path).st_mtime_ns
+
+    def _read(self) -> Optional[Tuple[MarketSnapshot, bool]]:
+        """Read the published snapshot if it changed since last read."""
+        path = self._path()
+        try:
+            modified = os.stat(path).st_mtime_ns
+            if modified == self._published:
+                return None
+            with open(path, "rb") as f:
+                text, numeric, fetched_at, complete = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        self._published = modified
+        # A new version: versions are only unique within a process
+        return MarketSnapshot(text, numeric, fetched_at), complete
+
+    async def _follow(self) -> None:
+        """Load a newer snapshot published by another worker."""
+        published = await asyncio.to_thread(self._read)
+        if published is None:
+            return
+        snapshot, complete = published
+        if self.snapshot is None or snapshot.fetched_at > self.snapshot.fetched_at:
+            self.load(snapshot, complete)
+
+    async def run(self) -> None:
+        """Keep the snapshot fresh until cancelled."""
+        interval = settings.market_crawl_interval_seconds
+        while True:
+            if self._shared is not None:
+                await self._follow()
+                if not self._lead():
+                    await asyncio.sleep(_FOLLOW_SECONDS)
+                    continue
+            # A snapshot preloaded before the worker started, or published
+            # by the worker that crawled before, is recrawled once it is due
+            if self.snapshot is None or self.snapshot.age >= interval:
+                try:
+                    await self.crawl()
+                    if self._shared is not None:
+                        await asyncio.to_thread(self._publish)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Market crawl failed")
+                    await asyncio.sleep(60)
+                    continue
+            await asyncio.sleep(max(1.0, interval - self.snapshot.age))
+
+
+# Global crawler instance
+market_crawler = MarketCrawler()
+metrics.registry.register(
+    metrics.Gauge(
+        "market_crawl_coins",
+        "Coins in the full-market snapshot.",
+        function=lambda: (
+            {(): len(market_crawler.snapshot)} if market_crawler.snapshot else {}
+        ),
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "market_crawl_age_seconds",
+        "Seconds since the full-market snapshot's crawl finished.",
+        function=lambda: (
+            {(): market_crawler.snapshot.age} if market_crawler.snapshot else {}
+        ),
+    )
+)
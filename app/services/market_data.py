@@ -0,0 +1,487 @@
+"""Market data lookups backed by per-coin cached records."""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app import metrics
+from app.config import settings
+from app.deadline import within_budget
+from app.services.adaptive_ttl import AdaptiveTTL
+from app.services.alerts import alert_engine
+from app.services.category_index import category_index
+from app.services.coin_index import UnknownCoinsError, coin_index
+from app.services.coingecko import (
+    MARKETS_PAGE_SIZE,
+    coingecko_service,
+    is_upstream_failure,
+)
+from app.services.market_crawler import CURRENCIES as CRAWL_CURRENCIES
+from app.services.market_crawler import market_crawler
+from app.snapshot import TEXT_COLUMNS, MarketSnapshot
+from app.utils import as_snapshot
+
+# Coin ID + unindexed category results kept for stale-if-error
+_MAX_COMBINATIONS = 1000
+
+# Category snapshots kept before the least recently fetched are dropped
+_MAX_SNAPSHOTS = 1000
+
+
+def _market_cap_order(row: Dict[str, Any]) -> float:
+    """Sort key matching CoinGecko's default market cap descending order."""
+    market_cap = row.get("market_cap_inr")
+    if market_cap is None or market_cap != market_cap:
+        return math.inf
+    return -market_cap
+
+
+class MarketDataService:
+    """
+    Market data for coin ID and category queries.
+
+    Rows are cached per coin, so queries naming overlapping coins share
+    cache entries and only the missing coins are fetched. When both coin IDs
+    and a category are given and the category's membership is indexed, the
+    IDs are intersected locally instead of sending the combination upstream.
+    Category-only results are cached as whole snapshots. Every entry's TTL is
+    chosen by an AdaptiveTTL policy. Coin IDs that are not listed or that
+    recently returned no data are dropped before any upstream call.
+
+    Expired entries are kept as the last known good data: when CoinGecko
+    fails or a request's latency budget runs out before it answers, they are
+    served marked as stale, up to the configured maximum age.
+    """
+
+    def __init__(self):
+        # (coin ID, currencies) -> (expires at, formatted row, fetched at)
+        self._records: Dict[
+            Tuple[str, Tuple[str, ...]], Tuple[float, Dict, float]
+        ] = {}
+        # (category ID, currencies) -> (expires at, snapshot), least
+        # recently fetched first
+        self._snapshots: "OrderedDict[Tuple, Tuple[float, MarketSnapshot]]" = (
+            OrderedDict()
+        )
+        # (coin IDs, category ID, currencies) -> last result for combinations
+        # fetched upstream because the category is not indexed
+        self._combinations: "OrderedDict[Tuple, MarketSnapshot]" = OrderedDict()
+        # Bumped whenever records change; keys the full market snapshot
+        self.records_version = 0
+        self._market: Optional[Tuple[int, MarketSnapshot]] = None
+        self.ttl_policy = AdaptiveTTL("coin_records")
+        self.snapshot_ttl_policy = AdaptiveTTL("category_snapshots")
+
+    def clear(self) -> None:
+        """Drop all cached records."""
+        self._records.clear()
+        self._snapshots.clear()
+        self._combinations.clear()
+        self.records_version = 0
+        self._market = None
+        self.ttl_policy.clear()
+        self.snapshot_ttl_policy.clear()
+
+    def _cached(
+        self, coin_id: str, currencies: Tuple[str, ...]
+    ) -> Optional[Tuple[float, Dict, float]]:
+        """Get a coin's fresh cache entry, if any."""
+        self.ttl_policy.record_request(coin_id)
+        entry = self._records.get((coin_id, currencies))
+        if entry is None or time.monotonic() >= entry[0]:
+            return None
+        return entry
+
+    @staticmethod
+    def _crawled(currencies: Tuple[str, ...]) -> Optional[MarketSnapshot]:
+        """Get the crawled snapshot if young enough to stand in for records."""
+        crawled = market_crawler.fresh(currencies)
+        # Never older than a cached record could be
+        if crawled is None or crawled.age >= settings.market_data_ttl_max_seconds:
+            return None
+        return crawled
+
+    @staticmethod
+    def _servable_stale(error: Exception, fetched_at: Optional[float]) -> bool:
+        """Whether data fetched at a time may stand in after an upstream error."""
+        return (
+            fetched_at is not None
+            and is_upstream_failure(error)
+            and time.monotonic() - fetched_at
+            <= settings.stale_if_error_max_age_seconds
+        )
+
+    def _store(self, snapshot: MarketSnapshot, currencies: Tuple[str, ...]) -> None:
+        """Cache every row of a freshly fetched snapshot and check alerts."""
+        now = time.monotonic()
+        for row in snapshot.rows():
+            coin_id = row["id"]
+            if coin_id:
+                self.ttl_policy.observe(
+                    coin_id,
+                    row.get("current_price_inr"),
+                    row.get("price_change_percentage_24h"),
+                )
+                expires_at = now + self.ttl_policy.ttl(coin_id)
+                self._records[(coin_id, currencies)] = (
+                    expires_at, row, snapshot.fetched_at
+                )
+        self.records_version += 1
+        alert_engine.observe(snapshot)
+
+    def _store_snapshot(
+        self, category: str, snapshot: MarketSnapshot, currencies: Tuple[str, ...]
+    ) -> None:
+        """Cache a category's snapshot, tracking its total market cap."""
+        market_caps = snapshot.numeric["market_cap_inr"]
+        total = float(np.nansum(market_caps))
+        change = None
+        if total > 0:
+            # Market-cap weighted 24h change of the category
+            changes = snapshot.numeric["price_change_percentage_24h"]
+            known = ~np.isnan(changes) & ~np.isnan(market_caps)
+            if known.any():
+                change = float(
+                    np.average(changes[known], weights=market_caps[known])
+                    if market_caps[known].sum() > 0
+                    else changes[known].mean()
+                )
+        self.snapshot_ttl_policy.observe(category, total, change)
+        expires_at = time.monotonic() + self.snapshot_ttl_policy.ttl(category)
+        key = (category, currencies)
+        self._snapshots[key] = (expires_at, snapshot)
+        self._snapshots.move_to_end(key)
+        if len(self._snapshots) > _MAX_SNAPSHOTS:
+            self._snapshots.popitem(last=False)
+        self._store(snapshot, currencies)
+
+    def market_snapshot(self) -> MarketSnapshot:
+        """
+        Get one snapshot of the whole known market.
+
+        This is the full-market crawl while it is fresh. Otherwise it is every
+        cached coin, including expired records: rows cached for different
+        currency lists are merged, newest first, so the snapshot has a price
+        and market cap column per currency. That merge is rebuilt only when
+        records have changed since the last call.
+
+        Returns:
+            MarketSnapshot ordered by market cap
+        """
+        crawled = market_crawler.fresh(CRAWL_CURRENCIES)
+        if crawled is not None:
+            return crawled
+        if self._market is not None and self._market[0] == self.records_version:
+            return self._market[1]
+        merged: Dict[str, Dict[str, Any]] = {}
+        fetched: Dict[str, float] = {}
+        for _, row, fetched_at in sorted(
+            self._records.values(), key=lambda entry: entry[2]
+        ):
+            merged.setdefault(row["id"], {}).update(row)
+            fetched[row["id"]] = fetched_at
+        # Numeric columns in first-seen order (prices, market caps, change)
+        columns = list(
+            dict.fromkeys(
+                column
+                for row in merged.values()
+                for column in row
+                if column not in TEXT_COLUMNS
+            )
+        )
+        rows = sorted(merged.values(), key=_market_cap_order)
+        snapshot = MarketSnapshot.from_records(rows, columns)
+        snapshot.fetched_at = min(fetched.values(), default=snapshot.fetched_at)
+        self._market = (self.records_version, snapshot)
+        return snapshot
+
+    def expires_in(
+        self,
+        coin_ids: Optional[List[str]] = None,
+        category: Optional[str] = None,
+        vs_currencies: List[str] = None,
+    ) -> float:
+        """
+        Get how long the cached data for a query stays fresh.
+
+        Args:
+            coin_ids: List of coin IDs
+            category: Category ID
+            vs_currencies: List of currencies (default: ['inr', 'cad'])
+
+        Returns:
+            Seconds until the first needed entry expires (0 if any is missing
+            or expired)
+        """
+        currencies = tuple(vs_currencies or ("inr", "cad"))
+        now = time.monotonic()
+        if coin_ids:
+            if category is not None:
+                members = category_index.members(category)
+                if members is None:
+                    return 0.0
+                coin_ids = [coin_id for coin_id in coin_ids if coin_id in members]
+            entries = [self._records.get((c, currencies)) for c in coin_ids]
+        else:
+            entries = [self._snapshots.get((category, currencies))]
+        if any(entry is None for entry in entries):
+            return 0.0
+        return max(0.0, min((entry[0] for entry in entries), default=now) - now)
+
+    async def refresh(
+        self,
+        coin_ids: Optional[List[str]] = None,
+        category: Optional[str] = None,
+        vs_currencies: List[str] = None,
+    ) -> None:
+        """
+        Fetch a query's data ahead of demand, replacing cached entries.
+
+        Args:
+            coin_ids: List of coin IDs
+            category: Category ID
+            vs_currencies: List of currencies (default: ['inr', 'cad'])
+        """
+        currencies = tuple(vs_currencies or ("inr", "cad"))
+        if not coin_ids:
+            snapshot = await self._fetch(None, category, currencies)
+            self._store_snapshot(category, snapshot, currencies)
+            return
+        coin_ids, _ = coin_index.partition(coin_ids)
+        if category is not None:
+            members = category_index.members(category)
+            if members is not None:
+                coin_ids = [coin_id for coin_id in coin_ids if coin_id in members]
+                category = None
+        if coin_ids and category is None:
+            await self._fetch_coins(coin_ids, currencies)
+        elif coin_ids:
+            self._store(await self._fetch(coin_ids, category, currencies), currencies)
+
+    async def _fetch(
+        self,
+        coin_ids: Optional[List[str]],
+        category: Optional[str],
+        currencies: Tuple[str, ...],
+    ) -> MarketSnapshot:
+        """Fetch market data from CoinGecko as a snapshot within the budget."""
+        # Bounded as a whole as well as per call: a fetch may need several
+        # upstream calls (markets pages, exchange rates)
+        return as_snapshot(
+            await within_budget(
+                coingecko_service.get_coin_market_data(
+                    coin_ids=coin_ids,
+                    category=category,
+                    vs_currencies=list(currencies),
+                ),
+                "CoinGecko",
+            )
+        )
+
+    async def _fetch_coins(
+        self, coin_ids: List[str], currencies: Tuple[str, ...]
+    ) -> MarketSnapshot:
+        """Fetch and cache coins, negatively caching IDs with no data."""
+        snapshot = await self._fetch(coin_ids, None, currencies)
+        self._store(snapshot, currencies)
+        returned = set(snapshot.text["id"])
+        unknown = []
+        # IDs are fetched a page at a time; only a page that came back short
+        # shows its missing IDs have no data rather than not fitting
+        for i in range(0, len(coin_ids), MARKETS_PAGE_SIZE):
+            chunk = coin_ids[i:i + MARKETS_PAGE_SIZE]
+            missing = [coin_id for coin_id in chunk if coin_id not in returned]
+            if len(chunk) - len(missing) < MARKETS_PAGE_SIZE:
+                unknown.extend(missing)
+        coin_index.mark_unknown(unknown)
+        return snapshot
+
+    async def get_market_data(
+        self,
+        coin_ids: Optional[List[str]] = None,
+        category: Optional[str] = None,
+        vs_currencies: List[str] = None,
+    ) -> MarketSnapshot:
+        """
+        Get market data for specific coins and/or a category.
+
+        Args:
+            coin_ids: List of coin IDs to fetch
+            category: Category ID to filter coins
+            vs_currencies: List of currencies (default: ['inr', 'cad'])
+
+        Returns:
+            MarketSnapshot ordered by market cap, like CoinGecko's response
+
+        Raises:
+            UnknownCoinsError: If coin IDs were given and none of them exist
+            UnknownCategoryError: If the category is not listed
+            DeadlineExceeded: If the latency budget ran out before CoinGecko
+                answered and no cached data covers the query
+            httpx.HTTPError: If CoinGecko failed and no cached data covers
+                the query
+        """
+        if vs_currencies is None:
+            vs_currencies = ["inr", "cad"]
+        currencies = tuple(vs_currencies)
+
+        if category is not None:
+            # Before any per-category state is kept for it
+            category_index.check(category)
+        if coin_ids:
+            coin_ids, unknown = coin_index.partition(coin_ids)
+            if not coin_ids:
+                raise UnknownCoinsError(unknown)
+
+        if coin_ids and category:
+            members = category_index.members(category)
+            if members is None:
+                # Not indexed yet: ask CoinGecko for the combination and have
+                # the crawler pick this category up next
+                metrics.cache_lookups_total.inc("category_membership", "miss")
+                category_index.prioritize(category)
+                return await self._get_combination(coin_ids, category, currencies)
+            metrics.cache_lookups_total.inc("category_membership", "hit")
+            coin_ids = [coin_id for coin_id in coin_ids if coin_id in members]
+            return await self._get_coins(coin_ids, currencies)
+
+        if coin_ids:
+            return await self._get_coins(coin_ids, currencies)
+
+        if category is None and market_crawler.snapshot is not None:
+            return await self._get_market(currencies)
+
+        return await self._get_category(category, currencies)
+
+    async def _get_combination(
+        self, coin_ids: List[str], category: str, currencies: Tuple[str, ...]
+    ) -> MarketSnapshot:
+        """Fetch coins filtered by an unindexed category upstream."""
+        key = (tuple(coin_ids), category, currencies)
+        try:
+            snapshot = await self._fetch(coin_ids, category, currencies)
+        except Exception as e:
+            last = self._combinations.get(key)
+            if not self._servable_stale(e, last and last.fetched_at):
+                raise
+            metrics.stale_responses_total.inc("combinations")
+            return last.as_stale()
+        self._store(snapshot, currencies)
+        self._combinations[key] = snapshot
+        self._combinations.move_to_end(key)
+        if len(self._combinations) > _MAX_COMBINATIONS:
+            self._combinations.popitem(last=False)
+        return snapshot
+
+    async def _get_market(self, currencies: Tuple[str, ...]) -> MarketSnapshot:
+        """Serve the whole market from the crawled snapshot."""
+        snapshot = market_crawler.fresh(currencies)
+        if snapshot is not None:
+            metrics.cache_lookups_total.inc("market_crawl", "hit")
+            return snapshot
+        # The crawler keeps retrying; until it succeeds the last crawl is
+        # the only full view of the market there is, up to the stale limit
+        snapshot = market_crawler.snapshot
+        if (
+            currencies == CRAWL_CURRENCIES
+            and snapshot.age <= settings.stale_if_error_max_age_seconds
+        ):
+            metrics.stale_responses_total.inc("market_crawl")
+            return snapshot.as_stale()
+        # Too old to serve: fall back to CoinGecko's first market page
+        return await self._get_category(None, currencies)
+
+    async def _get_category(
+        self, category: str, currencies: Tuple[str, ...]
+    ) -> MarketSnapshot:
+        """Serve a category from its cached snapshot, fetching it when stale."""
+        self.snapshot_ttl_policy.record_request(category)
+        entry = self._snapshots.get((category, currencies))
+        if entry is not None and time.monotonic() < entry[0]:
+            metrics.cache_lookups_total.inc("category_snapshots", "hit")
+            return entry[1]
+        metrics.cache_lookups_total.inc("category_snapshots", "miss")
+        crawled = self._crawled(currencies)
+        members = (
+            category_index.members(category)
+            if crawled is not None and market_crawler.complete
+            else None
+        )
+        if members is not None:
+            metrics.cache_lookups_total.inc("market_crawl", "hit")
+            return market_crawler.category(category, members)
+        try:
+            snapshot = await self._fetch(None, category, currencies)
+        except Exception as e:
+            if not self._servable_stale(e, entry and entry[1].fetched_at):
+                raise
+            metrics.stale_responses_total.inc("category_snapshots")
+            return entry[1].as_stale()
+        self._store_snapshot(category, snapshot, currencies)
+        return snapshot
+
+    async def _get_coins(
+        self, coin_ids: List[str], currencies: Tuple[str, ...]
+    ) -> MarketSnapshot:
+        """Serve coins from cached records, fetching only the missing ones."""
+        entries = []
+        missing = []
+        for coin_id in dict.fromkeys(coin_ids):
+            entry = self._cached(coin_id, currencies)
+            if entry is None:
+                missing.append(coin_id)
+            else:
+                entries.append(entry)
+        if entries:
+            metrics.cache_lookups_total.inc(
+                "coin_records", "hit", amount=len(entries)
+            )
+        stale = False
+        if missing:
+            metrics.cache_lookups_total.inc(
+                "coin_records", "miss", amount=len(missing)
+            )
+        crawled = self._crawled(currencies)
+        if missing and crawled is not None:
+            indices, missing = market_crawler.find(missing)
+            if indices:
+                metrics.cache_lookups_total.inc(
+                    "market_crawl", "hit", amount=len(indices)
+                )
+                entries.extend(
+                    (0.0, row, crawled.fetched_at) for row in crawled.rows(indices)
+                )
+        if missing:
+            try:
+                snapshot = await self._fetch_coins(missing, currencies)
+            except Exception as e:
+                expired = [self._records.get((c, currencies)) for c in missing]
+                oldest = (
+                    None
+                    if any(entry is None for entry in expired)
+                    else min(entry[2] for entry in expired)
+                )
+                if not self._servable_stale(e, oldest):
+                    raise
+                metrics.stale_responses_total.inc("coin_records")
+                entries.extend(expired)
+                stale = True
+            else:
+                if not entries:
+                    return snapshot
+                entries.extend(
+                    (0.0, row, snapshot.fetched_at) for row in snapshot.rows()
+                )
+        entries.sort(key=lambda entry: _market_cap_order(entry[1]))
+        result = MarketSnapshot.from_records(entry[1] for entry in entries)
+        # The response is as old as its oldest row
+        result.fetched_at = min(
+            (entry[2] for entry in entries), default=result.fetched_at
+        )
+        result.stale = stale
+        return result
+
+
+# Global service instance
+market_data_service = MarketDataService()
@@ -0,0 +1,246 @@
+"""Prefetching of next pages and popular market data filters."""
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from app import metrics
+from app.config import settings
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.services.rate_budget import RateBudget, upstream_budget
+
+logger = logging.getLogger(__name__)
+
+# (sorted coin IDs or None, category ID or None)
+FilterKey = Tuple[Optional[Tuple[str, ...]], Optional[str]]
+
+# Half-life of request counts when ranking popular filters
+_DEMAND_HALF_LIFE = 600.0
+# Tracked (route, filter) pairs before the least requested are dropped
+_MAX_TRACKED = 1000
+
+
+def filter_key(coin_ids: Optional[List[str]], category: Optional[str]) -> FilterKey:
+    """
+    Normalize a market data query into a filter key.
+
+    Args:
+        coin_ids: Requested coin IDs
+        category: Requested category ID
+
+    Returns:
+        Key that is the same for queries needing the same data
+    """
+    return (tuple(sorted(set(coin_ids))) if coin_ids else None, category)
+
+
+class Prefetcher:
+    """
+    Warms market data ahead of requests using a low-priority budget.
+
+    Request patterns are tracked per route and filter. Two kinds of work are
+    queued:
+
+    - Next page: a client that is paging through a result will usually ask
+      for the next page shortly, so data about to expire is refreshed first.
+    - Popular filters: the most requested filters are kept fresh.
+
+    Prefetches spend from their own token bucket and only run while the
+    shared upstream budget keeps the configured reserve for requests. A
+    prefetch counts as used when a request for that filter arrives before
+    the data expires, and as wasted otherwise.
+    """
+
+    def __init__(self):
+        self.budget = RateBudget(settings.prefetch_rate_limit_per_minute)
+        # (route, filter) -> (decayed request count, updated at)
+        self._demand: Dict[Tuple[str, FilterKey], Tuple[float, float]] = {}
+        self._queue: Dict[FilterKey, None] = {}
+        # Prefetched filters not requested yet -> expiry of the warmed data
+        self._pending: Dict[FilterKey, float] = {}
+        self._wakeup = asyncio.Event()
+        self.used = 0
+        self.wasted = 0
+
+    def clear(self) -> None:
+        """Forget tracked demand and queued work."""
+        self.__init__()
+
+    @property
+    def hit_ratio(self) -> Optional[float]:
+        """Share of completed prefetches that served a request."""
+        total = self.used + self.wasted
+        return self.used / total if total else None
+
+    def record(
+        self,
+        route: str,
+        coin_ids: Optional[List[str]],
+        category: Optional[str],
+        page: int,
+        total_pages: int,
+    ) -> None:
+        """
+        Record a served market data page.
+
+        Args:
+            route: Route template that served the request
+            coin_ids: Requested coin IDs
+            category: Requested category ID
+            page: Page number that was served
+            total_pages: Number of pages in the result
+        """
+        key = filter_key(coin_ids, category)
+        now = time.monotonic()
+        score, updated_at = self._demand.get((route, key), (0.0, now))
+        self._demand[(route, key)] = (self._decayed(score, updated_at, now) + 1, now)
+        if len(self._demand) > 2 * _MAX_TRACKED:
+            self._prune(now)
+
+        expires_at = self._pending.pop(key, None)
+        if expires_at is not None:
+            self._complete(now < expires_at)
+
+        if (
+            settings.prefetch_enabled
+            and page < total_pages
+            and not self._crawled(key)
+            and self._expires_in(key) < settings.prefetch_lead_seconds
+        ):
+            self._enqueue(key)
+
+    @staticmethod
+    def _decayed(score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / _DEMAND_HALF_LIFE)
+
+    def _prune(self, now: float) -> None:
+        """Keep only the most requested (route, filter) pairs."""
+        ranked = heapq.nlargest(
+            _MAX_TRACKED,
+            self._demand.items(),
+            key=lambda item: self._decayed(*item[1], now),
+        )
+        self._demand = dict(ranked)
+
+    def popular(self, n: int) -> List[FilterKey]:
+        """
+        Get the most requested filters across routes.
+
+        Args:
+            n: Number of filters
+
+        Returns:
+            Filter keys, most requested first
+        """
+        now = time.monotonic()
+        totals: Dict[FilterKey, float] = {}
+        for (_, key), (score, updated_at) in self._demand.items():
+            totals[key] = totals.get(key, 0.0) + self._decayed(score, updated_at, now)
+        return heapq.nlargest(n, totals, key=totals.get)
+
+    @staticmethod
+    def _crawled(key: FilterKey) -> bool:
+        """Whether the filter is the whole market, kept fresh by the crawler."""
+        # Unfiltered queries are served from the crawl snapshot, never from
+        # the snapshot cache a refresh would fill
+        return key == (None, None) and market_crawler.snapshot is not None
+
+    def _expires_in(self, key: FilterKey) -> float:
+        coin_ids, category = key
+        return market_data_service.expires_in(
+            list(coin_ids) if coin_ids else None, category
+        )
+
+    def _enqueue(self, key: FilterKey) -> None:
+        self._queue[key] = None
+        self._wakeup.set()
+
+    def _complete(self, used: bool) -> None:
+        if used:
+            self.used += 1
+        else:
+            self.wasted += 1
+        metrics.prefetch_total.inc("used" if used else "wasted")
+
+    def _sweep(self) -> None:
+        """Count prefetched data that expired without being requested."""
+        now = time.monotonic()
+        for key, expires_at in list(self._pending.items()):
+            if now >= expires_at:
+                del self._pending[key]
+                self._complete(False)
+
+    def schedule_popular(self) -> None:
+        """Queue popular filters whose data expires before the next pass."""
+        horizon = settings.prefetch_lead_seconds + settings.prefetch_interval_seconds
+        for key in self.popular(settings.prefetch_popular_filters):
+            if not self._crawled(key) and self._expires_in(key) < horizon:
+                self._enqueue(key)
+
+    async def prefetch(self, key: FilterKey) -> None:
+        """
+        Warm one filter once the low-priority budget allows it.
+
+        Args:
+            key: Filter key to warm
+        """
+        horizon = settings.prefetch_lead_seconds + settings.prefetch_interval_seconds
+        if self._crawled(key) or self._expires_in(key) >= horizon:
+            return
+        cost = 1 if settings.use_exchange_rates else 2
+        await self.budget.wait_for(cost)
+        await upstream_budget.wait_for(
+            cost, reserve=settings.prefetch_budget_reserve
+        )
+        if self._expires_in(key) >= horizon:
+            return
+        self.budget.spend(cost)
+        coin_ids, category = key
+        try:
+            await market_data_service.refresh(
+                list(coin_ids) if coin_ids else None, category
+            )
+        except Exception:
+            metrics.prefetch_total.inc("failed")
+            raise
+        metrics.prefetch_total.inc("fetched")
+        if key in self._pending:
+            self._complete(False)
+        self._pending[key] = time.monotonic() + self._expires_in(key)
+
+    async def run(self) -> None:
+        """Process prefetch work until cancelled."""
+        while True:
+            try:
+                self._sweep()
+                if not self._queue:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), settings.prefetch_interval_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        self.schedule_popular()
+                    continue
+                key = next(iter(self._queue))
+                del self._queue[key]
+                await self.prefetch(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Prefetch failed")
+
+
+# Global prefetcher instance
+prefetcher = Prefetcher()
+metrics.registry.register(
+    metrics.Gauge(
+        "prefetch_hit_ratio",
+        "Share of prefetched filters requested before their data expired.",
+        function=lambda: (
+            {(): prefetcher.hit_ratio} if prefetcher.hit_ratio is not None else {}
+        ),
+    )
+)
@@ -0,0 +1,105 @@
+"""Shared upstream rate budget."""
+
+import asyncio
+import contextvars
+import time
+from typing import List, Optional
+from app.config import settings
+
+
+class RateBudget:
+    """
+    Token bucket tracking how many CoinGecko calls we can still afford.
+
+    Every upstream call spends a token. Request-driven calls are never
+    blocked by the budget; background work waits until enough tokens are
+    left over for foreground traffic and takes them at once, so concurrent
+    background calls cannot all pass the same check. The tokens taken are
+    credited to the waiting task, whose next calls spend the credit first.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute: Sustained upstream calls per minute
+            burst: Bucket capacity (default: one minute of calls)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Tokens taken by wait_for and not yet spent, shared by the waiting
+        # task and the tasks it starts
+        self._prepaid: contextvars.ContextVar[List[float]] = contextvars.ContextVar(
+            f"prepaid_{id(self)}"
+        )
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """
+        Change the sustained rate, resizing the bucket to one minute of calls.
+
+        Args:
+            rate_per_minute: Sustained upstream calls per minute
+        """
+        self._refill()
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    @property
+    def remaining(self) -> float:
+        """Tokens currently available."""
+        self._refill()
+        return self.tokens
+
+    @property
+    def remaining_fraction(self) -> float:
+        """Share of the bucket currently available (0.0-1.0)."""
+        return max(0.0, self.remaining / self.capacity) if self.capacity else 0.0
+
+    def spend(self, cost: float = 1.0) -> None:
+        """Record an upstream call; the balance may go negative."""
+        prepaid = self._prepaid.get(None)
+        if prepaid:
+            paid = min(prepaid[0], cost)
+            prepaid[0] -= paid
+            cost -= paid
+        self._refill()
+        self.tokens -= cost
+
+    async def wait_for(self, cost: float = 1.0, reserve: float = 0.0) -> None:
+        """
+        Wait until a background call of the given cost is affordable, and
+        take its tokens.
+
+        Args:
+            cost: Tokens the call will spend
+            reserve: Share of capacity that must remain for foreground calls
+        """
+        needed = cost + reserve * self.capacity
+        while True:
+            self._refill()
+            if self.tokens >= needed:
+                self.tokens -= cost
+                prepaid = self._prepaid.get(None)
+                if prepaid is None:
+                    self._prepaid.set([cost])
+                else:
+                    prepaid[0] += cost
+                return
+            if self.rate <= 0:
+                raise RuntimeError("Upstream rate budget is zero")
+            await asyncio.sleep((needed - self.tokens) / self.rate)
+
+
+# Global budget shared by every upstream caller in this process
+upstream_budget = RateBudget(settings.upstream_rate_limit_per_minute)
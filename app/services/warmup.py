@@ -0,0 +1,144 @@
+"""Startup warm-up of the caches, gating readiness."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from app.services.category_index import category_index
+from app.services.coin_index import coin_index
+from app.services.market_data import market_data_service
+
+logger = logging.getLogger(__name__)
+
+# Pause before retrying failed steps within the warm-up timeout
+_RETRY_SECONDS = 2.0
+
+
+def _split(value: str) -> List[str]:
+    """Split a comma-separated setting into its non-empty items."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class WarmUp:
+    """
+    Preloads the coin list, categories and hot market data on startup.
+
+    The worker is warm once every step has succeeded, or once the warm-up
+    timeout has passed so that a CoinGecko outage during startup cannot keep
+    it out of rotation forever. Failed steps are retried until then. Under
+    the pre-fork launcher the supervisor sets cluster_ready, and every
+    worker reports ready exactly when the target number of workers are warm,
+    whichever of them answers. Liveness (/health) does not depend on any of
+    this.
+    """
+
+    # Set in pre-forked workers: whether the supervisor has every worker warm
+    cluster_ready: Optional[Callable[[], bool]] = None
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timed_out = False
+        # Step name -> 'pending', 'done' or 'failed'
+        self.steps: Dict[str, str] = {}
+
+    def clear(self) -> None:
+        """Forget warm-up progress."""
+        self.__init__()
+
+    @property
+    def warm(self) -> bool:
+        """Whether this worker has finished warming up."""
+        return not settings.warmup_enabled or self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the service should receive traffic."""
+        if self.cluster_ready is not None:
+            return self.cluster_ready()
+        return self.warm
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describe warm-up progress.
+
+        Returns:
+            Dictionary with the per-step state, elapsed seconds, whether the
+            timeout cut the warm-up short and, under the pre-fork launcher,
+            whether every worker is warm
+        """
+        end = self.finished_at or time.monotonic()
+        status = {
+            "steps": dict(self.steps),
+            "elapsed_seconds": (
+                round(end - self.started_at, 3) if self.started_at is not None else None
+            ),
+            "timed_out": self.timed_out,
+        }
+        if self.cluster_ready is not None:
+            status["workers_warm"] = self.cluster_ready()
+        return status
+
+    def _plan(self) -> Dict[str, Callable[[], Awaitable[Any]]]:
+        """Warm-up steps by name; market data steps need the coin list."""
+        steps: Dict[str, Callable[[], Awaitable[Any]]] = {
+            "coin_list": coin_index.get_coins,
+            "categories": category_index.get_categories,
+        }
+        coin_ids = _split(settings.warmup_coin_ids)
+        if coin_ids:
+            steps["market_data"] = lambda: market_data_service.refresh(coin_ids)
+        for category in _split(settings.warmup_categories):
+            steps[f"category:{category}"] = (
+                lambda category=category: market_data_service.refresh(category=category)
+            )
+        return steps
+
+    async def _run_steps(self, steps: Dict[str, Callable[[], Awaitable[Any]]]) -> None:
+        """Run steps concurrently, retrying failures until all succeed."""
+        while True:
+            names = [name for name in steps if self.steps[name] != "done"]
+            if not names:
+                return
+            results = await asyncio.gather(
+                *(steps[name]() for name in names), return_exceptions=True
+            )
+            failed = False
+            for name, result in zip(names, results):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, Exception):
+                    logger.warning("Warm-up step %s failed: %r", name, result)
+                    self.steps[name] = "failed"
+                    failed = True
+                else:
+                    self.steps[name] = "done"
+            if failed:
+                await asyncio.sleep(_RETRY_SECONDS)
+
+    async def _warm(self, plan: Dict[str, Callable[[], Awaitable[Any]]]) -> None:
+        # Market data needs the coin list to drop unknown IDs up front
+        await self._run_steps(
+            {name: plan[name] for name in ("coin_list", "categories")}
+        )
+        await self._run_steps(plan)
+
+    async def run(self) -> None:
+        """Warm the caches once, marking the worker ready when done."""
+        plan = self._plan()
+        self.started_at = time.monotonic()
+        self.steps = {name: "pending" for name in plan}
+        try:
+            await asyncio.wait_for(self._warm(plan), settings.warmup_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            logger.warning("Warm-up timed out: %s", self.steps)
+        self.finished_at = time.monotonic()
+        logger.info(
+            "Warm-up finished in %.1fs", self.finished_at - self.started_at
+        )
+
+
+# Global warm-up instance
+warmup = WarmUp()
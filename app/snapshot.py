@@ -0,0 +1,392 @@
+"""Columnar market snapshots with vectorized filtering, sorting and top-N."""
+
+import itertools
+import sys
+import time
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Numeric columns served by the market data routes, in response order
+NUMERIC_COLUMNS = (
+    "current_price_inr",
+    "current_price_cad",
+    "market_cap_inr",
+    "market_cap_cad",
+    "price_change_percentage_24h",
+)
+
+# Text columns carried alongside the numeric ones
+TEXT_COLUMNS = ("id", "symbol", "name")
+
+# Source of snapshot versions, unique within the process
+_versions = itertools.count(1)
+
+
+def is_integer_column(column: str) -> bool:
+    """Market caps are reported by CoinGecko as whole numbers."""
+    return column.startswith("market_cap_")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern repeated identifier strings so snapshots share one copy."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _to_float(value: Any) -> float:
+    """Convert an optional number to float, mapping missing values to NaN."""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class MarketSnapshot:
+    """
+    Compact column-oriented store of market data.
+
+    Only the fields we serve are kept: interned id and symbol strings, names,
+    and one float64 array per numeric column. Response rows are produced on
+    demand rather than stored.
+    """
+
+    __slots__ = ("text", "numeric", "fetched_at", "stale", "version")
+
+    def __init__(
+        self,
+        text: Dict[str, List[Optional[str]]],
+        numeric: Dict[str, np.ndarray],
+        fetched_at: Optional[float] = None,
+        stale: bool = False,
+    ):
+        """
+        Initialize the snapshot from prepared columns.
+
+        Args:
+            text: Text columns keyed by column name
+            numeric: float64 arrays keyed by column name (NaN for missing),
+                in response order
+            fetched_at: time.monotonic() when the data was fetched upstream
+                (default: now)
+            stale: Whether the data is served past its freshness lifetime
+        """
+        self.text = text
+        self.numeric = numeric
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self.stale = stale
+        # Identifies this snapshot's contents, e.g. in response cache keys
+        self.version = next(_versions)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the data was fetched upstream."""
+        return time.monotonic() - self.fetched_at
+
+    def as_stale(self) -> "MarketSnapshot":
+        """Get a copy sharing the columns, marked as served past its TTL."""
+        return MarketSnapshot(self.text, self.numeric, self.fetched_at, stale=True)
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Dict[str, Any]],
+        columns: Sequence = NUMERIC_COLUMNS,
+    ) -> "MarketSnapshot":
+        """
+        Build a snapshot from formatted market data rows.
+
+        Args:
+            records: Rows as returned by format_market_data
+            columns: Numeric columns to take from the rows, in response order
+
+        Returns:
+            MarketSnapshot object
+        """
+        records = list(records)
+        text = {
+            "id": [_intern(record.get("id")) for record in records],
+            "symbol": [_intern(record.get("symbol")) for record in records],
+            "name": [record.get("name") for record in records],
+        }
+        numeric = {
+            column: np.fromiter(
+                (_to_float(record.get(column)) for record in records),
+                dtype=np.float64,
+                count=len(records),
+            )
+            for column in columns
+        }
+        return cls(text, numeric)
+
+    @classmethod
+    def from_markets(
+        cls,
+        markets: List[Dict[str, Any]],
+        currency: str = "inr",
+        extra: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    ) -> "MarketSnapshot":
+        """
+        Ingest CoinGecko /coins/markets payloads into a snapshot.
+
+        Args:
+            markets: /coins/markets response in the primary currency
+            currency: Primary currency of markets
+            extra: /coins/markets responses in other currencies, keyed by
+                currency; only price and market cap are taken from these
+
+        Returns:
+            MarketSnapshot object
+        """
+        extra = extra or {}
+        count = len(markets)
+        text = {
+            "id": [_intern(coin.get("id")) for coin in markets],
+            "symbol": [_intern(coin.get("symbol")) for coin in markets],
+            "name": [coin.get("name") for coin in markets],
+        }
+        position = {coin_id: i for i, coin_id in enumerate(text["id"])}
+
+        prices = {currency: cls._column(markets, "current_price")}
+        market_caps = {currency: cls._column(markets, "market_cap")}
+        for other, other_markets in extra.items():
+            prices[other] = np.full(count, np.nan)
+            market_caps[other] = np.full(count, np.nan)
+            for coin in other_markets:
+                i = position.get(coin.get("id"))
+                if i is not None:
+                    prices[other][i] = _to_float(coin.get("current_price"))
+                    market_caps[other][i] = _to_float(coin.get("market_cap"))
+
+        numeric = {f"current_price_{c}": values for c, values in prices.items()}
+        numeric.update(
+            {f"market_cap_{c}": values for c, values in market_caps.items()}
+        )
+        numeric["price_change_percentage_24h"] = cls._column(
+            markets, "price_change_percentage_24h"
+        )
+        return cls(text, numeric)
+
+    @staticmethod
+    def _column(markets: List[Dict[str, Any]], key: str) -> np.ndarray:
+        """Extract one numeric field from upstream rows as a float64 array."""
+        return np.fromiter(
+            (_to_float(coin.get(key)) for coin in markets),
+            dtype=np.float64,
+            count=len(markets),
+        )
+
+    def add_currencies(self, source: str, factors: Dict[str, float]) -> None:
+        """
+        Derive price and market cap columns in other currencies.
+
+        Args:
+            source: Currency of the existing columns to convert from
+            factors: Conversion factor from source, keyed by target currency
+        """
+        prices = {}
+        market_caps = {}
+        for column, values in self.numeric.items():
+            if column.startswith("current_price_"):
+                prices[column] = values
+            elif column.startswith("market_cap_"):
+                market_caps[column] = values
+        for currency, factor in factors.items():
+            prices[f"current_price_{currency}"] = (
+                self.numeric[f"current_price_{source}"] * factor
+            )
+            market_caps[f"market_cap_{currency}"] = np.round(
+                self.numeric[f"market_cap_{source}"] * factor
+            )
+        change = self.numeric["price_change_percentage_24h"]
+        self.numeric = {
+            **prices,
+            **market_caps,
+            "price_change_percentage_24h": change,
+        }
+        self.version = next(_versions)
+
+    def take(self, indices: Iterable[int]) -> "MarketSnapshot":
+        """
+        Get a snapshot of some rows, keeping their fetch time.
+
+        Args:
+            indices: Row indices in the new snapshot's order
+
+        Returns:
+            MarketSnapshot with copies of the selected rows
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        positions = indices.tolist()
+        text = {
+            column: [values[i] for i in positions]
+            for column, values in self.text.items()
+        }
+        numeric = {column: values[indices] for column, values in self.numeric.items()}
+        return MarketSnapshot(text, numeric, self.fetched_at, self.stale)
+
+    def __len__(self) -> int:
+        return len(self.text["id"])
+
+    def __getitem__(self, key):
+        """Produce one row (or a list of rows for a slice) on demand."""
+        return self.view()[key]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def view(
+        self,
+        indices: Optional[Iterable[int]] = None,
+        columns: Optional[Sequence] = None,
+    ) -> "SnapshotRows":
+        """
+        Get a lazy sequence of response rows.
+
+        Args:
+            indices: Row indices in response order (default: all rows)
+            columns: Columns to emit, in response order (default: all)
+
+        Returns:
+            SnapshotRows object
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        return SnapshotRows(self, np.asarray(indices, dtype=np.intp), columns)
+
+    def select(
+        self,
+        sort_by: Optional[str] = None,
+        order: str = "desc",
+        min_market_cap: Optional[float] = None,
+        max_price: Optional[float] = None,
+        top_n: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Compute the row indices matching a filter, sort and top-N query.
+
+        Filters apply to the primary (INR) columns. Rows with a missing
+        sort value are always placed last, whatever the order.
+
+        Args:
+            sort_by: Numeric column to sort on
+            order: 'asc' or 'desc'
+            min_market_cap: Minimum market cap (inclusive)
+            max_price: Maximum current price (inclusive)
+            top_n: Keep only the first N rows after sorting
+
+        Returns:
+            Array of row indices in response order
+        """
+        if sort_by is not None and sort_by not in self.numeric:
+            raise ValueError(f"Unknown sort column: {sort_by}")
+
+        mask = np.ones(len(self), dtype=bool)
+        if min_market_cap is not None:
+            mask &= self.numeric["market_cap_inr"] >= min_market_cap
+        if max_price is not None:
+            mask &= self.numeric["current_price_inr"] <= max_price
+        indices = np.flatnonzero(mask)
+
+        if sort_by is None:
+            return indices[:top_n] if top_n is not None else indices
+
+        values = self.numeric[sort_by][indices]
+        keys = -values if order == "desc" else values.copy()
+        keys[np.isnan(keys)] = np.inf
+
+        if top_n is not None and top_n < len(keys):
+            candidates = np.argpartition(keys, top_n - 1)[:top_n]
+            ranked = candidates[np.argsort(keys[candidates], kind="stable")]
+        else:
+            ranked = np.argsort(keys, kind="stable")
+        return indices[ranked]
+
+    def rows(
+        self,
+        indices: Optional[Iterable[int]] = None,
+        columns: Optional[Sequence] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Materialize response rows for the given indices.
+
+        Args:
+            indices: Row indices to emit (default: all rows in order)
+            columns: Columns to emit, in response order (default: all);
+                only these are extracted from the column arrays
+
+        Returns:
+            List of formatted market data dictionaries
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+        if columns is None:
+            names = TEXT_COLUMNS + tuple(self.numeric)
+        else:
+            names = tuple(
+                name for name in columns
+                if name in self.text or name in self.numeric
+            )
+        positions = indices.tolist()
+        columns = {
+            column: [values[i] for i in positions]
+            for column, values in self.text.items()
+            if column in names
+        }
+        for column, values in self.numeric.items():
+            if column not in names:
+                continue
+            selected = values[indices].tolist()
+            integral = is_integer_column(column)
+            columns[column] = [
+                None if value != value else int(value) if integral else value
+                for value in selected
+            ]
+        return [
+            dict(zip(names, values))
+            for values in zip(*(columns[name] for name in names))
+        ]
+
+
+class SnapshotRows(Sequence):
+    """Lazy sequence of response rows; rows are built only when sliced."""
+
+    __slots__ = ("snapshot", "indices", "columns")
+
+    def __init__(
+        self,
+        snapshot: MarketSnapshot,
+        indices: np.ndarray,
+        columns: Optional[Sequence] = None,
+    ):
+        """
+        Initialize the view.
+
+        Args:
+            snapshot: Snapshot holding the columns
+            indices: Row indices in response order
+            columns: Columns to emit (default: all)
+        """
+        self.snapshot = snapshot
+        self.indices = indices
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.snapshot.rows(self.indices[key], self.columns)
+        return self.snapshot.rows(self.indices[[key]], self.columns)[0]
+
+    def __iter__(self):
+        # Materialize in chunks so iteration stays cheap without building
+        # every row up front
+        for start in range(0, len(self.indices), 256):
+            yield from self.snapshot.rows(
+                self.indices[start:start + 256], self.columns
+            )
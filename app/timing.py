@@ -0,0 +1,198 @@
+"""Per-request timing spans, Server-Timing headers and on-demand profiling."""
+
+import hmac
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+# Spans of the current request as (name, description, seconds)
+_spans: ContextVar[Optional[List[Tuple[str, Optional[str], float]]]] = ContextVar(
+    "spans", default=None
+)
+
+
+@contextmanager
+def span(name: str, desc: Optional[str] = None):
+    """
+    Time a stage of the current request for the Server-Timing header.
+
+    A no-op outside a request handled by ServerTimingMiddleware.
+
+    Args:
+        name: Metric name (an HTTP token, e.g. 'jwt' or 'upstream')
+        desc: Optional human-readable description
+    """
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, desc, time.perf_counter() - started))
+
+
+def format_server_timing(spans: List[Tuple[str, Optional[str], float]]) -> str:
+    """
+    Render spans as a Server-Timing header value.
+
+    Args:
+        spans: (name, description, seconds) tuples
+
+    Returns:
+        Header value with durations in milliseconds
+    """
+    entries = []
+    for name, desc, seconds in spans:
+        entry = f"{name};dur={seconds * 1000:.3f}"
+        if desc:
+            entry += ';desc="{}"'.format(desc.replace('"', "'"))
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval."""
+
+    def __init__(self, interval: float = 0.001):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._target = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        """Start sampling the calling thread."""
+        self._target = threading.get_ident()
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def render(self) -> str:
+        """
+        Render samples in collapsed-stack format.
+
+        Returns:
+            One 'frame;frame;... count' line per distinct stack, most
+            frequent first, usable with flamegraph tools
+        """
+        total = sum(self.samples.values())
+        lines = [
+            f"# {total} samples at {self.interval * 1000:g}ms intervals; the event "
+            "loop is shared, so concurrent requests appear in the samples too"
+        ]
+        lines.extend(
+            f"{stack} {count}" for stack, count in self.samples.most_common()
+        )
+        return "\n".join(lines) + "\n"
+
+
+def _profile_requested(scope) -> bool:
+    """Check whether the request carries the configured profiler key."""
+    key = settings.profiler_key
+    if not key:
+        return False
+    expected = key.encode()
+    # Header only: query strings end up in access logs and browser history
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and hmac.compare_digest(value, expected):
+            return True
+    return False
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with per-stage spans.
+
+    Requests carrying the configured profiler key in the X-Profile header
+    are sampled and answered with the profile instead of the normal body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, Optional[str], float]] = []
+        token = _spans.set(spans)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                spans.append(("total", None, time.perf_counter() - started))
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", format_server_timing(spans).encode("latin-1"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            if _profile_requested(scope):
+                await self._profile(scope, receive, send, spans, started)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _spans.reset(token)
+
+    async def _profile(self, scope, receive, send, spans, started):
+        """Run the request under the sampling profiler and return the profile."""
+        status_code = 500
+
+        async def discard(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        profiler = SamplingProfiler(settings.profiler_interval_ms / 1000)
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        spans.append(("total", None, time.perf_counter() - started))
+
+        body = profiler.render().encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profiled-status", str(status_code).encode()),
+                    (b"server-timing", format_server_timing(spans).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
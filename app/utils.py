@@ -1,20 +1,28 @@
 """Utility functions shared across the application."""
 
 import math
-from typing import List, Any, Dict
-from app.models import PaginatedResponse
+from operator import itemgetter
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+)
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from app.models import MarketQuery, MarketSortField, PaginatedResponse, SortOrder
+from app.snapshot import MarketSnapshot
+from app.timing import span
 
 
 def paginate_data(
-    data: List[Any], page: int, per_page: int
+    data: Sequence[Any], page: int, per_page: int, stale: bool = False
 ) -> PaginatedResponse:
     """
     Paginate a list of data.
 
     Args:
-        data: List of data to paginate
+        data: List (or lazy sequence) of data to paginate
         page: Page number (1-indexed)
         per_page: Items per page
+        stale: Whether the data is served past its freshness lifetime
 
     Returns:
         PaginatedResponse object
@@ -25,12 +33,14 @@ def paginate_data(
     end = start + per_page
     paginated_data = data[start:end]
 
-    return PaginatedResponse(
+    # Items are already in response shape; skip re-validating every row
+    return PaginatedResponse.model_construct(
         page=page,
         per_page=per_page,
         total=total,
         total_pages=total_pages,
         data=paginated_data,
+        stale=stale,
     )
 
 
@@ -55,3 +65,263 @@ def format_market_data(coin: Dict[str, Any]) -> Dict[str, Any]:
         "price_change_percentage_24h": coin.get("price_change_percentage_24h"),
     }
 
+
+def get_market_query(
+    sort_by: Optional[MarketSortField] = Query(
+        None, description="Column to sort market data by"
+    ),
+    order: SortOrder = Query(SortOrder.desc, description="Sort order"),
+    min_market_cap: Optional[float] = Query(
+        None, ge=0, description="Minimum market cap in INR"
+    ),
+    max_price: Optional[float] = Query(
+        None, ge=0, description="Maximum current price in INR"
+    ),
+    top_n: Optional[int] = Query(
+        None, ge=1, description="Keep only the first N coins after sorting"
+    ),
+) -> MarketQuery:
+    """
+    Collect market data filter and sort query parameters.
+
+    Returns:
+        MarketQuery object
+    """
+    if top_n is not None and sort_by is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'top_n' requires 'sort_by'",
+        )
+    return MarketQuery(
+        sort_by=sort_by,
+        order=order,
+        min_market_cap=min_market_cap,
+        max_price=max_price,
+        top_n=top_n,
+    )
+
+
+class FieldSet:
+    """
+    Precompiled sparse fieldset: a subset of a model's fields.
+
+    Field sets are built once per distinct selection (see get_fields) and
+    are hashable, so they can key caches of projected responses.
+    """
+
+    __slots__ = ("fields", "_getter")
+
+    def __init__(self, fields: Tuple[str, ...]):
+        """
+        Initialize the field set.
+
+        Args:
+            fields: Selected fields in response order
+        """
+        self.fields = fields
+        getter = itemgetter(*fields)
+        # itemgetter returns a bare value, not a tuple, for a single key
+        self._getter = getter if len(fields) > 1 else lambda row: (getter(row),)
+
+    def __hash__(self) -> int:
+        return hash(self.fields)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FieldSet) and self.fields == other.fields
+
+    def project(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Project dictionary rows down to the selected fields.
+
+        Args:
+            rows: Rows holding at least the selected fields
+
+        Returns:
+            New dictionaries with only the selected fields
+        """
+        fields, getter = self.fields, self._getter
+        return [dict(zip(fields, getter(row))) for row in rows]
+
+    def view(self, rows: Sequence[Dict[str, Any]]) -> "ProjectedRows":
+        """Get a lazy sequence projecting rows only when sliced."""
+        return ProjectedRows(rows, self)
+
+
+class ProjectedRows(Sequence):
+    """Lazy projection of a row sequence; pagination projects one page."""
+
+    __slots__ = ("rows", "field_set")
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], field_set: FieldSet):
+        self.rows = rows
+        self.field_set = field_set
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.field_set.project(self.rows[key])
+        return self.field_set.project([self.rows[key]])[0]
+
+
+# (model, selected fields) -> precompiled field set
+_field_sets: Dict[Tuple[Type[BaseModel], Tuple[str, ...]], FieldSet] = {}
+
+
+def get_fields(model: Type[BaseModel]) -> Callable[..., Optional[FieldSet]]:
+    """
+    Build a dependency parsing the 'fields' query parameter for a model.
+
+    Args:
+        model: Response item model whose fields may be selected
+
+    Returns:
+        Dependency returning the FieldSet, or None to return every field
+    """
+    allowed = tuple(model.model_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description="Comma-separated fields to return "
+            f"(any of: {', '.join(allowed)}; default: all)",
+        ),
+    ) -> Optional[FieldSet]:
+        if fields is None:
+            return None
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested.difference(allowed)
+        if unknown or not requested:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid fields: {', '.join(sorted(unknown)) or fields!r}",
+            )
+        # Canonical model order, so every spelling of a selection shares
+        # one field set
+        selected = tuple(field for field in allowed if field in requested)
+        field_set = _field_sets.get((model, selected))
+        if field_set is None:
+            field_set = _field_sets[(model, selected)] = FieldSet(selected)
+        return field_set
+
+    return dependency
+
+
+def as_snapshot(
+    market_data: Union[MarketSnapshot, Iterable[Dict[str, Any]]],
+) -> MarketSnapshot:
+    """
+    Get market data as a snapshot.
+
+    Args:
+        market_data: Market snapshot, or raw coin data from CoinGecko API
+
+    Returns:
+        MarketSnapshot object
+    """
+    if isinstance(market_data, MarketSnapshot):
+        return market_data
+    return MarketSnapshot.from_records(
+        format_market_data(coin) for coin in market_data
+    )
+
+
+def freshness_headers(stale: bool, age: float) -> Optional[Dict[str, str]]:
+    """
+    Get response headers marking data served past its freshness lifetime.
+
+    Args:
+        stale: Whether the data is a fallback for a failed upstream refresh
+        age: Seconds since the data was fetched upstream
+
+    Returns:
+        Age and Warning headers when the data is stale, else None
+    """
+    if not stale:
+        return None
+    return {"Age": str(int(age)), "Warning": '111 - "Revalidation Failed"'}
+
+
+def apply_market_query(
+    market_data: Union[MarketSnapshot, Iterable[Dict[str, Any]]],
+    query: MarketQuery,
+    fields: Optional[FieldSet] = None,
+) -> Sequence[Dict[str, Any]]:
+    """
+    Apply server-side filtering, sorting and top-N to market data.
+
+    Args:
+        market_data: Market snapshot, or raw coin data from CoinGecko API
+        query: Filter and sort options
+        fields: Columns to emit (default: all)
+
+    Returns:
+        Lazy sequence of formatted coin data dictionaries in response order
+    """
+    snapshot = as_snapshot(market_data)
+    indices = snapshot.select(
+        sort_by=query.sort_by.value if query.sort_by else None,
+        order=query.order.value,
+        min_market_cap=query.min_market_cap,
+        max_price=query.max_price,
+        top_n=query.top_n,
+    )
+    return snapshot.view(indices, fields.fields if fields else None)
+
+
+def market_page(
+    market_data: MarketSnapshot,
+    query: MarketQuery,
+    fields: Optional[FieldSet],
+    page: int,
+    per_page: int,
+) -> PaginatedResponse:
+    """
+    Build one page of market data for a route.
+
+    Args:
+        market_data: Market snapshot to serve
+        query: Filter and sort options
+        fields: Columns to emit (default: all)
+        page: Page number (1-indexed)
+        per_page: Items per page
+
+    Returns:
+        PaginatedResponse object
+    """
+    with span("format"):
+        formatted_data = apply_market_query(market_data, query, fields)
+    with span("paginate"):
+        return paginate_data(formatted_data, page, per_page, stale=market_data.stale)
+
+
+def market_page_key(
+    market_data: MarketSnapshot,
+    coin_ids: Optional[List[str]],
+    query: MarketQuery,
+    page: int,
+    per_page: int,
+    fields: Optional[FieldSet],
+) -> Optional[Tuple]:
+    """
+    Get the page cache key for a page of market data.
+
+    Only category snapshots are cached as a whole and reused across
+    requests; coin ID results are assembled per request, so their pages
+    are not worth caching.
+
+    Args:
+        market_data: Market snapshot being served
+        coin_ids: Requested coin IDs, if any
+        query: Filter and sort options
+        page: Page number
+        per_page: Items per page
+        fields: Sparse fieldset, if any
+
+    Returns:
+        Cache key, or None when the page should not be cached
+    """
+    if coin_ids or market_data.stale:
+        return None
+    return ("market", market_data.version, query, page, per_page, fields)
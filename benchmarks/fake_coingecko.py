@@ -0,0 +1,359 @@
+"""
+Local CoinGecko stand-in with latency and fault injection.
+
+Serves /ping, /coins/list, /coins/categories/list, /coins/markets and
+/exchange_rates from a synthetic dataset of configurable size, over real
+HTTP, so pooling, timeouts, rate limiting and broken bodies can be
+exercised end to end.
+
+Usage:
+    python -m benchmarks.fake_coingecko --port 9000 --coins 10000 \
+        --latency-ms 80 --latency-distribution lognormal --error-rate 0.01
+    COINGECKO_API_URL=http://127.0.0.1:9000 python run.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from pydantic import BaseModel, Field
+
+# Fiat rates per 1 BTC served by /exchange_rates
+EXCHANGE_RATES = {
+    "btc": ("Bitcoin", "BTC", 1.0, "crypto"),
+    "eth": ("Ether", "ETH", 20.0, "crypto"),
+    "usd": ("US Dollar", "$", 60000.0, "fiat"),
+    "eur": ("Euro", "€", 55000.0, "fiat"),
+    "gbp": ("British Pound Sterling", "£", 47000.0, "fiat"),
+    "inr": ("Indian Rupee", "₹", 5000000.0, "fiat"),
+    "cad": ("Canadian Dollar", "CA$", 82000.0, "fiat"),
+    "jpy": ("Japanese Yen", "¥", 9000000.0, "fiat"),
+}
+
+
+class FaultConfig(BaseModel):
+    """Latency and fault injection settings."""
+
+    latency_ms: float = Field(0.0, ge=0, description="Base/median latency")
+    latency_distribution: str = Field(
+        "fixed", pattern="^(fixed|uniform|lognormal)$"
+    )
+    latency_jitter_ms: float = Field(0.0, ge=0, description="Uniform +/- jitter")
+    latency_sigma: float = Field(0.5, ge=0, description="Lognormal sigma")
+    error_rate: float = Field(0.0, ge=0, le=1, description="Share of 500s")
+    rate_limit_rate: float = Field(0.0, ge=0, le=1, description="Share of 429s")
+    rate_limit_per_minute: Optional[int] = Field(
+        None, ge=1, description="Hard request budget per minute (429 beyond)"
+    )
+    retry_after: int = Field(60, ge=0, description="Retry-After for 429s")
+    truncate_rate: float = Field(
+        0.0, ge=0, le=1, description="Share of bodies cut off mid-stream"
+    )
+    slow_body_ms: float = Field(
+        0.0, ge=0, description="Delay between body chunks"
+    )
+    chunk_size: int = Field(16384, ge=1, description="Body chunk size in bytes")
+
+
+class Dataset:
+    """Synthetic coins, categories and market data."""
+
+    def __init__(self, coin_count: int = 5000, category_count: int = 50, seed: int = 42):
+        """
+        Generate a deterministic dataset.
+
+        Market caps follow a lognormal distribution and coins are ranked by
+        market cap, like the real /coins/markets default order. Each coin
+        belongs to one to three categories.
+
+        Args:
+            coin_count: Number of coins
+            category_count: Number of categories
+            seed: Random seed
+        """
+        rng = random.Random(seed)
+        self.categories = [
+            {"category_id": f"category-{i}", "name": f"Category {i}"}
+            for i in range(category_count)
+        ]
+        self.coins = [
+            {"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}"}
+            for i in range(coin_count)
+        ]
+        self.membership: Dict[str, List[int]] = {
+            category["category_id"]: [] for category in self.categories
+        }
+
+        markets = []
+        for i, coin in enumerate(self.coins):
+            market_cap = rng.lognormvariate(18, 3)
+            supply = rng.lognormvariate(18, 2)
+            markets.append(
+                {
+                    **coin,
+                    "image": f"https://assets.example.com/coins/{coin['id']}.png",
+                    "current_price": market_cap / supply,
+                    "market_cap": int(market_cap),
+                    "fully_diluted_valuation": int(market_cap * 1.2),
+                    "total_volume": int(market_cap * rng.uniform(0.01, 0.3)),
+                    "circulating_supply": supply,
+                    "price_change_percentage_24h": rng.gauss(0, 5),
+                    "last_updated": "2024-01-01T00:00:00.000Z",
+                }
+            )
+            if category_count:
+                for category in rng.sample(
+                    self.categories, k=min(category_count, rng.randint(1, 3))
+                ):
+                    self.membership[category["category_id"]].append(i)
+
+        # Rank by market cap in USD; other currencies are scaled per request
+        order = sorted(range(coin_count), key=lambda i: -markets[i]["market_cap"])
+        for rank, i in enumerate(order, start=1):
+            markets[i]["market_cap_rank"] = rank
+        self.markets = markets
+        self.rank_order = order
+        self.by_id = {coin["id"]: i for i, coin in enumerate(self.coins)}
+        self.coins_body = json.dumps(self.coins).encode()
+        self.categories_body = json.dumps(self.categories).encode()
+        self.exchange_rates_body = json.dumps(
+            {
+                "rates": {
+                    code: {"name": name, "unit": unit, "value": value, "type": kind}
+                    for code, (name, unit, value, kind) in EXCHANGE_RATES.items()
+                }
+            }
+        ).encode()
+
+    def markets_page(
+        self,
+        vs_currency: str,
+        ids: Optional[List[str]],
+        category: Optional[str],
+        page: int,
+        per_page: int,
+    ) -> List[Dict[str, Any]]:
+        """Build one /coins/markets page in the requested currency."""
+        factor = EXCHANGE_RATES[vs_currency][2] / EXCHANGE_RATES["usd"][2]
+        if ids is not None:
+            wanted = {self.by_id[cid] for cid in ids if cid in self.by_id}
+            positions = [i for i in self.rank_order if i in wanted]
+        else:
+            positions = self.rank_order
+        if category is not None:
+            members = set(self.membership[category])
+            positions = [i for i in positions if i in members]
+        start = (page - 1) * per_page
+        rows = []
+        for i in positions[start:start + per_page]:
+            row = dict(self.markets[i])
+            row["current_price"] = row["current_price"] * factor
+            row["market_cap"] = int(row["market_cap"] * factor)
+            row["fully_diluted_valuation"] = int(row["fully_diluted_valuation"] * factor)
+            row["total_volume"] = int(row["total_volume"] * factor)
+            rows.append(row)
+        return rows
+
+
+class FakeCoinGecko:
+    """ASGI application imitating the CoinGecko v3 API."""
+
+    def __init__(
+        self,
+        dataset: Optional[Dataset] = None,
+        faults: Optional[FaultConfig] = None,
+        seed: int = 42,
+    ):
+        """
+        Initialize the fake server.
+
+        Args:
+            dataset: Data to serve (default: 5,000 coins, 50 categories)
+            faults: Latency and fault injection settings (default: none)
+            seed: Random seed for latency and fault sampling
+        """
+        self.dataset = dataset or Dataset()
+        self.faults = faults or FaultConfig()
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"].rstrip("/")
+        # Accept both the bare paths and the /api/v3-prefixed ones
+        if path.startswith("/api/v3"):
+            path = path[len("/api/v3"):]
+        query = {
+            key: values[-1]
+            for key, values in parse_qs(scope["query_string"].decode()).items()
+        }
+
+        delay = self._sample_latency()
+        if delay:
+            await asyncio.sleep(delay)
+
+        status, body, headers = self._fault_response()
+        if status is None:
+            status, body = self._route(path, query)
+        self.stats[(path, status)] += 1
+
+        truncate = status == 200 and self.rng.random() < self.faults.truncate_rate
+        await self._send(send, status, body, headers, truncate)
+
+    def _sample_latency(self) -> float:
+        """Sample one response delay in seconds."""
+        faults = self.faults
+        if faults.latency_distribution == "uniform":
+            delay = faults.latency_ms + self.rng.uniform(
+                -faults.latency_jitter_ms, faults.latency_jitter_ms
+            )
+        elif faults.latency_distribution == "lognormal" and faults.latency_ms > 0:
+            delay = self.rng.lognormvariate(
+                math.log(faults.latency_ms), faults.latency_sigma
+            )
+        else:
+            delay = faults.latency_ms
+        return max(delay, 0.0) / 1000
+
+    def _fault_response(self) -> Tuple[Optional[int], bytes, List[Tuple[bytes, bytes]]]:
+        """Decide whether this request gets an injected error."""
+        faults = self.faults
+        retry_after = [(b"retry-after", str(faults.retry_after).encode())]
+
+        if faults.rate_limit_per_minute is not None:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            if self._window_count > faults.rate_limit_per_minute:
+                remaining = max(1, math.ceil(60 - (now - self._window_start)))
+                return (
+                    429,
+                    _error_body("Rate limit exceeded"),
+                    [(b"retry-after", str(remaining).encode())],
+                )
+
+        roll = self.rng.random()
+        if roll < faults.rate_limit_rate:
+            return 429, _error_body("Rate limit exceeded"), retry_after
+        if roll < faults.rate_limit_rate + faults.error_rate:
+            return 500, _error_body("Internal server error"), []
+        return None, b"", []
+
+    def _route(self, path: str, query: Dict[str, str]) -> Tuple[int, bytes]:
+        """Serve one API path."""
+        dataset = self.dataset
+        if path == "/ping":
+            return 200, b'{"gecko_says":"(V3) To the Moon!"}'
+        if path == "/coins/list":
+            return 200, dataset.coins_body
+        if path == "/coins/categories/list":
+            return 200, dataset.categories_body
+        if path == "/exchange_rates":
+            return 200, dataset.exchange_rates_body
+        if path == "/coins/markets":
+            vs_currency = query.get("vs_currency", "").lower()
+            if vs_currency not in EXCHANGE_RATES:
+                return 400, _error_body("invalid vs_currency")
+            category = query.get("category")
+            if category is not None and category not in dataset.membership:
+                return 404, _error_body("category not found")
+            ids = query.get("ids")
+            try:
+                page = max(1, int(query.get("page", 1)))
+                per_page = min(250, max(1, int(query.get("per_page", 100))))
+            except ValueError:
+                return 400, _error_body("invalid pagination")
+            rows = dataset.markets_page(
+                vs_currency,
+                ids.split(",") if ids else None,
+                category,
+                page,
+                per_page,
+            )
+            return 200, json.dumps(rows).encode()
+        return 404, _error_body("Not found")
+
+    async def _send(
+        self,
+        send,
+        status: int,
+        body: bytes,
+        headers: List[Tuple[bytes, bytes]],
+        truncate: bool,
+    ) -> None:
+        """Send the response, optionally slowly or cut off half way."""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            }
+        )
+        if truncate:
+            body = body[: len(body) // 2]
+        chunk_size = self.faults.chunk_size
+        chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        for chunk in chunks:
+            if self.faults.slow_body_ms:
+                await asyncio.sleep(self.faults.slow_body_ms / 1000)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _error_body(message: str) -> bytes:
+    """Encode an error payload in CoinGecko's format."""
+    return json.dumps({"error": message}).encode()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line entry point."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--coins", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    for name, field in FaultConfig.model_fields.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(field.default) if field.default is not None else int,
+            default=field.default,
+            help=field.description,
+        )
+    args = vars(parser.parse_args(argv))
+
+    faults = FaultConfig(**{name: args[name] for name in FaultConfig.model_fields})
+    app = FakeCoinGecko(
+        Dataset(args["coins"], args["categories"], args["seed"]), faults, args["seed"]
+    )
+    uvicorn.run(app, host=args["host"], port=args["port"], log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Load-testing benchmark with per-endpoint latency percentiles.
+
+Drives the real ASGI application in-process under configurable concurrency,
+with the CoinGecko client pointed at a local fake CoinGecko served over HTTP.
+Results are written as JSON and can be compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 32 --requests 500
+    python -m benchmarks.load_test --output results.json \
+        --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_coingecko import Dataset, FakeCoinGecko, FaultConfig
+
+# Scenarios keyed by name: (method, path, JSON body, requires auth)
+SCENARIOS = {
+    "auth_login": (
+        "POST",
+        "/auth/login",
+        {"username": "testuser", "password": "testpass"},
+        False,
+    ),
+    "coins": ("GET", "/coins?page_num=1&per_page=250", None, True),
+    "coins_market_data": (
+        "GET",
+        "/coins/market-data?coin_id=coin-1,coin-2,coin-3&per_page=250",
+        None,
+        True,
+    ),
+    "category_coins": (
+        "GET",
+        "/categories/category-1/coins?per_page=250",
+        None,
+        True,
+    ),
+    "health": ("GET", "/health", None, False),
+    "health_detailed": ("GET", "/health/detailed", None, False),
+}
+
+# Metrics compared against the baseline and whether higher is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+
+    Args:
+        sorted_values: Values in ascending order
+        pct: Percentile between 0 and 100
+
+    Returns:
+        Percentile value (0.0 for an empty list)
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """
+    Summarize one scenario run.
+
+    Args:
+        latencies: Per-request latencies in seconds
+        errors: Number of failed or non-2xx requests
+        elapsed: Wall-clock duration of the run in seconds
+
+    Returns:
+        Dictionary with request counts, RPS and latency percentiles in ms
+    """
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Find regressions against a baseline.
+
+    Args:
+        results: Scenario results of the current run
+        baseline: Scenario results of the baseline run
+        tolerance: Allowed relative slowdown (0.2 = 20%)
+
+    Returns:
+        Human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = expected.get(metric), actual.get(metric)
+            if not old or new is None:
+                continue
+            if higher_is_better:
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}: {metric} {old} -> {new}")
+        if actual.get("errors", 0) > expected.get("errors", 0):
+            regressions.append(
+                f"{name}: errors {expected.get('errors', 0)} -> {actual['errors']}"
+            )
+    return regressions
+
+
+class UpstreamServer:
+    """Runs an ASGI app with uvicorn on a free local port in a thread."""
+
+    def __init__(self, asgi_app):
+        """Bind a socket on an ephemeral port for the app."""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(
+            uvicorn.Config(asgi_app, log_level="warning", access_log=False)
+        )
+        self.thread = threading.Thread(
+            target=self.server.run, kwargs={"sockets": [self.socket]}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "UpstreamServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    total: int,
+    concurrency: int,
+    headers: Dict[str, str],
+) -> Dict[str, Any]:
+    """
+    Issue requests for one scenario and collect latencies.
+
+    Args:
+        client: Client bound to the application under test
+        name: Scenario name from SCENARIOS
+        total: Number of requests to issue
+        concurrency: Number of concurrent workers
+        headers: Headers for authenticated requests
+
+    Returns:
+        Scenario summary
+    """
+    method, path, body, needs_auth = SCENARIOS[name]
+    request_headers = headers if needs_auth else {}
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    method, path, json=body, headers=request_headers
+                )
+                ok = response.is_success
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_benchmark(
+    scenarios: List[str],
+    total: int,
+    concurrency: int,
+    warmup: int,
+    target_url: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every selected scenario against the application.
+
+    Args:
+        scenarios: Scenario names to run
+        total: Requests per scenario
+        concurrency: Concurrent workers per scenario
+        warmup: Untimed requests issued before each scenario
+        target_url: Base URL of a running server (default: in-process app)
+
+    Returns:
+        Scenario summaries keyed by name
+    """
+    from app.auth import create_access_token
+
+    if target_url:
+        transport = None
+        base_url = target_url
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    headers = {
+        "Authorization": f"Bearer {create_access_token(data={'sub': 'testuser'})}"
+    }
+    limits = httpx.Limits(max_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=60.0
+    ) as client:
+        for name in scenarios:
+            if warmup:
+                await run_scenario(client, name, warmup, concurrency, headers)
+            results[name] = await run_scenario(
+                client, name, total, concurrency, headers
+            )
+            print(f"{name:>20}: {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Per scenario")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run (repeatable, default: all)",
+    )
+    parser.add_argument("--coins", type=int, default=5000, help="Upstream dataset size")
+    parser.add_argument(
+        "--upstream-latency-ms", type=float, default=0.0, help="Upstream median latency"
+    )
+    parser.add_argument(
+        "--target-url",
+        help="Benchmark a running server (and its upstream) instead of in-process",
+    )
+    parser.add_argument("--output", help="Write JSON results to this path")
+    parser.add_argument("--baseline", help="Compare against this JSON results file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed relative regression"
+    )
+    args = parser.parse_args(argv)
+    scenarios = args.scenario or list(SCENARIOS)
+
+    if args.target_url:
+        results = asyncio.run(
+            run_benchmark(
+                scenarios,
+                args.requests,
+                args.concurrency,
+                args.warmup,
+                target_url=args.target_url,
+            )
+        )
+    else:
+        from app.config import settings
+        from app.services.coingecko import coingecko_service
+
+        upstream_app = FakeCoinGecko(
+            Dataset(coin_count=args.coins),
+            FaultConfig(
+                latency_ms=args.upstream_latency_ms,
+                latency_distribution="lognormal",
+            ),
+        )
+        with UpstreamServer(upstream_app) as upstream:
+            settings.coingecko_api_url = upstream.url
+            # One benchmark user would otherwise be throttled per-user
+            settings.rate_limit_enabled = False
+            coingecko_service.base_url = upstream.url
+            results = asyncio.run(
+                run_benchmark(scenarios, args.requests, args.concurrency, args.warmup)
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "coins": args.coins,
+            "upstream_latency_ms": args.upstream_latency_ms,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,22 @@
-"""Simple script to run the FastAPI application."""
+"""Simple script to run the FastAPI application.
+
+Runs a single auto-reloading development server. Pass --production to start
+the multi-worker launcher instead (same as `python -m app.server`).
+"""
+
+import sys
 
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="127.0.0.1",  # Use localhost - browsers can't access 0.0.0.0
-        port=8000,
-        reload=True,
-    )
+    if "--production" in sys.argv[1:]:
+        from app.server import main
 
+        main()
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host="127.0.0.1",  # Use localhost - browsers can't access 0.0.0.0
+            port=8000,
+            reload=True,
+        )
@@ -6,9 +6,41 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from app.main import app
 from app.auth import create_access_token
 from app.config import settings
+from app.export import export_cache
+from app.rate_limit import limiter
+from app.responses import page_cache
+from app.services.alerts import alert_engine
+from app.services.category_index import category_index
+from app.services.coin_index import coin_index
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.services.prefetch import prefetcher
+from app.services.warmup import warmup
 from datetime import timedelta
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty in-memory indexes and caches."""
+    category_index.clear()
+    coin_index.clear()
+    market_data_service.clear()
+    market_crawler.clear()
+    prefetcher.clear()
+    limiter.clear()
+    page_cache.clear()
+    export_cache.clear()
+    warmup.clear()
+    alert_engine.clear()
+    yield
+    category_index.clear()
+    coin_index.clear()
+    market_data_service.clear()
+    market_crawler.clear()
+    prefetcher.clear()
+    page_cache.clear()
+
+
 @pytest.fixture
 def client():
     """Create a test client."""
@@ -0,0 +1,84 @@
+"""Tests for adaptive cache TTLs."""
+
+import pytest
+from app import metrics
+from app.config import settings
+from app.services import adaptive_ttl
+from app.services.adaptive_ttl import AdaptiveTTL
+from app.services.rate_budget import RateBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(adaptive_ttl.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = RateBudget(60)
+    monkeypatch.setattr(adaptive_ttl, "upstream_budget", budget)
+    return budget
+
+
+def test_volatile_prices_get_shorter_ttls(clock, budget):
+    """Volatility from 24h change and from refresh history shortens TTLs."""
+    policy = AdaptiveTTL("test")
+    policy.observe("stable", 100.0, change_24h_percent=0.5)
+    policy.observe("volatile", 100.0, change_24h_percent=15.0)
+    assert policy.ttl("stable") == settings.market_data_ttl_max_seconds
+    assert policy.ttl("volatile") < 60
+
+    # A quiet refresh brings the estimate down; a jump pushes it up
+    clock.now += 60
+    policy.observe("volatile", 100.0)
+    calmer = policy.ttl("volatile")
+    clock.now += 60
+    policy.observe("stable", 110.0)
+    assert policy.ttl("stable") == settings.market_data_ttl_min_seconds
+    assert calmer > settings.market_data_ttl_min_seconds
+
+
+def test_unknown_keys_use_base_ttl(clock, budget):
+    """Without signals the base TTL applies, recorded in metrics."""
+    before = metrics.cache_ttl_seconds.count("test-base")
+    policy = AdaptiveTTL("test-base")
+    assert policy.ttl("new") == settings.market_data_ttl_seconds
+    assert metrics.cache_ttl_seconds.count("test-base") == before + 1
+
+
+def test_demand_and_budget_scale_ttl(clock, budget):
+    """Hot keys refresh sooner; a depleted budget stretches TTLs."""
+    policy = AdaptiveTTL("test")
+    for _ in range(5):
+        policy.record_request("hot")
+        policy.record_request("cold")
+        clock.now += 1
+    for _ in range(5):
+        policy.record_request("cold")
+        clock.now += 240
+    assert policy.ttl("hot") < settings.market_data_ttl_seconds < policy.ttl("cold")
+
+    budget.spend(budget.capacity * 0.9)
+    assert policy.ttl("new") == settings.market_data_ttl_seconds * 4
+
+
+def test_tracked_keys_are_bounded(clock, budget, monkeypatch):
+    """Test that the least recently used keys are dropped past the limit."""
+    monkeypatch.setattr(adaptive_ttl, "_MAX_KEYS", 2)
+    policy = AdaptiveTTL("test")
+    policy.record_request("a")
+    policy.record_request("b")
+    policy.observe("a", 100.0)
+    policy.record_request("c")
+
+    assert list(policy._stats) == ["a", "c"]
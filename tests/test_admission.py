@@ -0,0 +1,68 @@
+"""Tests for admission control and load shedding."""
+
+import asyncio
+
+import pytest
+from fastapi import status
+from app import admission, metrics
+from app.admission import AdmissionGate, Overloaded
+
+
+@pytest.mark.asyncio
+async def test_gate_queues_then_sheds():
+    """Requests beyond the limit queue in order; overflow is rejected at once."""
+    gate = AdmissionGate(limit=1, queue_size=1, queue_timeout=1.0)
+    assert await gate.acquire() == 0.0
+
+    queued = asyncio.ensure_future(gate.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded) as overflow:
+        await gate.acquire()
+    assert overflow.value.reason == "queue_full"
+    assert overflow.value.retry_after >= 1
+
+    gate.release(held_for=0.5)
+    assert await queued >= 0.0
+    assert (gate.active, gate.queued) == (1, 0)
+    gate.release()
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_gate_wait_times_out():
+    """A queued request is shed once it has waited for the queue timeout."""
+    gate = AdmissionGate(limit=1, queue_size=4, queue_timeout=0.01)
+    await gate.acquire()
+
+    with pytest.raises(Overloaded) as timed_out:
+        await gate.acquire()
+
+    assert timed_out.value.reason == "queue_timeout"
+    assert gate.queued == 0
+    gate.release()
+    assert gate.active == 0
+
+
+def test_route_classes(client):
+    """Routes are limited by class; health and metrics are never shed."""
+    saturated = AdmissionGate(limit=0, queue_size=0, queue_timeout=1.0)
+    saturated.service_time = 3.0
+    rejected = metrics.admission_rejected_total.get("upstream", "queue_full")
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setitem(admission.gates, "upstream", saturated)
+        shed = client.get("/coins/bitcoin")
+        health = client.get("/health")
+        listing = client.get("/coins")
+        rules = client.get("/alerts")
+        create_rule = client.post("/alerts", json={})
+
+    assert shed.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert shed.headers["retry-after"] == "3"
+    assert metrics.admission_rejected_total.get("upstream", "queue_full") == rejected + 2
+    assert health.status_code == status.HTTP_200_OK
+    assert listing.status_code == status.HTTP_401_UNAUTHORIZED
+    # Classes depend on the method: only creating a rule can call CoinGecko
+    assert rules.status_code == status.HTTP_401_UNAUTHORIZED
+    assert create_rule.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert metrics.admission_queue_seconds.count("cached") > 0
@@ -0,0 +1,270 @@
+"""Tests for price alert rules and their evaluation."""
+
+import asyncio
+import socket
+import time
+
+import httpx
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app import metrics
+from app.config import settings
+from app.services.alerts import (
+    AlertEngine,
+    WebhookURLError,
+    alert_engine,
+    check_webhook_url,
+    pinned_request,
+)
+from app.services.market_crawler import market_crawler
+from app.snapshot import MarketSnapshot
+
+
+def _market(prices, fetched_at=None):
+    """Snapshot of coins at the given INR prices."""
+    snapshot = MarketSnapshot.from_records(
+        {"id": coin_id, "symbol": coin_id, "name": coin_id, "current_price_inr": price}
+        for coin_id, price in prices.items()
+    )
+    if fetched_at is not None:
+        snapshot.fetched_at = fetched_at
+    return snapshot
+
+
+def test_engine_fires_crossed_rules_once():
+    """Only rules the price move crosses fire, each once; old data is ignored."""
+    engine = AlertEngine()
+    above, _ = engine.add("alice", "bitcoin", "above", 110.0, "inr", 100.0, 1.0)
+    below, _ = engine.add("alice", "bitcoin", "below", 90.0, "inr", 100.0, 1.0)
+    drop, _ = engine.add("bob", "bitcoin", "percent_change", -5.0, "inr", 100.0, 1.0)
+    far, _ = engine.add("bob", "bitcoin", "above", 200.0, "inr", 100.0, 1.0)
+    assert drop.threshold == 95.0
+    _, fired = engine.add("bob", "bitcoin", "below", 150.0, "inr", 100.0, 1.0)
+    assert fired.price == 100.0 and engine.count("bob") == 2
+
+    assert engine.observe(_market({"bitcoin": 120.0, "ethereum": 5.0}, 2.0)) == 1
+    # Data older than the last refresh does not move the price back
+    assert engine.observe(_market({"bitcoin": 80.0}, 1.5)) == 0
+    assert engine.observe(_market({"bitcoin": 93.0}, 3.0)) == 1
+    assert engine.observe(_market({"bitcoin": 130.0}, 4.0)) == 0
+
+    assert [e.rule_id for e in engine.events("alice")] == [above.id]
+    bob = engine.events("bob")
+    assert [e.rule_id for e in bob] == [fired.rule_id, drop.id]
+    assert (bob[1].previous_price, bob[1].price) == (120.0, 93.0)
+    assert engine.events("bob", after=bob[0].id) == [bob[1]]
+    assert [rule.id for rule in engine.rules("alice")] == [below.id]
+
+    assert engine.remove("bob", far.id)
+    assert not engine.remove("bob", below.id)
+    assert engine.remove("alice", below.id)
+    assert len(engine) == 0 and engine.observe(_market({"bitcoin": 1.0})) == 0
+
+
+def test_large_rule_set_tick():
+    """A tick over 100k armed rules touches only the crossed ones."""
+    engine = AlertEngine()
+    coins = [f"coin-{i}" for i in range(100)]
+    for i in range(100_000):
+        coin_id = coins[i % 100]
+        offset = 1 + (i // 100) % 500
+        engine.add("user", coin_id, "above", 1000.0 + offset, "inr", 1000.0, 1.0)
+        engine.add("user", coin_id, "below", 1000.0 - offset, "inr", 1000.0, 1.0)
+    assert len(engine) == 200_000
+
+    # Every coin rises by 10: 10 thresholds x 2 rules each per coin fire
+    market = _market({coin_id: 1010.0 for coin_id in coins}, 2.0)
+    started = time.perf_counter()
+    fired = engine.observe(market)
+    elapsed = time.perf_counter() - started
+
+    assert fired == 100 * 10 * 2
+    assert len(engine) == 200_000 - fired
+    # Loose bound; evaluation is typically a few milliseconds
+    assert elapsed < 0.5
+
+
+def test_workers_share_rules(tmp_path):
+    """Rules and alerts are shared by workers, and a crossed rule fires once."""
+    database = str(tmp_path / "alerts.sqlite3")
+    first, second = AlertEngine(database), AlertEngine(database)
+    above, _ = first.add("alice", "bitcoin", "above", 110.0, "inr", 100.0, 1.0)
+    below, _ = first.add("alice", "bitcoin", "below", 90.0, "inr", 100.0, 1.0)
+
+    assert [rule.id for rule in second.rules("alice")] == [above.id, below.id]
+    assert second.remove("alice", below.id)
+    assert len(first) == 1
+
+    assert second.observe(_market({"bitcoin": 120.0}, 2.0)) == 1
+    assert first.observe(_market({"bitcoin": 120.0}, 2.0)) == 0
+    assert [e.rule_id for e in first.events("alice")] == [above.id]
+    assert len(first) == len(second) == 0
+
+
+def test_alert_endpoints(authenticated_client, monkeypatch):
+    """Rules are created at the current price, fire on refresh and can be polled."""
+    monkeypatch.setattr(settings, "alert_webhook_allowed_hosts", "example.com")
+    market = AsyncMock(
+        return_value=[
+            {
+                "id": "bitcoin",
+                "symbol": "btc",
+                "name": "Bitcoin",
+                "current_price": 5000000.0,
+                "current_price_cad": 85000.0,
+                "market_cap": 1000000000000,
+            }
+        ]
+    )
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", market
+    ):
+        created = authenticated_client.post(
+            "/alerts",
+            json={
+                "coin_id": "bitcoin",
+                "condition": "above",
+                "value": 5500000,
+                "webhook_url": "https://example.com/hook",
+            },
+        )
+        satisfied = authenticated_client.post(
+            "/alerts",
+            json={
+                "coin_id": "bitcoin",
+                "condition": "below",
+                "value": 90000,
+                "currency": "cad",
+            },
+        )
+        invalid = authenticated_client.post(
+            "/alerts",
+            json={"coin_id": "bitcoin", "condition": "percent_change", "value": 0},
+        )
+
+    assert created.status_code == status.HTTP_201_CREATED
+    rule = created.json()
+    assert (rule["threshold"], rule["reference_price"], rule["active"]) == (
+        5500000.0, 5000000.0, True
+    )
+    assert satisfied.json()["active"] is False
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+    assert authenticated_client.get("/alerts").json()["total"] == 1
+
+    first = authenticated_client.get("/alerts/events").json()
+    assert len(first["events"]) == 1
+    market_crawler.load(_market({"bitcoin": 5600000.0}))
+    polled = authenticated_client.get(
+        "/alerts/events", params={"after": first["next_after"]}
+    ).json()
+    assert [e["rule_id"] for e in polled["events"]] == [rule["id"]]
+    assert polled["events"][0]["price"] == 5600000.0
+
+    assert authenticated_client.get("/alerts").json()["total"] == 0
+    deleted = authenticated_client.delete(f"/alerts/{rule['id']}")
+    assert deleted.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    "webhook_url",
+    [
+        "http://127.0.0.1:8000/hook",
+        "http://169.254.169.254/latest/meta-data",
+        "http://10.0.0.5/hook",
+        "http://[::1]/hook",
+        "http://localhost/hook",
+    ],
+)
+def test_internal_webhook_rejected(authenticated_client, webhook_url):
+    """Webhooks pointing into the service's own network are refused."""
+    response = authenticated_client.post(
+        "/alerts",
+        json={
+            "coin_id": "bitcoin",
+            "condition": "above",
+            "value": 5500000,
+            "webhook_url": webhook_url,
+        },
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert len(alert_engine) == 0
+
+
+async def test_webhook_allowlist(monkeypatch):
+    """With an allowlist only the listed hosts are accepted."""
+    monkeypatch.setattr(settings, "alert_webhook_allowed_hosts", "hooks.example.com")
+    await check_webhook_url("https://hooks.example.com/alert")
+    with pytest.raises(WebhookURLError):
+        await check_webhook_url("https://example.org/alert")
+
+
+def test_upstream_errors_mapped(authenticated_client):
+    """Failures fetching the current price are reported, not raised."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=ValueError("No exchange rate for currency: cad")),
+    ):
+        response = authenticated_client.post(
+            "/alerts",
+            json={"coin_id": "bitcoin", "condition": "above", "value": 5500000},
+        )
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert "exchange rate" in response.json()["detail"]
+
+
+async def test_webhook_pinned_to_checked_address():
+    """Webhooks connect to the address that was checked, under their own name."""
+    resolved = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 0))]
+    url = "https://hooks.example.net:8443/alert?key=1"
+    with patch.object(
+        asyncio.get_running_loop(), "getaddrinfo", AsyncMock(return_value=resolved)
+    ):
+        address = await check_webhook_url(url)
+
+    target, options = pinned_request(url, address)
+    assert str(target) == "https://93.184.216.34:8443/alert?key=1"
+    assert options == {
+        "headers": {"Host": "hooks.example.net:8443"},
+        "extensions": {"sni_hostname": "hooks.example.net"},
+    }
+    assert pinned_request(url, None) == (httpx.URL(url), {})
+
+
+async def test_webhooks_delivered_and_rechecked(monkeypatch):
+    """Fired alerts are posted from the delivery loop; internal hosts never are."""
+    monkeypatch.setattr(settings, "alert_webhook_allowed_hosts", "example.com")
+    engine = AlertEngine()
+    posted = []
+
+    async def post(self, url, json):
+        posted.append((url, json["rule_id"]))
+        return httpx.Response(200, request=httpx.Request("POST", url))
+
+    with patch.object(httpx.AsyncClient, "post", post):
+        delivery = asyncio.create_task(engine.deliver())
+        await asyncio.sleep(0)
+        good, _ = engine.add(
+            "alice", "bitcoin", "above", 110.0, "inr", 100.0, 1.0,
+            webhook_url="https://example.com/hook",
+        )
+        engine.add(
+            "alice", "bitcoin", "above", 105.0, "inr", 100.0, 1.0,
+            webhook_url="http://127.0.0.1/hook",
+        )
+        rejected = metrics.alert_webhooks_total.get("rejected")
+        engine.observe(_market({"bitcoin": 120.0}, 2.0))
+        for _ in range(100):
+            if posted:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        delivery.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await delivery
+
+    assert posted == [("https://example.com/hook", good.id)]
+    assert metrics.alert_webhooks_total.get("rejected") == rejected + 1
+    assert engine.webhooks is None
@@ -0,0 +1,37 @@
+"""Tests for the load-testing benchmark helpers."""
+
+import pytest
+from benchmarks.load_test import compare, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles."""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize():
+    """Test scenario summaries."""
+    result = summarize([0.001, 0.002, 0.003, 0.004], errors=1, elapsed=2.0)
+    assert result["requests"] == 4
+    assert result["errors"] == 1
+    assert result["rps"] == 2.0
+    assert result["p50_ms"] == 2.0
+    assert result["max_ms"] == 4.0
+
+
+def test_compare_detects_regressions():
+    """Test baseline comparison within and beyond tolerance."""
+    baseline = {
+        "coins": {"rps": 100.0, "p95_ms": 10.0, "errors": 0},
+        "health": {"rps": 1000.0, "p95_ms": 1.0, "errors": 0},
+    }
+    results = {
+        "coins": {"rps": 95.0, "p95_ms": 11.0, "errors": 0},
+        "health": {"rps": 500.0, "p95_ms": 1.0, "errors": 2},
+    }
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert regressions == ["health: rps 1000.0 -> 500.0", "health: errors 0 -> 2"]
@@ -112,3 +112,27 @@ def test_get_category_coins_api_error(authenticated_client):
         )
         assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
 
+
+def test_category_coins_sparse_fieldset(authenticated_client, mock_coingecko_response):
+    """Projected pages carry only the requested columns and are cached."""
+    from unittest.mock import AsyncMock
+    from app.responses import page_cache
+
+    mock_get = AsyncMock(return_value=mock_coingecko_response["market_data"])
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        url = "/categories/layer-1/coins?fields=current_price_inr,id"
+        first = authenticated_client.get(url)
+        second = authenticated_client.get(url)
+        full = authenticated_client.get("/categories/layer-1/coins")
+        invalid = authenticated_client.get("/categories/layer-1/coins?fields=price")
+
+    assert first.status_code == status.HTTP_200_OK
+    assert first.json()["data"] == [{"id": "bitcoin", "current_price_inr": 5000000.0}]
+    assert second.content == first.content
+    assert len(full.json()["data"][0]) == 8
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+    # One rendered page per projection of the same snapshot
+    assert len(page_cache._pages) == 2
+    assert mock_get.await_count == 1
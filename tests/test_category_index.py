@@ -0,0 +1,115 @@
+"""Tests for the category index."""
+
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.services.category_index import CategoryIndex, category_index
+from app.services.market_data import market_data_service
+
+CATEGORIES = [
+    {
+        "category_id": "decentralized-finance-defi",
+        "name": "Decentralized Finance (DeFi)",
+    },
+    {"category_id": "defi-index", "name": "DeFi Index"},
+    {"category_id": "meme-token", "name": "Meme"},
+    {"category_id": "layer-1", "name": "Layer 1 (L1)"},
+]
+
+MEMBERS = {
+    "decentralized-finance-defi": ["uniswap", "aave"],
+    "meme-token": ["dogecoin"],
+    "layer-1": ["bitcoin", "ethereum", "dogecoin"],
+}
+
+
+async def _markets_page(vs_currency, category=None, **kwargs):
+    """Serve category membership as a single market data page."""
+    return [{"id": coin_id} for coin_id in MEMBERS.get(category, [])]
+
+
+def test_search_prefix_then_substring():
+    """Test that prefix matches come before substring matches."""
+    index = CategoryIndex()
+    index.load(CATEGORIES)
+
+    assert [c["category_id"] for c in index.search("defi")] == [
+        "defi-index",
+        "decentralized-finance-defi",
+    ]
+    assert [c["category_id"] for c in index.search("L1")] == ["layer-1"]
+    assert index.search("nothing") == []
+    assert len(index.search("  ")) == 4
+
+
+@pytest.mark.asyncio
+async def test_crawl_builds_reverse_index():
+    """Test incremental crawling of category membership."""
+    index = CategoryIndex()
+    index.load(CATEGORIES)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page",
+        side_effect=_markets_page,
+    ):
+        while (category_id := index.next_to_crawl()) is not None:
+            await index.crawl_category(category_id)
+
+    assert index.coverage == (4, 4)
+    assert index.members("meme-token") == frozenset({"dogecoin"})
+    assert [c["category_id"] for c in index.categories_of("dogecoin")] == [
+        "meme-token",
+        "layer-1",
+    ]
+    assert index.categories_of("unknown") == []
+
+    # Categories dropped upstream disappear from the reverse index
+    index.load(CATEGORIES[:2])
+    assert index.categories_of("dogecoin") == []
+
+
+def test_list_categories_search(authenticated_client):
+    """Test /categories?q= and that the list is fetched once."""
+    mock_get = AsyncMock(return_value=CATEGORIES)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_categories",
+        side_effect=mock_get,
+    ):
+        response = authenticated_client.get("/categories?q=meme")
+        authenticated_client.get("/categories")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] == [{"category_id": "meme-token", "name": "Meme"}]
+    assert mock_get.await_count == 1
+
+
+def test_get_coin_categories(authenticated_client):
+    """Test the coin-to-categories endpoint."""
+    from app.services.category_index import category_index
+
+    category_index.load(CATEGORIES)
+    category_index._set_members("layer-1", frozenset({"bitcoin"}))
+
+    response = authenticated_client.get("/coins/bitcoin/categories")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["data"] == [{"category_id": "layer-1", "name": "Layer 1 (L1)"}]
+    assert data["crawled_categories"] == 1
+    assert data["total_categories"] == 4
+
+
+def test_unknown_category_rejected(authenticated_client):
+    """Test that unlisted categories are rejected before any state is kept."""
+    category_index.load(CATEGORIES)
+    upstream = AsyncMock(side_effect=AssertionError("no upstream call expected"))
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", upstream
+    ):
+        by_path = authenticated_client.get("/categories/no-such-category/coins")
+        by_query = authenticated_client.get(
+            "/coins/market-data?coin_id=bitcoin&category=no-such-category"
+        )
+
+    assert by_path.status_code == status.HTTP_404_NOT_FOUND
+    assert by_query.status_code == status.HTTP_404_NOT_FOUND
+    assert "no-such-category" not in market_data_service.snapshot_ttl_policy._stats
+    assert category_index.next_to_crawl() != "no-such-category"
@@ -0,0 +1,119 @@
+"""Tests for coin ID validation and negative caching."""
+
+import asyncio
+
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+from app.services import coin_index as coin_index_module
+from app.services.coin_index import CoinIndex, UnknownCoinsError, coin_index
+from app.services.market_data import MarketDataService
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+    {"id": "delisted-coin", "symbol": "dead", "name": "Delisted"},
+]
+
+BITCOIN = {
+    "id": "bitcoin",
+    "symbol": "btc",
+    "name": "Bitcoin",
+    "current_price": 5000000.0,
+    "market_cap": 1000000000000,
+    "price_change_percentage_24h": 2.5,
+}
+
+
+def test_partition_checks_listed_ids(monkeypatch):
+    """IDs are only rejected once the coin list is loaded or negatively cached."""
+    index = CoinIndex()
+    assert index.partition(["bitcoin", "not-a-coin"]) == (
+        ["bitcoin", "not-a-coin"], []
+    )
+
+    index.load(COINS)
+    assert index.partition(["bitcoin", "not-a-coin"]) == (
+        ["bitcoin"], ["not-a-coin"]
+    )
+
+    index.mark_unknown(["delisted-coin"])
+    assert index.partition(["delisted-coin"]) == ([], ["delisted-coin"])
+
+    monkeypatch.setattr(settings, "unknown_coin_ttl_seconds", 0)
+    index.mark_unknown(["delisted-coin"])
+    assert index.partition(["delisted-coin"]) == (["delisted-coin"], [])
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_waits_for_budget_outside_lock(monkeypatch):
+    """A background refresh waiting for budget does not hold up requests."""
+    budget_free = asyncio.Event()
+
+    async def wait_for(**kwargs):
+        await budget_free.wait()
+
+    budget = AsyncMock()
+    budget.wait_for.side_effect = wait_for
+    monkeypatch.setattr(coin_index_module, "upstream_budget", budget)
+    index = CoinIndex()
+    mock_get = AsyncMock(return_value=COINS)
+    with patch("app.services.coingecko.coingecko_service.get_all_coins", mock_get):
+        background = asyncio.ensure_future(index.get_coins(background=True))
+        await asyncio.sleep(0)
+        coins = await asyncio.wait_for(index.get_coins(), 1.0)
+        budget_free.set()
+        await background
+
+    assert len(coins) == 3
+    # The background refresh found the list fresh once it got the lock
+    assert mock_get.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_ids_negatively_cached():
+    """IDs without upstream data are dropped from later requests."""
+    service = MarketDataService()
+    mock_get = AsyncMock(return_value=[BITCOIN])
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        result = await service.get_market_data(coin_ids=["bitcoin", "typo-coin"])
+        with pytest.raises(UnknownCoinsError):
+            await service.get_market_data(coin_ids=["typo-coin"])
+
+    assert [row["id"] for row in result] == ["bitcoin"]
+    assert mock_get.await_count == 1
+
+
+def test_unknown_coin_rejected_before_upstream(authenticated_client):
+    """Unlisted coins get a 404 without any CoinGecko call."""
+    coin_index.load(COINS)
+    mock_get = AsyncMock(return_value=[BITCOIN])
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        missing = authenticated_client.get("/coins/not-a-coin")
+        partial = authenticated_client.get(
+            "/coins/market-data?coin_id=bitcoin,not-a-coin"
+        )
+
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+    assert "not-a-coin" in missing.json()["detail"]
+    assert partial.status_code == status.HTTP_200_OK
+    assert mock_get.await_args.kwargs["coin_ids"] == ["bitcoin"]
+    assert mock_get.await_count == 1
+
+
+def test_coin_list_cached(authenticated_client):
+    """The coin listing is served from the cached list."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(return_value=COINS),
+    ) as mock_get:
+        authenticated_client.get("/coins")
+        response = authenticated_client.get("/coins?page_num=1&per_page=2")
+
+    assert response.json()["total"] == 3
+    assert mock_get.await_count == 1
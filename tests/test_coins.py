@@ -187,3 +187,51 @@ def test_pagination_validation(authenticated_client, mock_coingecko_response):
         response = authenticated_client.get("/coins?page_num=1&per_page=0")
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
+
+def test_market_data_sort_and_top_n(authenticated_client):
+    """Test server-side sorting and top-N on market data."""
+    market_data = [
+        {
+            "id": f"coin{i}",
+            "symbol": f"c{i}",
+            "name": f"Coin {i}",
+            "current_price": float(i),
+            "market_cap": i * 1000,
+            "price_change_percentage_24h": float(i % 7),
+        }
+        for i in range(20)
+    ]
+
+    mock_get = AsyncMock(return_value=market_data)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=mock_get,
+    ):
+        response = authenticated_client.get(
+            "/coins/market-data?category=defi&sort_by=market_cap_inr"
+            "&top_n=5&min_market_cap=3000&page_num=1&per_page=3"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 5
+        assert [coin["id"] for coin in data["data"]] == [
+            "coin19", "coin18", "coin17"
+        ]
+
+        response = authenticated_client.get(
+            "/coins/market-data?category=defi&top_n=5"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_list_coins_sparse_fieldset(authenticated_client, mock_coingecko_response):
+    """The coin listing can be projected down to selected fields."""
+    coins = [{**coin, "platforms": {}} for coin in mock_coingecko_response["coins_list"]]
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(return_value=coins),
+    ):
+        response = authenticated_client.get("/coins?fields=id")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] == [{"id": coin["id"]} for coin in coins]
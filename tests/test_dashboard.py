@@ -0,0 +1,115 @@
+"""Tests for the composite dashboard endpoint."""
+
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+]
+
+CATEGORIES = [{"category_id": "layer-1", "name": "Layer 1 (L1)"}]
+
+BITCOIN = {
+    "id": "bitcoin",
+    "symbol": "btc",
+    "name": "Bitcoin",
+    "current_price": 5000000.0,
+    "market_cap": 1000000000000,
+    "price_change_percentage_24h": 2.5,
+}
+
+ETHEREUM = {
+    "id": "ethereum",
+    "symbol": "eth",
+    "name": "Ethereum",
+    "current_price": 250000.0,
+    "market_cap": 3000000000,
+    "price_change_percentage_24h": -1.0,
+}
+
+
+async def _markets(coin_ids=None, category=None, **kwargs):
+    """Serve the layer-1 category, or the requested coins."""
+    if category is not None:
+        return [BITCOIN, ETHEREUM]
+    return [coin for coin in (BITCOIN, ETHEREUM) if coin["id"] in coin_ids]
+
+
+def test_dashboard_runs_sub_queries_together(authenticated_client):
+    """Sub-queries share one request, caches and upstream fetches."""
+    market_data = AsyncMock(side_effect=_markets)
+    queries = {
+        "categories": {"op": "categories", "fields": "name"},
+        "top": {"op": "category_coins", "category": "layer-1", "per_page": 1},
+        "next": {
+            "op": "market_data",
+            "category": "layer-1",
+            "per_page": 1,
+            "page_num": 2,
+        },
+        "again": {"op": "category_coins", "category": "layer-1", "per_page": 1},
+        "watchlist": {
+            "op": "market_data",
+            "coin_id": "ethereum",
+            "fields": "id,current_price_inr",
+        },
+        "coins": {"op": "coins", "per_page": 1},
+        "bad": {"op": "market_data", "coin_id": "bitcoin", "top_n": 1},
+    }
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(return_value=COINS),
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_categories",
+        AsyncMock(return_value=CATEGORIES),
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        market_data,
+    ):
+        response = authenticated_client.post("/dashboard", json={"queries": queries})
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert list(results) == list(queries)
+    assert results["categories"]["body"]["data"] == [{"name": "Layer 1 (L1)"}]
+    assert [c["id"] for c in results["top"]["body"]["data"]] == ["bitcoin"]
+    assert [c["id"] for c in results["next"]["body"]["data"]] == ["ethereum"]
+    assert results["again"] == results["top"]
+    assert results["watchlist"]["body"]["data"] == [
+        {"id": "ethereum", "current_price_inr": 250000.0}
+    ]
+    assert results["coins"]["body"]["total"] == 2
+    assert results["bad"] == {"status": 400, "detail": "'top_n' requires 'sort_by'"}
+    # One fetch for the category, one for the watchlist
+    assert market_data.await_count == 2
+    # One unit per distinct sub-query
+    assert int(response.headers["ratelimit-remaining"]) == (
+        settings.user_rate_limit_burst - 6
+    )
+
+
+def test_dashboard_limits(authenticated_client, monkeypatch):
+    """The token is required and the number of sub-queries is capped."""
+    monkeypatch.setattr(settings, "dashboard_max_queries", 1)
+    body = {"queries": {"a": {"op": "coins"}, "b": {"op": "categories"}}}
+
+    unauthenticated = authenticated_client.post(
+        "/dashboard", json=body, headers={"Authorization": "Bearer invalid"}
+    )
+    too_many = authenticated_client.post("/dashboard", json=body)
+    missing = authenticated_client.post(
+        "/dashboard", json={"queries": {"a": {"op": "coin_categories"}}}
+    )
+
+    assert unauthenticated.status_code in (
+        status.HTTP_401_UNAUTHORIZED,
+        status.HTTP_403_FORBIDDEN,
+    )
+    assert too_many.status_code == status.HTTP_400_BAD_REQUEST
+    assert missing.json()["results"]["a"] == {
+        "status": 400,
+        "detail": "'coin_id' is required",
+    }
@@ -0,0 +1,110 @@
+"""Tests for per-request latency budgets."""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import status
+from unittest.mock import patch
+from app.deadline import DeadlineExceeded, set_budget
+from app.services.coingecko import CoinGeckoService
+from app.services.market_data import market_data_service
+
+BITCOIN = {
+    "id": "bitcoin",
+    "symbol": "btc",
+    "name": "Bitcoin",
+    "current_price": 5000000.0,
+    "market_cap": 1000000000000,
+    "price_change_percentage_24h": 2.5,
+}
+
+
+async def _slow_fetch(**kwargs):
+    """Stand in for a CoinGecko call that overruns any short budget."""
+    await asyncio.sleep(5)
+    return [BITCOIN]
+
+
+async def _deadline_fetch(**kwargs):
+    """Stand in for a CoinGecko call cut short by the latency budget."""
+    raise DeadlineExceeded("budget exhausted")
+
+
+@pytest.mark.asyncio
+async def test_upstream_call_honours_budget():
+    """A slow upstream answer is abandoned once the budget runs out."""
+
+    async def handler(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json=[])
+
+    service = CoinGeckoService()
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    set_budget(0.05)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await service.get_all_coins()
+        set_budget(0)
+        with pytest.raises(DeadlineExceeded):
+            await service.get_all_coins()
+    finally:
+        await service.client.aclose()
+
+
+def test_stale_data_served_when_budget_runs_out(authenticated_client):
+    """Expired records are served with their age instead of failing."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        return_value=[BITCOIN],
+    ):
+        fresh = authenticated_client.get("/coins/bitcoin")
+    assert "age" not in fresh.headers
+
+    # Expire the cached record
+    for key, (_, row, fetched_at) in list(market_data_service._records.items()):
+        market_data_service._records[key] = (0.0, row, fetched_at - 42)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=_slow_fetch,
+    ):
+        response = authenticated_client.get(
+            "/coins/bitcoin", headers={"X-Latency-Budget-Ms": "50"}
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert int(response.headers["age"]) >= 42
+    assert response.json()["data"][0]["id"] == "bitcoin"
+
+
+def test_stale_category_snapshot_served(authenticated_client):
+    """An expired category snapshot is served when the budget runs out."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        return_value=[BITCOIN],
+    ):
+        authenticated_client.get("/categories/layer-1/coins")
+    for key, (_, snapshot) in list(market_data_service._snapshots.items()):
+        market_data_service._snapshots[key] = (0.0, snapshot)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=_deadline_fetch,
+    ):
+        response = authenticated_client.get("/categories/layer-1/coins")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "age" in response.headers
+    assert response.json()["total"] == 1
+
+
+def test_gateway_timeout_without_cache(authenticated_client):
+    """Without cached data an exhausted budget is a 504, not a 500."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=_deadline_fetch,
+    ):
+        response = authenticated_client.get("/coins/market-data?coin_id=bitcoin")
+
+    assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
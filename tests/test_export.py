@@ -0,0 +1,139 @@
+"""Tests for columnar market snapshot exports."""
+
+import io
+
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app import export
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.snapshot import MarketSnapshot
+
+MARKET_DATA = [
+    {
+        "id": "bitcoin",
+        "symbol": "btc",
+        "name": "Bitcoin",
+        "current_price": 5000000.0,
+        "current_price_cad": 85000.0,
+        "market_cap": 1000000000000,
+        "market_cap_cad": 17000000000,
+        "price_change_percentage_24h": 2.5,
+    },
+    {
+        "id": "ethereum",
+        "symbol": "eth",
+        "name": "Ethereum",
+        "current_price": 250000.0,
+        "current_price_cad": None,
+        "market_cap": 3000000000,
+        "market_cap_cad": None,
+        "price_change_percentage_24h": None,
+    },
+]
+
+
+@pytest.fixture
+def cached_markets(authenticated_client):
+    """Cache market data for two coins."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(return_value=MARKET_DATA),
+    ):
+        authenticated_client.get("/coins/market-data?coin_id=bitcoin,ethereum")
+    return authenticated_client
+
+
+def test_negotiate_accept():
+    """Formats are picked by quality, falling back to CSV for wildcards."""
+    assert export.negotiate(None) == "csv"
+    assert export.negotiate("text/html, */*;q=0.1") == "csv"
+    assert export.negotiate("application/json") is None
+    assert (
+        export.negotiate("text/csv;q=0.5, application/vnd.apache.parquet")
+        == ("parquet" if export.pa is not None else "csv")
+    )
+
+
+def test_csv_export_cached_per_version(cached_markets):
+    """The CSV export covers every cached coin and is rendered once."""
+    response = cached_markets.get("/snapshots/markets?format=csv")
+    unchanged = cached_markets.get(
+        "/snapshots/markets", headers={"If-None-Match": response.headers["etag"]}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["x-snapshot-coins"] == "2"
+    lines = response.text.splitlines()
+    assert lines[0] == (
+        "id,symbol,name,current_price_inr,current_price_cad,"
+        "market_cap_inr,market_cap_cad,price_change_percentage_24h"
+    )
+    assert lines[1] == "bitcoin,btc,Bitcoin,5000000.0,85000.0,1000000000000,17000000000,2.5"
+    assert lines[2] == "ethereum,eth,Ethereum,250000.0,,3000000000,,"
+    assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED
+    assert export.export_cache._bodies.keys() == {"csv"}
+    assert market_data_service.market_snapshot() is market_data_service.market_snapshot()
+
+
+async def test_etag_follows_content():
+    """Snapshots with equal rows share an ETag whatever their version."""
+    first = MarketSnapshot.from_markets(MARKET_DATA, extra={"cad": MARKET_DATA})
+    again = MarketSnapshot.from_markets(MARKET_DATA, extra={"cad": MARKET_DATA})
+    other = MarketSnapshot.from_markets(MARKET_DATA[:1], extra={"cad": MARKET_DATA[:1]})
+
+    _, etag = await export.export_cache.get(first, "csv")
+    _, same = await export.export_cache.get(again, "csv")
+    _, changed = await export.export_cache.get(other, "csv")
+
+    assert first.version != again.version
+    assert etag == same
+    assert etag != changed
+
+
+def test_export_prefers_fresh_crawl(cached_markets):
+    """A fresh full-market crawl is exported instead of the record cache."""
+    crawled = MarketSnapshot.from_markets(
+        MARKET_DATA * 2, extra={"cad": MARKET_DATA * 2}
+    )
+    market_crawler.load(crawled)
+    fresh = cached_markets.get("/snapshots/markets?format=csv")
+    assert fresh.headers["x-snapshot-coins"] == "4"
+
+    crawled.fetched_at -= 10_000
+    expired = cached_markets.get("/snapshots/markets?format=csv")
+    assert expired.headers["x-snapshot-coins"] == "2"
+
+
+def test_arrow_formats_need_pyarrow(cached_markets, monkeypatch):
+    """Without pyarrow, Arrow and Parquet are not acceptable."""
+    monkeypatch.setattr(export, "pa", None)
+    response = cached_markets.get("/snapshots/markets?format=parquet")
+    fallback = cached_markets.get(
+        "/snapshots/markets",
+        headers={"Accept": "application/vnd.apache.parquet, text/csv;q=0.5"},
+    )
+
+    assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+    assert fallback.headers["content-type"].startswith("text/csv")
+
+
+def test_arrow_and_parquet_exports(cached_markets):
+    """Arrow IPC and Parquet exports round-trip with typed columns."""
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    arrow = cached_markets.get(
+        "/snapshots/markets",
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    parquet = cached_markets.get("/snapshots/markets?format=parquet")
+
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert table.equals(pq.read_table(io.BytesIO(parquet.content)))
+    assert table.column("id").to_pylist() == ["bitcoin", "ethereum"]
+    assert table.schema.field("market_cap_inr").type == pa.int64()
+    assert table.column("current_price_cad").to_pylist() == [85000.0, None]
+    assert arrow.headers["etag"] != parquet.headers["etag"]
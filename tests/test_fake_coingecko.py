@@ -0,0 +1,84 @@
+"""Tests for the local CoinGecko stand-in."""
+
+import json
+import httpx
+import pytest
+from benchmarks.fake_coingecko import Dataset, FakeCoinGecko, FaultConfig
+from app.services.coingecko import CoinGeckoService
+
+
+def _client(faults=None, coin_count=300):
+    """Create a client bound to a fake CoinGecko."""
+    fake = FakeCoinGecko(Dataset(coin_count=coin_count, category_count=5), faults)
+    return fake, httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake), base_url="http://fake"
+    )
+
+
+@pytest.mark.asyncio
+async def test_markets_pagination_and_ranking():
+    """Test that markets are ranked by market cap and paginated."""
+    _, client = _client()
+    async with client:
+        first = (await client.get(
+            "/coins/markets", params={"vs_currency": "usd", "per_page": 250}
+        )).json()
+        second = (await client.get(
+            "/coins/markets",
+            params={"vs_currency": "usd", "per_page": 250, "page": 2},
+        )).json()
+        missing = await client.get(
+            "/coins/markets", params={"vs_currency": "usd", "category": "nope"}
+        )
+
+    assert len(first) == 250
+    assert len(second) == 50
+    assert [coin["market_cap_rank"] for coin in first[:3]] == [1, 2, 3]
+    assert first[0]["market_cap"] >= first[1]["market_cap"]
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_budget_returns_retry_after():
+    """Test 429 responses with Retry-After beyond the per-minute budget."""
+    fake, client = _client(FaultConfig(rate_limit_per_minute=2))
+    async with client:
+        statuses = [(await client.get("/ping")).status_code for _ in range(3)]
+        limited = await client.get("/ping")
+
+    assert statuses == [200, 200, 429]
+    assert int(limited.headers["retry-after"]) > 0
+    assert fake.stats[("/ping", 429)] == 2
+
+
+@pytest.mark.asyncio
+async def test_error_and_truncation_injection():
+    """Test injected 500s and truncated bodies."""
+    _, client = _client(FaultConfig(error_rate=1.0))
+    async with client:
+        assert (await client.get("/coins/list")).status_code == 500
+
+    _, client = _client(FaultConfig(truncate_rate=1.0))
+    async with client:
+        response = await client.get("/coins/list")
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(response.content)
+
+
+@pytest.mark.asyncio
+async def test_service_against_fake_coingecko():
+    """Test the CoinGecko service end to end against the fake server."""
+    _, client = _client()
+    service = CoinGeckoService()
+    service.base_url = "http://fake"
+    service.client = client
+
+    coins = await service.get_all_coins()
+    snapshot = await service.get_coin_market_data(
+        coin_ids=["coin-1", "coin-2"], vs_currencies=["inr", "cad"]
+    )
+    await service.close()
+
+    assert len(coins) == 300
+    assert sorted(row["id"] for row in snapshot) == ["coin-1", "coin-2"]
+    assert all(row["current_price_cad"] is not None for row in snapshot)
@@ -0,0 +1,59 @@
+"""Tests for incremental JSON array parsing."""
+
+import json
+
+import pytest
+from app.json_stream import iter_json_array
+from app.services.coin_store import CoinStore
+
+
+async def _chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def _parse(body: bytes, size: int):
+    return [item async for item in iter_json_array(_chunks(body, size))]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+async def test_elements_parsed_across_chunk_boundaries(size):
+    """Elements split anywhere, including inside UTF-8 sequences, decode intact."""
+    items = [
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "cafe", "symbol": "caf", "name": "Café ☕"},
+        12345,
+        [1.5, None, True],
+        "text",
+    ]
+    body = b" [\n" + json.dumps(items).encode()[1:-1] + b"\n] "
+    assert await _parse(body, size) == items
+    assert await _parse(b"[]", size) == []
+
+
+@pytest.mark.asyncio
+async def test_truncated_body_rejected():
+    """A body cut off before the closing bracket is an error."""
+    with pytest.raises(json.JSONDecodeError):
+        await _parse(b'[{"id": "bitcoin"}, {"id": "eth', 4)
+    with pytest.raises(json.JSONDecodeError):
+        await _parse(b'{"id": "bitcoin"}', 4)
+
+
+@pytest.mark.asyncio
+async def test_coin_store_from_stream():
+    """The coin store keeps id, symbol and name and builds rows on access."""
+    coins = [
+        {"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}", "platforms": {}}
+        for i in range(5)
+    ]
+    store = await CoinStore.from_stream(
+        iter_json_array(_chunks(json.dumps(coins).encode(), 16))
+    )
+
+    assert len(store) == 5
+    assert store[1] == {"id": "coin-1", "symbol": "c1", "name": "Coin 1"}
+    assert [coin["id"] for coin in store[3:]] == ["coin-3", "coin-4"]
+    assert list(store) == list(CoinStore.from_coins(coins))
+    assert "platforms" not in store[0]
@@ -33,3 +33,15 @@ def test_redoc_endpoint(client):
     response = client.get("/redoc")
     assert response.status_code == status.HTTP_200_OK
 
+
+def test_openapi_documents_typed_responses(client):
+    """Test that the OpenAPI schema describes the typed response items."""
+    schema = client.get("/openapi.json").json()
+    components = schema["components"]["schemas"]
+    assert {"CoinListItem", "Category", "CoinMarketData"} <= set(components)
+
+    response_schema = schema["paths"]["/coins/market-data"]["get"]["responses"][
+        "200"
+    ]["content"]["application/json"]["schema"]
+    page = components[response_schema["$ref"].split("/")[-1]]
+    assert page["properties"]["data"]["items"]["$ref"].endswith("/CoinMarketData")
@@ -0,0 +1,287 @@
+"""Tests for the full-market crawler."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+from app.services import market_crawler as crawler_module
+from app.services.category_index import category_index
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.services.rate_budget import RateBudget
+
+
+def _coins(currency, count):
+    """Market rows ranked by market cap, priced per currency."""
+    factor = 60.0 if currency == "inr" else 1.0
+    return [
+        {
+            "id": f"coin-{rank}",
+            "symbol": f"c{rank}",
+            "name": f"Coin {rank}",
+            "current_price": (count - rank) * factor,
+            "market_cap": (count - rank) * 1000 * factor,
+            "price_change_percentage_24h": rank % 7 - 3.0,
+        }
+        for rank in range(count)
+    ]
+
+
+@pytest.fixture
+def crawled(monkeypatch):
+    """Crawl a 600-coin market served as 250-coin pages."""
+    monkeypatch.setattr(crawler_module, "PAGE_SIZE", 250)
+    monkeypatch.setattr(settings, "market_crawl_concurrency", 2)
+    # A full budget for each test
+    monkeypatch.setattr(
+        crawler_module,
+        "upstream_budget",
+        RateBudget(settings.upstream_rate_limit_per_minute),
+    )
+    monkeypatch.setattr(
+        "app.services.coingecko.coingecko_service.get_exchange_rates",
+        AsyncMock(return_value={"inr": 60.0, "cad": 1.0}),
+    )
+    markets = {currency: _coins(currency, 600) for currency in ("inr", "cad")}
+
+    async def markets_page(vs_currency, page=1, per_page=250, **kwargs):
+        rows = markets[vs_currency][(page - 1) * per_page:page * per_page]
+        if page == 2:
+            # A coin moved down across the page boundary mid-crawl
+            rows = [markets[vs_currency][249]] + rows[1:]
+        return rows
+
+    return AsyncMock(side_effect=markets_page)
+
+
+async def test_crawl_builds_ranked_snapshot(crawled):
+    """Each currency's pages are fetched in concurrent windows until a short page."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        snapshot = await market_crawler.crawl()
+
+    pages = sorted(
+        (call.args[0], call.kwargs["page"]) for call in crawled.await_args_list
+    )
+    assert pages == [(c, p) for c in ("cad", "inr") for p in (1, 2, 3, 4)]
+    # coin-250 was skipped by the move; the duplicate of coin-249 is dropped
+    assert len(snapshot) == 599
+    assert snapshot.text["id"][:2] == ["coin-0", "coin-1"]
+    assert "coin-250" not in snapshot.text["id"]
+    assert snapshot.numeric["current_price_cad"][0] == 600.0
+    assert market_crawler.complete
+    assert market_crawler.fresh(("inr", "cad")) is snapshot
+    assert market_crawler.fresh(("inr",)) is None
+
+
+async def test_exchange_rates_replace_secondary_pages(crawled, monkeypatch):
+    """With exchange rates, only the primary currency is crawled unless none are known."""
+    monkeypatch.setattr(settings, "use_exchange_rates", True)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        snapshot = await market_crawler.crawl()
+    assert {call.args[0] for call in crawled.await_args_list} == {"inr"}
+    assert snapshot.numeric["current_price_cad"][0] == 600.0
+
+    crawled.reset_mock()
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_exchange_rates",
+        AsyncMock(side_effect=httpx.ConnectError("down")),
+    ):
+        snapshot = await market_crawler.crawl()
+    assert {call.args[0] for call in crawled.await_args_list} == {"inr", "cad"}
+    assert snapshot.numeric["current_price_cad"][0] == 600.0
+
+
+async def test_slow_crawl_arrives_fresh(crawled, monkeypatch):
+    """A crawl slower than the TTL max still stands in for records once done."""
+    monkeypatch.setattr(settings, "market_data_ttl_max_seconds", 0.15)
+
+    async def slow_page(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await crawled(*args, **kwargs)
+
+    started = time.monotonic()
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page",
+        AsyncMock(side_effect=slow_page),
+    ):
+        await market_crawler.crawl()
+    assert time.monotonic() - started > settings.market_data_ttl_max_seconds
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=AssertionError("no upstream call expected")),
+    ):
+        coins = await market_data_service.get_market_data(coin_ids=["coin-3"])
+    assert coins.text["id"] == ["coin-3"]
+
+
+async def test_max_pages_marks_partial_crawl(crawled, monkeypatch):
+    """A page limit stops the crawl early, so categories are not served from it."""
+    monkeypatch.setattr(settings, "market_crawl_max_pages", 1)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        snapshot = await market_crawler.crawl()
+
+    assert len(snapshot) == 250
+    assert not market_crawler.complete
+
+
+async def test_routes_serve_crawled_market(crawled, authenticated_client, monkeypatch):
+    """Coin, category and unfiltered queries are answered without upstream calls."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        await market_crawler.crawl()
+    category_index.load([{"category_id": "small", "name": "Small"}])
+    category_index._set_members("small", frozenset({"coin-599", "coin-5", "gone"}))
+    upstream = AsyncMock(side_effect=AssertionError("no upstream call expected"))
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", upstream
+    ):
+        coins = authenticated_client.get("/coins/market-data?coin_id=coin-7,coin-3")
+        category = authenticated_client.get("/categories/small/coins")
+        gainers = authenticated_client.get(
+            "/coins/market-data?sort_by=price_change_percentage_24h&top_n=3"
+            "&min_market_cap=500000"
+        )
+
+    assert [c["id"] for c in coins.json()["data"]] == ["coin-3", "coin-7"]
+    assert [c["id"] for c in category.json()["data"]] == ["coin-5", "coin-599"]
+    assert gainers.json()["total"] == 3
+    assert all(c["price_change_percentage_24h"] == 3.0 for c in gainers.json()["data"])
+
+    monkeypatch.setattr(settings, "market_crawl_max_age_seconds", 0)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(return_value=[]),
+    ) as refetch:
+        authenticated_client.get("/coins/market-data?coin_id=coin-8")
+        stale = authenticated_client.get("/coins/market-data")
+    assert refetch.await_count == 1
+    assert stale.json()["stale"] is True
+
+
+async def test_crawl_pages_take_budget(crawled, monkeypatch):
+    """Concurrent pages each take their token, never dipping into the reserve."""
+    budget = RateBudget(600, burst=4)
+    monkeypatch.setattr(crawler_module, "upstream_budget", budget)
+    monkeypatch.setattr(settings, "background_budget_reserve", 0.5)
+    monkeypatch.setattr(settings, "market_crawl_concurrency", 3)
+    monkeypatch.setattr(settings, "use_exchange_rates", True)
+    balances = []
+
+    async def markets_page(*args, **kwargs):
+        # Suspend before spending, as a request does
+        await asyncio.sleep(0)
+        budget.spend()
+        balances.append(budget.remaining)
+        return await crawled(*args, **kwargs)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page",
+        AsyncMock(side_effect=markets_page),
+    ):
+        await market_crawler.crawl()
+
+    assert len(balances) == 3
+    assert min(balances) >= 2
+
+
+async def test_old_crawl_not_served_as_fresh(crawled, monkeypatch):
+    """Crawled rows stand in only within the TTL max; the market within the stale limit."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        await market_crawler.crawl()
+    market_crawler.snapshot.fetched_at -= settings.market_data_ttl_max_seconds
+    row = {"id": "coin-8", "symbol": "c8", "name": "Coin 8", "current_price": 1.0}
+    upstream = AsyncMock(return_value=[row])
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", upstream
+    ):
+        coins = await market_data_service.get_market_data(coin_ids=["coin-8"])
+        market = await market_data_service.get_market_data()
+    assert upstream.await_args.kwargs["coin_ids"] == ["coin-8"]
+    assert coins.numeric["current_price_inr"][0] == 1.0
+    assert len(market) == 599
+
+    monkeypatch.setattr(settings, "market_crawl_max_age_seconds", 0)
+    monkeypatch.setattr(settings, "stale_if_error_max_age_seconds", 0)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", upstream
+    ):
+        market = await market_data_service.get_market_data()
+    assert upstream.await_args.kwargs["coin_ids"] is None
+    assert market.text["id"] == ["coin-8"]
+
+    market_data_service.clear()
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=ValueError("down")),
+    ), pytest.raises(ValueError):
+        await market_data_service.get_market_data()
+
+
+async def test_preloaded_crawl_not_repeated(crawled, monkeypatch):
+    """A worker starting with a fresh preloaded snapshot waits before crawling."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ):
+        await market_crawler.crawl()
+    crawled.reset_mock()
+    monkeypatch.setattr(
+        crawler_module.asyncio, "sleep", AsyncMock(side_effect=asyncio.CancelledError)
+    )
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_markets_page", crawled
+    ), pytest.raises(asyncio.CancelledError):
+        await market_crawler.run()
+    crawled.assert_not_awaited()
+
+
+async def test_one_worker_crawls_for_all(crawled, tmp_path):
+    """Only the lock holder crawls; the others load what it publishes."""
+    leader, follower = crawler_module.MarketCrawler(), crawler_module.MarketCrawler()
+    leader.share(str(tmp_path))
+    follower.share(str(tmp_path))
+    try:
+        assert leader._lead()
+        assert not follower._lead()
+        with patch(
+            "app.services.coingecko.coingecko_service.get_markets_page", crawled
+        ):
+            snapshot = await leader.crawl()
+        leader._publish()
+        await follower._follow()
+
+        assert follower.snapshot.text["id"] == snapshot.text["id"]
+        assert follower.snapshot.fetched_at == snapshot.fetched_at
+        assert follower.snapshot.version != snapshot.version
+        assert follower.complete
+
+        # The lock is released when the crawling worker goes
+        leader.clear()
+        assert follower._lead()
+    finally:
+        leader.clear()
+        follower.clear()
+
+
+def test_unfiltered_market_data_needs_crawl(authenticated_client):
+    """Without a crawled snapshot, a filter is still required."""
+    response = authenticated_client.get("/coins/market-data")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
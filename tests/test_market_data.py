@@ -0,0 +1,238 @@
+"""Tests for the per-coin market data cache."""
+
+import httpx
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+from app.services.category_index import category_index
+from app.services.coin_index import coin_index
+from app.services.market_data import MarketDataService, market_data_service
+
+
+def _market_rows(coin_ids):
+    """Raw market data rows, larger market caps for lower-numbered coins."""
+    return [
+        {
+            "id": coin_id,
+            "symbol": coin_id[:3],
+            "name": coin_id.title(),
+            "current_price": 100.0,
+            "market_cap": 10_000 - len(coin_id) * 100,
+            "price_change_percentage_24h": 1.0,
+        }
+        for coin_id in coin_ids
+    ]
+
+
+async def _fetch(coin_ids=None, category=None, vs_currencies=None):
+    return _market_rows(coin_ids or [])
+
+
+def _upstream_error(status_code):
+    """An HTTP error as raised by CoinGeckoService for a status code."""
+    request = httpx.Request("GET", "https://api.coingecko.com/api/v3/coins/markets")
+    return httpx.HTTPStatusError(
+        "upstream error",
+        request=request,
+        response=httpx.Response(status_code, request=request),
+    )
+
+
+def _expire(service, age=0.0):
+    """Expire every cached record and snapshot, backdating them by age."""
+    for key, (_, row, fetched_at) in list(service._records.items()):
+        service._records[key] = (0.0, row, fetched_at - age)
+    for key, (_, snapshot) in list(service._snapshots.items()):
+        snapshot.fetched_at -= age
+        service._snapshots[key] = (0.0, snapshot)
+
+
+@pytest.mark.asyncio
+async def test_overlapping_ids_share_cached_records():
+    """Only coins missing from the cache are fetched."""
+    service = MarketDataService()
+    mock_get = AsyncMock(side_effect=_fetch)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        first = await service.get_market_data(coin_ids=["bitcoin", "ethereum"])
+        second = await service.get_market_data(coin_ids=["ethereum", "solana"])
+
+    assert len(first) == 2
+    assert [row["id"] for row in second] == ["solana", "ethereum"]
+    assert mock_get.await_args_list[1].kwargs["coin_ids"] == ["solana"]
+
+
+@pytest.mark.asyncio
+async def test_coin_and_category_intersected_locally():
+    """Indexed category membership is intersected without upstream filtering."""
+    category_index._set_members("defi", frozenset({"uniswap", "aave"}))
+    service = MarketDataService()
+    mock_get = AsyncMock(side_effect=_fetch)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        result = await service.get_market_data(
+            coin_ids=["bitcoin", "uniswap"], category="defi"
+        )
+        await service.get_market_data(coin_ids=["uniswap", "aave"], category="defi")
+        empty = await service.get_market_data(coin_ids=["bitcoin"], category="defi")
+
+    assert [row["id"] for row in result] == ["uniswap"]
+    assert len(empty) == 0
+    assert mock_get.await_count == 2
+    for call, coin_ids in zip(mock_get.await_args_list, (["uniswap"], ["aave"])):
+        assert call.kwargs["coin_ids"] == coin_ids
+        assert call.kwargs.get("category") is None
+
+
+@pytest.mark.asyncio
+async def test_unindexed_category_goes_upstream_and_is_prioritized():
+    """Without membership the combination is fetched and queued for crawling."""
+    category_index.load(
+        [{"category_id": "defi", "name": "DeFi"}, {"category_id": "nft", "name": "NFT"}]
+    )
+    category_index._set_members("nft", frozenset())
+    service = MarketDataService()
+    mock_get = AsyncMock(side_effect=_fetch)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        await service.get_market_data(coin_ids=["uniswap"], category="defi")
+        await service.get_market_data(coin_ids=["uniswap"])
+
+    assert mock_get.await_args.kwargs["category"] == "defi"
+    assert mock_get.await_count == 1
+    assert category_index.next_to_crawl() == "defi"
+
+
+@pytest.mark.asyncio
+async def test_category_snapshot_cached():
+    """Category-only queries reuse the cached snapshot."""
+    service = MarketDataService()
+    mock_get = AsyncMock(return_value=_market_rows(["uniswap", "aave"]))
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        first = await service.get_market_data(category="defi")
+        second = await service.get_market_data(category="defi")
+        cached = await service.get_market_data(coin_ids=["aave"])
+
+    assert second is first
+    assert [row["id"] for row in cached] == ["aave"]
+    assert mock_get.await_count == 1
+    assert service.expires_in(category="defi") > 0
+    assert service.expires_in(category="nft") == 0
+
+
+@pytest.mark.asyncio
+async def test_last_known_good_served_on_upstream_failure(monkeypatch):
+    """Expired data stands in for failed refreshes up to the maximum age."""
+    service = MarketDataService()
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_fetch),
+    ):
+        await service.get_market_data(coin_ids=["bitcoin"])
+        await service.get_market_data(category="defi")
+    _expire(service, age=60)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_upstream_error(503)),
+    ):
+        coins = await service.get_market_data(coin_ids=["bitcoin"])
+        category = await service.get_market_data(category="defi")
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.get_market_data(coin_ids=["bitcoin", "solana"])
+
+    assert coins.stale and [row["id"] for row in coins] == ["bitcoin"]
+    assert category.stale and coins.age >= 60
+
+    monkeypatch.setattr(settings, "stale_if_error_max_age_seconds", 30)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=httpx.ConnectError("refused")),
+    ):
+        with pytest.raises(httpx.ConnectError):
+            await service.get_market_data(coin_ids=["bitcoin"])
+
+
+@pytest.mark.asyncio
+async def test_client_errors_not_masked():
+    """A 404 from CoinGecko is passed on rather than served stale."""
+    service = MarketDataService()
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_fetch),
+    ):
+        await service.get_market_data(category="defi")
+    _expire(service)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_upstream_error(404)),
+    ):
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.get_market_data(category="defi")
+
+
+def test_stale_response_marked(authenticated_client):
+    """Routes flag last known good data in the payload and headers."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_fetch),
+    ):
+        fresh = authenticated_client.get("/coins/market-data?coin_id=bitcoin")
+    _expire(market_data_service, age=5)
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        AsyncMock(side_effect=_upstream_error(502)),
+    ):
+        stale = authenticated_client.get("/coins/market-data?coin_id=bitcoin")
+
+    assert fresh.json()["stale"] is False
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.json()["stale"] is True
+    assert int(stale.headers["age"]) >= 5
+    assert stale.headers["warning"].startswith("111")
+
+
+def test_stale_coin_list_served(authenticated_client, monkeypatch):
+    """The previous coin list is served while /coins/list is failing."""
+    coin_index.load([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}])
+    monkeypatch.setattr(settings, "coin_list_refresh_seconds", 0)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(side_effect=httpx.ReadTimeout("timed out")),
+    ):
+        response = authenticated_client.get("/coins")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["stale"] is True
+    assert response.json()["total"] == 1
+    assert "warning" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_more_ids_than_a_page():
+    """IDs beyond one page are fetched in chunks and not marked unknown."""
+    coin_ids = [f"coin-{i}" for i in range(300)]
+
+    async def get(endpoint, params=None, **kwargs):
+        # CoinGecko caps the page at per_page, 100 by default
+        rows = _market_rows(params["ids"].split(","))[: params.get("per_page", 100)]
+        return httpx.Response(200, json=rows, request=httpx.Request("GET", endpoint))
+
+    mock_get = AsyncMock(side_effect=get)
+    with patch("app.services.coingecko.coingecko_service._get", mock_get):
+        snapshot = await MarketDataService().get_market_data(coin_ids=coin_ids)
+
+    assert len(snapshot) == 300
+    assert all(
+        len(call.kwargs["params"]["ids"].split(",")) <= 250
+        for call in mock_get.await_args_list
+    )
+    assert coin_index.partition(coin_ids) == (coin_ids, [])
@@ -0,0 +1,109 @@
+"""Tests for Prometheus metrics."""
+
+import httpx
+import pytest
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app import metrics
+from app.services.coingecko import CoinGeckoService
+
+
+def test_histogram_and_counter_rendering():
+    """Test exposition format of counters and histograms."""
+    registry = metrics.Registry()
+    counter = registry.register(
+        metrics.Counter("demo_total", "Demo counter.", ("kind",))
+    )
+    histogram = registry.register(
+        metrics.Histogram("demo_seconds", "Demo latency.", buckets=(0.1, 1.0))
+    )
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+
+    with pytest.raises(ValueError):
+        registry.register(metrics.Counter("demo_total", "Duplicate."))
+
+
+def test_special_values_rendering():
+    """NaN and infinities use the exposition format's spelling."""
+    registry = metrics.Registry()
+    gauge = registry.register(metrics.Gauge("demo_value", "Demo gauge.", ("kind",)))
+    gauge.set(float("nan"), "nan")
+    gauge.set(float("inf"), "up")
+    gauge.set(float("-inf"), "down")
+
+    text = registry.render()
+    assert 'demo_value{kind="nan"} NaN' in text
+    assert 'demo_value{kind="up"} +Inf' in text
+    assert 'demo_value{kind="down"} -Inf' in text
+
+
+def test_metrics_endpoint_reports_route_templates(
+    authenticated_client, mock_coingecko_response
+):
+    """Test that requests are recorded per route template and status."""
+    mock_get = AsyncMock(return_value=mock_coingecko_response["market_data"])
+    before = metrics.http_requests_total.get("GET", "/coins/{coin_id}", "200")
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=mock_get,
+    ):
+        authenticated_client.get("/coins/bitcoin")
+        authenticated_client.get("/coins/ethereum")
+
+    response = authenticated_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert metrics.http_requests_total.get("GET", "/coins/{coin_id}", "200") == before + 2
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert "coingecko_pool_connections" in response.text
+
+
+
+def test_unknown_methods_share_a_label(client):
+    """Test that arbitrary request methods do not add label values."""
+    before = metrics.http_requests_total.get("OTHER", "unmatched", "404")
+    client.request("FOOBAR", "/nowhere")
+    client.request("BAZ", "/nowhere")
+
+    assert metrics.http_requests_total.get("OTHER", "unmatched", "404") == before + 2
+    assert metrics.http_requests_total.get("FOOBAR", "unmatched", "404") == 0
+
+@pytest.mark.asyncio
+async def test_upstream_calls_are_recorded():
+    """Test upstream latency, status and error metrics."""
+
+    def handler(request):
+        if request.url.path.endswith("/coins/list"):
+            return httpx.Response(200, json=[])
+        return httpx.Response(429)
+
+    service = CoinGeckoService()
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ok_before = metrics.upstream_requests_total.get("/coins/list", "200")
+    errors_before = metrics.upstream_errors_total.get(
+        "/coins/categories/list", "http_429"
+    )
+
+    await service.get_all_coins()
+    with pytest.raises(httpx.HTTPStatusError):
+        await service.get_categories()
+    await service.close()
+
+    assert metrics.upstream_requests_total.get("/coins/list", "200") == ok_before + 1
+    assert metrics.upstream_errors_total.get(
+        "/coins/categories/list", "http_429"
+    ) == errors_before + 1
+    assert metrics.upstream_request_duration_seconds.count("/coins/list") >= 1
+    assert metrics.upstream_inflight_requests.get() == 0
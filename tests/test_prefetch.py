@@ -0,0 +1,103 @@
+"""Tests for the prefetch engine."""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from app import metrics
+from app.config import settings
+from app.services import prefetch
+from app.services.market_crawler import market_crawler
+from app.services.market_data import market_data_service
+from app.services.prefetch import Prefetcher, filter_key
+from app.services.rate_budget import RateBudget
+from app.snapshot import MarketSnapshot
+
+MARKET_DATA = [
+    {
+        "id": "uniswap",
+        "symbol": "uni",
+        "name": "Uniswap",
+        "current_price": 500.0,
+        "market_cap": 300_000,
+        "price_change_percentage_24h": 1.0,
+    }
+]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Full shared budget and a mocked market data fetch."""
+    monkeypatch.setattr(prefetch, "upstream_budget", RateBudget(30))
+    mock_get = AsyncMock(return_value=MARKET_DATA)
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data", mock_get
+    ):
+        yield mock_get
+
+
+@pytest.mark.asyncio
+async def test_next_page_prefetched_and_used(upstream, monkeypatch):
+    """Paging near expiry queues a refresh that the next page then uses."""
+    await market_data_service.get_market_data(category="defi")
+    monkeypatch.setattr(settings, "prefetch_lead_seconds", 10_000)
+    prefetcher = Prefetcher()
+    used = metrics.prefetch_total.get("used")
+
+    prefetcher.record("/categories/{category_id}/coins", None, "defi", 1, 3)
+    assert list(prefetcher._queue) == [(None, "defi")]
+    await prefetcher.prefetch((None, "defi"))
+
+    assert upstream.await_count == 2
+    assert upstream.await_args.kwargs["category"] == "defi"
+    prefetcher.record("/categories/{category_id}/coins", None, "defi", 2, 3)
+    assert prefetcher.hit_ratio == 1.0
+    assert metrics.prefetch_total.get("used") == used + 1
+
+
+@pytest.mark.asyncio
+async def test_last_page_and_fresh_data_not_prefetched(upstream):
+    """Nothing is queued on the last page or while data stays fresh."""
+    await market_data_service.get_market_data(category="defi")
+    prefetcher = Prefetcher()
+    prefetcher.record("/categories/{category_id}/coins", None, "defi", 1, 3)
+    prefetcher.record("/coins/market-data", ["uniswap"], None, 1, 1)
+    assert not prefetcher._queue
+
+    await prefetcher.prefetch((None, "defi"))
+    assert upstream.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_crawled_market_not_prefetched(upstream, monkeypatch):
+    """Unfiltered pages are served from the crawl and enqueue nothing."""
+    monkeypatch.setattr(settings, "prefetch_popular_filters", 1)
+    market_crawler.load(MarketSnapshot.from_markets(MARKET_DATA))
+    prefetcher = Prefetcher()
+    prefetcher.record("/coins/market-data", None, None, 1, 5)
+    prefetcher.schedule_popular()
+    assert not prefetcher._queue
+
+    await prefetcher.prefetch((None, None))
+    assert upstream.await_count == 0
+
+
+@pytest.mark.asyncio
+async def test_unused_prefetch_counts_as_wasted(upstream):
+    """Prefetched data that expires unrequested lowers the hit ratio."""
+    prefetcher = Prefetcher()
+    key = filter_key(["uniswap"], None)
+    await prefetcher.prefetch(key)
+    assert upstream.await_args.kwargs["coin_ids"] == ["uniswap"]
+    assert key in prefetcher._pending
+
+    prefetcher._pending[key] = 0.0
+    prefetcher._sweep()
+    assert prefetcher.hit_ratio == 0.0
+
+
+def test_popular_filters_ranked_across_routes():
+    """Demand for the same filter on different routes adds up."""
+    prefetcher = Prefetcher()
+    prefetcher.record("/coins/market-data", ["eth", "btc"], None, 1, 1)
+    prefetcher.record("/coins/{coin_id}", ["btc", "eth"], None, 1, 1)
+    prefetcher.record("/categories/{category_id}/coins", None, "defi", 1, 1)
+    assert prefetcher.popular(2) == [(("btc", "eth"), None), (None, "defi")]
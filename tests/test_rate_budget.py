@@ -0,0 +1,44 @@
+"""Tests for the shared upstream rate budget."""
+
+import asyncio
+import pytest
+from app.services.rate_budget import RateBudget
+
+
+def test_spend_and_refill():
+    """Test that spending can overdraw and refills over time."""
+    budget = RateBudget(rate_per_minute=60, burst=2)
+    budget.spend()
+    budget.spend()
+    budget.spend()
+    assert budget.remaining < 0
+    budget.updated -= 2.0
+    assert budget.remaining == pytest.approx(1.0, abs=0.05)
+    assert budget.remaining_fraction == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_keeps_reserve():
+    """Test that background waits leave the reserve for foreground calls."""
+    budget = RateBudget(rate_per_minute=6000, burst=10)
+    budget.tokens = 5.5
+    await asyncio.wait_for(budget.wait_for(reserve=0.5), timeout=1)
+
+    budget.tokens = 0
+    budget.rate = 0
+    with pytest.raises(RuntimeError):
+        await budget.wait_for()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_takes_tokens_for_the_next_spend():
+    """Test that waited-for tokens are taken at once and not spent twice."""
+    budget = RateBudget(rate_per_minute=60, burst=10)
+    await budget.wait_for(2)
+    assert budget.remaining == pytest.approx(8, abs=0.05)
+
+    budget.spend()
+    budget.spend()
+    assert budget.remaining == pytest.approx(8, abs=0.05)
+    budget.spend()
+    assert budget.remaining == pytest.approx(7, abs=0.05)
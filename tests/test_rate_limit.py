@@ -0,0 +1,83 @@
+"""Tests for per-user rate limiting."""
+
+from datetime import timedelta
+from unittest.mock import patch
+from fastapi import status
+from app.auth import create_access_token
+from app.config import settings
+from app.rate_limit import GCRALimiter, record_upstream_call
+
+MARKET_DATA = [
+    {
+        "id": "bitcoin",
+        "symbol": "btc",
+        "name": "Bitcoin",
+        "current_price": 5000000.0,
+        "market_cap": 1000000000000,
+        "price_change_percentage_24h": 2.5,
+    }
+]
+
+
+async def _upstream_fetch(**kwargs):
+    """Stand in for a fetch that made one CoinGecko call per currency."""
+    record_upstream_call()
+    record_upstream_call()
+    return MARKET_DATA
+
+
+def test_gcra_burst_then_sustained_rate():
+    """A full burst is admitted, then requests are spaced by the rate."""
+    limiter = GCRALimiter(rate_per_minute=60, burst=5)
+    states = [limiter.check("alice") for _ in range(6)]
+
+    assert [state.allowed for state in states] == [True] * 5 + [False]
+    assert [state.remaining for state in states[:5]] == [4, 3, 2, 1, 0]
+    assert 0 < states[-1].retry_after <= 1.0
+    assert limiter.check("bob").allowed
+
+    limiter.charge("bob", 10)
+    state = limiter.check("bob")
+    assert not state.allowed
+    assert state.retry_after > 5
+
+
+def test_upstream_requests_cost_more(authenticated_client):
+    """Cache hits cost one unit; each upstream call adds the upstream cost."""
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=_upstream_fetch,
+    ):
+        first = authenticated_client.get("/coins/bitcoin")
+        second = authenticated_client.get("/coins/bitcoin")
+
+    burst = settings.user_rate_limit_burst
+    upstream_cost = 2 * settings.user_rate_limit_upstream_cost
+    assert first.headers["ratelimit-limit"] == str(burst)
+    assert int(first.headers["ratelimit-remaining"]) == burst - 1 - upstream_cost
+    assert int(second.headers["ratelimit-remaining"]) == burst - 2 - upstream_cost
+    assert int(second.headers["ratelimit-reset"]) > 0
+
+
+def test_exhausted_user_gets_429(client, auth_token):
+    """A user over their allowance is rejected without affecting others."""
+    heavy = {"Authorization": f"Bearer {auth_token}"}
+    other_token = create_access_token(
+        data={"sub": "otheruser"}, expires_delta=timedelta(minutes=5)
+    )
+    other = {"Authorization": f"Bearer {other_token}"}
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=_upstream_fetch,
+    ):
+        responses = [
+            client.get(f"/coins/coin-{i}", headers=heavy) for i in range(3)
+        ]
+        allowed = client.get("/coins/bitcoin", headers=other)
+
+    limited = responses[-1]
+    assert limited.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(limited.headers["retry-after"]) >= 1
+    assert limited.headers["ratelimit-remaining"] == "0"
+    assert allowed.status_code == status.HTTP_200_OK
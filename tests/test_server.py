@@ -0,0 +1,138 @@
+"""Tests for the production launcher."""
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from app import server
+from app.config import settings
+from app.services.rate_budget import RateBudget
+
+
+def test_worker_count_explicit_and_auto():
+    """Explicit counts win; 0 means one worker per usable CPU."""
+    assert server.worker_count(3) == 3
+    assert server.worker_count(0) == server.cpu_limit() >= 1
+
+
+def test_accelerators_selected_when_installed(monkeypatch):
+    """'auto' picks uvloop/httptools if importable, explicit values win."""
+    monkeypatch.setattr(settings, "server_loop", "auto")
+    monkeypatch.setattr(settings, "server_http", "h11")
+    assert server.event_loop() in ("uvloop", "asyncio")
+    assert server.http_protocol() == "h11"
+    assert server._pick("auto", "no_such_module_here", "asyncio") == "asyncio"
+
+
+def test_rate_budget_set_rate():
+    """Workers split the upstream budget without gaining tokens."""
+    budget = RateBudget(30)
+    budget.set_rate(10)
+    assert budget.capacity == 10
+    assert budget.remaining <= 10
+
+
+def test_preload_fetches_shared_data(monkeypatch):
+    """The master loads the lists and crawls the market before forking."""
+    loaders = {
+        "category_index": "get_categories",
+        "coin_index": "get_coins",
+        "market_crawler": "crawl",
+    }
+    for name, method in loaders.items():
+        monkeypatch.setattr(getattr(server, name), method, AsyncMock())
+    monkeypatch.setattr(settings, "market_crawl_enabled", True)
+
+    server.preload()
+
+    for name, method in loaders.items():
+        getattr(getattr(server, name), method).assert_awaited_once()
+
+
+def test_budget_share_follows_resize(monkeypatch):
+    """Workers take their share at start and retake it on every resize."""
+    budget = RateBudget(settings.upstream_rate_limit_per_minute)
+    monkeypatch.setattr(server, "upstream_budget", budget)
+    monkeypatch.setattr(server.warmup, "cluster_ready", None)
+    handler = signal.getsignal(signal.SIGUSR1)
+    with server.bind_socket("127.0.0.1", 0) as sock:
+        supervisor = server.Supervisor(sock, 2)
+        try:
+            supervisor._configure_worker()
+            assert budget.capacity == settings.upstream_rate_limit_per_minute / 2
+
+            # This process stands in for a running worker
+            supervisor.workers[os.getpid()] = time.monotonic()
+            supervisor.resize(4)
+            assert budget.capacity == settings.upstream_rate_limit_per_minute / 4
+        finally:
+            signal.signal(signal.SIGUSR1, handler)
+            shutil.rmtree(supervisor.shared_dir)
+
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(child) for child in f.read().split()}
+
+
+def _wait_healthy(url, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError(f"{url} never became healthy")
+
+
+@pytest.mark.skipif(
+    not os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"),
+    reason="needs Linux /proc child listing",
+)
+def test_rolling_restart_replaces_workers():
+    """SIGHUP replaces every worker while the socket keeps serving ready."""
+    with server.bind_socket("127.0.0.1", 0) as probe:
+        port = probe.getsockname()[1]
+    env = {
+        **os.environ,
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": "2",
+        "SERVER_PRELOAD": "false",
+        "SERVER_GRACEFUL_TIMEOUT_SECONDS": "2",
+        "WARMUP_TIMEOUT_SECONDS": "1",
+        "COINGECKO_API_URL": "http://127.0.0.1:9",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/ready"
+    try:
+        _wait_healthy(url)
+        before = _children(process.pid)
+        assert len(before) == 2
+
+        process.send_signal(signal.SIGHUP)
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            after = _children(process.pid)
+            if len(after) == 2 and not after & before:
+                break
+            assert httpx.get(url, timeout=5.0).status_code == 200
+            time.sleep(0.1)
+        assert len(after) == 2 and not after & before
+        _wait_healthy(url)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
@@ -20,16 +20,16 @@ async def test_get_all_coins(coingecko_service):
         {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
     ]
 
-    async def mock_get(*args, **kwargs):
-        mock_response_obj = AsyncMock()
-        mock_response_obj.json = AsyncMock(return_value=mock_response)
-        mock_response_obj.raise_for_status = AsyncMock()
-        return mock_response_obj
+    def handler(request):
+        return httpx.Response(200, json=mock_response)
 
-    with patch.object(coingecko_service.client, "get", side_effect=mock_get):
-        result = await coingecko_service.get_all_coins()
-        assert len(result) == 2
-        assert result[0]["id"] == "bitcoin"
+    coingecko_service.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    result = await coingecko_service.get_all_coins()
+    await coingecko_service.close()
+    assert len(result) == 2
+    assert result[0]["id"] == "bitcoin"
 
 
 @pytest.mark.asyncio
@@ -97,3 +97,123 @@ async def test_get_coin_market_data(coingecko_service):
         assert "current_price_cad" in result[0]
         assert "market_cap_cad" in result[0]
 
+
+@pytest.mark.asyncio
+async def test_get_coin_market_data_builds_snapshot():
+    """Test that market data in several currencies is merged into one snapshot."""
+    requested = []
+
+    def handler(request):
+        currency = request.url.params["vs_currency"]
+        requested.append(currency)
+        price = {"inr": 5000000.0, "cad": 85000.0}[currency]
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "id": "bitcoin",
+                    "symbol": "btc",
+                    "name": "Bitcoin",
+                    "image": "https://example.com/btc.png",
+                    "current_price": price,
+                    "market_cap": 1000000000000,
+                    "price_change_percentage_24h": 2.5,
+                }
+            ],
+        )
+
+    service = CoinGeckoService()
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    result = await service.get_coin_market_data(
+        coin_ids=["bitcoin"], vs_currencies=["inr", "cad"]
+    )
+    await service.close()
+
+    assert requested == ["inr", "cad"]
+    assert len(result) == 1
+    assert result[0]["current_price_inr"] == 5000000.0
+    assert result[0]["current_price_cad"] == 85000.0
+    assert "image" not in result[0]
+
+
+def _exchange_rates_handler(calls, fail_rates=False):
+    """Build a mock transport handler serving markets and exchange rates."""
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.endswith("/exchange_rates"):
+            if fail_rates:
+                return httpx.Response(503)
+            return httpx.Response(
+                200,
+                json={
+                    "rates": {
+                        "btc": {"value": 1.0, "type": "crypto"},
+                        "inr": {"value": 5000000.0, "type": "fiat"},
+                        "cad": {"value": 80000.0, "type": "fiat"},
+                    }
+                },
+            )
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "id": "bitcoin",
+                    "symbol": "btc",
+                    "name": "Bitcoin",
+                    "current_price": 5000000.0,
+                    "market_cap": 1000000000000,
+                    "price_change_percentage_24h": 2.5,
+                }
+            ],
+        )
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_get_coin_market_data_with_exchange_rates():
+    """Test deriving CAD from cached exchange rates instead of a second call."""
+    from app.config import settings
+
+    calls = []
+    service = CoinGeckoService()
+    service.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(_exchange_rates_handler(calls))
+    )
+    with patch.object(settings, "use_exchange_rates", True):
+        result = await service.get_coin_market_data(coin_ids=["bitcoin"])
+        await service.get_coin_market_data(coin_ids=["bitcoin"])
+    await service.close()
+
+    assert calls.count("/api/v3/exchange_rates") == 1
+    assert calls.count("/api/v3/coins/markets") == 2
+    assert result[0]["current_price_cad"] == pytest.approx(80000.0)
+    assert result[0]["market_cap_cad"] == 16000000000
+    assert service.exchange_rates_age() is not None
+
+
+@pytest.mark.asyncio
+async def test_get_exchange_rates_keeps_stale_rates_on_error():
+    """Test that a failed refresh keeps serving the previous rates."""
+    from app.config import settings
+
+    calls = []
+    service = CoinGeckoService()
+    service.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(_exchange_rates_handler(calls))
+    )
+    rates = await service.get_exchange_rates()
+    await service.close()
+
+    service.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            _exchange_rates_handler(calls, fail_rates=True)
+        )
+    )
+    with patch.object(settings, "exchange_rates_ttl_seconds", 0):
+        assert await service.get_exchange_rates() == rates
+    await service.close()
+
+    assert "btc" not in rates
+    assert len(calls) == 2
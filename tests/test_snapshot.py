@@ -0,0 +1,164 @@
+"""Tests for columnar market snapshots."""
+
+import sys
+import pytest
+from app.snapshot import MarketSnapshot
+
+
+@pytest.fixture
+def snapshot():
+    """Create a small market snapshot."""
+    return MarketSnapshot.from_records(
+        [
+            {
+                "id": "bitcoin",
+                "symbol": "btc",
+                "name": "Bitcoin",
+                "current_price_inr": 5000000.0,
+                "current_price_cad": 85000.0,
+                "market_cap_inr": 1000000000000,
+                "market_cap_cad": 17000000000,
+                "price_change_percentage_24h": 2.5,
+            },
+            {
+                "id": "ethereum",
+                "symbol": "eth",
+                "name": "Ethereum",
+                "current_price_inr": 300000.0,
+                "current_price_cad": 5100.0,
+                "market_cap_inr": 500000000000,
+                "market_cap_cad": 8500000000,
+                "price_change_percentage_24h": -1.5,
+            },
+            {
+                "id": "dogecoin",
+                "symbol": "doge",
+                "name": "Dogecoin",
+                "current_price_inr": 10.0,
+                "current_price_cad": None,
+                "market_cap_inr": 1000000000,
+                "market_cap_cad": None,
+                "price_change_percentage_24h": 7.0,
+            },
+            {
+                "id": "newcoin",
+                "symbol": "new",
+                "name": "New Coin",
+                "current_price_inr": 1.0,
+                "current_price_cad": None,
+                "market_cap_inr": None,
+                "market_cap_cad": None,
+                "price_change_percentage_24h": None,
+            },
+        ]
+    )
+
+
+def test_select_without_options_keeps_order(snapshot):
+    """Test that an empty query returns every row in original order."""
+    rows = snapshot.rows(snapshot.select())
+    assert [row["id"] for row in rows] == [
+        "bitcoin", "ethereum", "dogecoin", "newcoin"
+    ]
+
+
+def test_select_sort_places_missing_last(snapshot):
+    """Test sorting in both directions with missing values last."""
+    desc = snapshot.rows(snapshot.select(sort_by="price_change_percentage_24h"))
+    assert [row["id"] for row in desc] == [
+        "dogecoin", "bitcoin", "ethereum", "newcoin"
+    ]
+
+    asc = snapshot.rows(
+        snapshot.select(sort_by="price_change_percentage_24h", order="asc")
+    )
+    assert [row["id"] for row in asc] == [
+        "ethereum", "bitcoin", "dogecoin", "newcoin"
+    ]
+
+
+def test_select_filters_and_top_n(snapshot):
+    """Test market cap and price filters combined with top-N."""
+    indices = snapshot.select(
+        sort_by="market_cap_inr", min_market_cap=1000000000, max_price=400000
+    )
+    assert [row["id"] for row in snapshot.rows(indices)] == [
+        "ethereum", "dogecoin"
+    ]
+
+    top = snapshot.select(sort_by="price_change_percentage_24h", top_n=2)
+    assert [row["id"] for row in snapshot.rows(top)] == ["dogecoin", "bitcoin"]
+
+
+def test_rows_restore_missing_and_integer_values(snapshot):
+    """Test that materialized rows match the formatted response shape."""
+    row = snapshot.rows([2])[0]
+    assert row["current_price_cad"] is None
+    assert row["market_cap_inr"] == 1000000000
+    assert isinstance(row["market_cap_inr"], int)
+    assert list(row) == [
+        "id",
+        "symbol",
+        "name",
+        "current_price_inr",
+        "current_price_cad",
+        "market_cap_inr",
+        "market_cap_cad",
+        "price_change_percentage_24h",
+    ]
+
+
+def test_select_unknown_column(snapshot):
+    """Test that unknown sort columns are rejected."""
+    with pytest.raises(ValueError):
+        snapshot.select(sort_by="volume")
+
+
+def test_from_markets_keeps_served_fields_only():
+    """Test ingesting upstream payloads into a compact snapshot."""
+    markets = [
+        {
+            "id": "bitcoin",
+            "symbol": "btc",
+            "name": "Bitcoin",
+            "image": "https://example.com/btc.png",
+            "current_price": 5000000.0,
+            "market_cap": 1000000000000,
+            "total_volume": 123,
+            "price_change_percentage_24h": 2.5,
+        },
+        {
+            "id": "ethereum",
+            "symbol": "eth",
+            "name": "Ethereum",
+            "current_price": 300000.0,
+            "market_cap": 500000000000,
+            "price_change_percentage_24h": None,
+        },
+    ]
+    cad = [{"id": "bitcoin", "current_price": 85000.0, "market_cap": 17000000000}]
+
+    snapshot = MarketSnapshot.from_markets(markets, "inr", {"cad": cad})
+
+    assert len(snapshot) == 2
+    assert snapshot.text["id"][0] is sys.intern("bitcoin")
+    assert snapshot[0] == {
+        "id": "bitcoin",
+        "symbol": "btc",
+        "name": "Bitcoin",
+        "current_price_inr": 5000000.0,
+        "current_price_cad": 85000.0,
+        "market_cap_inr": 1000000000000,
+        "market_cap_cad": 17000000000,
+        "price_change_percentage_24h": 2.5,
+    }
+    assert snapshot[1]["current_price_cad"] is None
+    assert [row["id"] for row in snapshot] == ["bitcoin", "ethereum"]
+
+
+def test_view_materializes_only_requested_slice(snapshot):
+    """Test that views are lazy sequences usable for pagination."""
+    view = snapshot.view(snapshot.select(sort_by="current_price_inr"))
+    assert len(view) == 4
+    assert [row["id"] for row in view[1:3]] == ["ethereum", "dogecoin"]
+    assert view[-1]["id"] == "newcoin"
@@ -0,0 +1,66 @@
+"""Tests for Server-Timing spans and the on-demand profiler."""
+
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+from app.timing import format_server_timing, span
+
+
+def test_span_outside_request_is_noop():
+    """Test that spans do nothing without an active request."""
+    with span("idle"):
+        pass
+
+
+def test_format_server_timing():
+    """Test Server-Timing header formatting."""
+    header = format_server_timing(
+        [("jwt", None, 0.0005), ("upstream", '/coins/markets "inr"', 0.25)]
+    )
+    assert header == (
+        'jwt;dur=0.500, upstream;dur=250.000;desc="/coins/markets \'inr\'"'
+    )
+
+
+def test_market_data_server_timing(authenticated_client, mock_coingecko_response):
+    """Test that market data responses report per-stage timings."""
+    mock_get = AsyncMock(return_value=mock_coingecko_response["market_data"])
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=mock_get,
+    ):
+        response = authenticated_client.get("/coins/market-data?coin_id=bitcoin")
+
+    assert response.status_code == status.HTTP_200_OK
+    names = [
+        entry.split(";")[0].strip()
+        for entry in response.headers["server-timing"].split(",")
+    ]
+    for name in ("jwt", "format", "paginate", "serialize", "total"):
+        assert name in names
+    assert names[-1] == "total"
+
+
+def test_profiler_requires_key(authenticated_client, mock_coingecko_response):
+    """Test that profiling runs only with the configured key."""
+    mock_get = AsyncMock(return_value=mock_coingecko_response["market_data"])
+    with patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        side_effect=mock_get,
+    ), patch.object(settings, "profiler_key", "s3cret"):
+        normal = authenticated_client.get(
+            "/coins/bitcoin", headers={"X-Profile": "wrong"}
+        )
+        profiled = authenticated_client.get(
+            "/coins/bitcoin", headers={"X-Profile": "s3cret"}
+        )
+        by_query = authenticated_client.get("/coins/bitcoin?profile=s3cret")
+
+    assert normal.headers["content-type"] == "application/json"
+    assert profiled.status_code == status.HTTP_200_OK
+    assert profiled.headers["content-type"].startswith("text/plain")
+    assert profiled.headers["x-profiled-status"] == "200"
+    assert profiled.text.startswith("# ")
+    # The key is a secret and is not accepted in the loggable query string
+    assert by_query.headers["content-type"] == "application/json"
+    assert "x-profiled-status" not in by_query.headers
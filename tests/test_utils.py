@@ -1,7 +1,9 @@
 """Tests for utility functions."""
 
 import pytest
-from app.utils import paginate_data, format_market_data
+from fastapi import HTTPException
+from app.models import CoinMarketData
+from app.utils import paginate_data, format_market_data, get_fields
 
 
 def test_paginate_data():
@@ -50,3 +52,35 @@ def test_format_market_data():
     assert result["market_cap_cad"] == 1700000000
     assert result["price_change_percentage_24h"] == 2.5
 
+
+def test_paginate_data_accepts_lazy_sequences():
+    """Test pagination over a lazy snapshot view without re-validation."""
+    from app.snapshot import MarketSnapshot
+
+    snapshot = MarketSnapshot.from_records(
+        [{"id": f"coin{i}", "current_price_inr": float(i)} for i in range(25)]
+    )
+    result = paginate_data(snapshot.view(), page=3, per_page=10)
+
+    assert result.total == 25
+    assert [row["id"] for row in result.data] == [f"coin{i}" for i in range(20, 25)]
+
+
+def test_fields_precompiled_per_selection():
+    """Every spelling of a field selection shares one field set."""
+    parse = get_fields(CoinMarketData)
+    first = parse("current_price_inr, id")
+    assert first.fields == ("id", "current_price_inr")
+    assert parse("id,current_price_inr,id") is first
+    assert parse(None) is None
+    assert first.project([{"id": "btc", "name": "Bitcoin", "current_price_inr": 1.0}]) == [
+        {"id": "btc", "current_price_inr": 1.0}
+    ]
+    assert parse("name").project([{"id": "btc", "name": "Bitcoin"}]) == [
+        {"name": "Bitcoin"}
+    ]
+
+    with pytest.raises(HTTPException) as exc_info:
+        parse("id,price")
+    assert exc_info.value.status_code == 400
+    assert "price" in exc_info.value.detail
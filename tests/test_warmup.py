@@ -0,0 +1,96 @@
+"""Tests for the startup warm-up and readiness endpoint."""
+
+import httpx
+from fastapi import status
+from unittest.mock import AsyncMock, patch
+from app.config import settings
+from app.services import warmup as warmup_module
+from app.services.warmup import warmup
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+]
+
+CATEGORIES = [{"category_id": "layer-1", "name": "Layer 1 (L1)"}]
+
+BITCOIN = {
+    "id": "bitcoin",
+    "symbol": "btc",
+    "name": "Bitcoin",
+    "current_price": 5000000.0,
+    "market_cap": 1000000000000,
+    "price_change_percentage_24h": 2.5,
+}
+
+
+async def test_ready_after_warmup(client, monkeypatch):
+    """/ready turns 200 once the caches hold the hot data; /health is always 200."""
+    monkeypatch.setattr(settings, "warmup_coin_ids", "bitcoin, not-a-coin")
+    monkeypatch.setattr(settings, "warmup_categories", "layer-1")
+    market_data = AsyncMock(return_value=[BITCOIN])
+
+    cold = client.get("/ready")
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(return_value=COINS),
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_categories",
+        AsyncMock(return_value=CATEGORIES),
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_coin_market_data",
+        market_data,
+    ):
+        await warmup.run()
+    warm = client.get("/ready")
+
+    assert cold.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert cold.json()["status"] == "warming_up"
+    assert client.get("/health").status_code == status.HTTP_200_OK
+    assert warm.status_code == status.HTTP_200_OK
+    assert warm.json()["warmup"]["steps"] == {
+        "coin_list": "done",
+        "categories": "done",
+        "market_data": "done",
+        "category:layer-1": "done",
+    }
+    # Unknown IDs are dropped against the preloaded coin list
+    assert market_data.await_args_list[0].kwargs["coin_ids"] == ["bitcoin"]
+    assert market_data.await_args_list[1].kwargs["category"] == "layer-1"
+
+
+async def test_warmup_timeout_still_becomes_ready(client, monkeypatch):
+    """Failed steps are retried until the timeout, then the worker is ready anyway."""
+    monkeypatch.setattr(settings, "warmup_timeout_seconds", 0.2)
+    monkeypatch.setattr(warmup_module, "_RETRY_SECONDS", 0.05)
+    categories = AsyncMock(side_effect=httpx.ConnectError("down"))
+
+    with patch(
+        "app.services.coingecko.coingecko_service.get_all_coins",
+        AsyncMock(return_value=COINS),
+    ), patch(
+        "app.services.coingecko.coingecko_service.get_categories", categories
+    ):
+        await warmup.run()
+    response = client.get("/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["warmup"]["timed_out"] is True
+    assert response.json()["warmup"]["steps"]["categories"] == "failed"
+    assert response.json()["warmup"]["steps"]["market_data"] == "pending"
+    assert categories.await_count > 1
+
+
+def test_ready_waits_for_every_worker(client, monkeypatch):
+    """Under the pre-fork launcher readiness follows every worker, not this one."""
+    monkeypatch.setattr(settings, "warmup_enabled", False)
+    workers_warm = False
+    monkeypatch.setattr(warmup, "cluster_ready", lambda: workers_warm)
+
+    cold = client.get("/ready")
+    workers_warm = True
+    warm = client.get("/ready")
+
+    assert cold.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert cold.json()["warmup"]["workers_warm"] is False
+    assert warm.status_code == status.HTTP_200_OK